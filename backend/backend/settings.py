@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -37,6 +38,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
        #новыеаппы
     'rest_framework',
     'rest_framework.authtoken',
@@ -45,6 +47,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'events.logs.RequestLogMiddleware',
+    'events.metrics.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -53,6 +57,7 @@ MIDDLEWARE = [
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
+    'events.replicas.ReplicaRoutingMiddleware',
 ]
 
 ROOT_URLCONF = 'backend.urls'
@@ -93,6 +98,56 @@ DATABASES = {
     }
 }
 
+# Пул соединений с Postgres. С psycopg 3 и psycopg_pool используется встроенный пул
+# Django 5.1: MIN_SIZE соединений держатся открытыми, запрос ждёт свободное не дольше
+# TIMEOUT секунд, соединение проверяется перед выдачей, простаивающие сверх MIN_SIZE
+# закрываются через MAX_IDLE, любое пересоздаётся через MAX_LIFETIME секунд.
+# Без psycopg_pool (или при ENABLED = False) - постоянные соединения на CONN_MAX_AGE
+# секунд с проверкой перед запросом. Пул свой у каждого процесса воркера,
+# поэтому MAX_SIZE * число процессов не должно превышать max_connections в Postgres.
+# Метрики пула: GET /api/db-pool/stats/
+DB_POOL = {
+    'ENABLED': True,
+    'MIN_SIZE': 2,
+    'MAX_SIZE': 10,
+    'TIMEOUT': 10,
+    'MAX_IDLE': 5 * 60,
+    'MAX_LIFETIME': 60 * 60,
+    'CONN_MAX_AGE': 60,
+}
+
+try:
+    from psycopg_pool import ConnectionPool
+except ImportError:
+    ConnectionPool = None
+
+if DB_POOL['ENABLED'] and ConnectionPool is not None:
+    DATABASES['default']['OPTIONS']['pool'] = {
+        'min_size': DB_POOL['MIN_SIZE'],
+        'max_size': DB_POOL['MAX_SIZE'],
+        'timeout': DB_POOL['TIMEOUT'],
+        'max_idle': DB_POOL['MAX_IDLE'],
+        'max_lifetime': DB_POOL['MAX_LIFETIME'],
+        'check': ConnectionPool.check_connection,
+    }
+else:
+    DATABASES['default']['CONN_MAX_AGE'] = DB_POOL['CONN_MAX_AGE']
+    DATABASES['default']['CONN_HEALTH_CHECKS'] = True
+
+# Реплики для чтения (events/replicas.py): ALIASES - алиасы из DATABASES, например
+#   DATABASES['replica'] = {**DATABASES['default'], 'HOST': 'replica-host', 'TEST': {'MIRROR': 'default'}}
+# Списки и карточки мероприятий, категорий, локаций, публичная лента и HTML-страницы
+# читаются с случайной реплики; после записи клиент PIN_SECONDS секунд читает основную БД.
+# PRIMARY_MODELS всегда читаются с основной БД. Метка клиента хранится в кэше 'default'
+# (при нескольких воркерах - общий бэкенд, как для AUTH_TOKEN_CACHE)
+DATABASE_REPLICAS = {
+    'ALIASES': [],
+    'PIN_SECONDS': 5,
+    'PRIMARY_MODELS': ['authtoken.token', 'auth.user', 'events.userprofile'],
+}
+
+DATABASE_ROUTERS = ['events.replicas.ReplicaRouter']
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
@@ -138,13 +193,110 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'events.authentication.CachedTokenAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
 
+# Размер страницы для списков мероприятий (keyset-пагинация, ?page_size= ограничен максимумом)
+EVENTS_PAGE_SIZE = 50
+EVENTS_MAX_PAGE_SIZE = 500
+
+# Списки мероприятий, категорий и локаций собираются из values() без ModelSerializer
+# (events/fastpath.py); вывод совпадает побайтно, флаг оставлен для отката
+EVENTS_FAST_SERIALIZERS = True
+
+# Async-версии чтения мероприятий, публичной ленты и роли (events/async_views.py);
+# выигрыш даёт запуск под ASGI: uvicorn backend.asgi:application
+ASYNC_READ_VIEWS = True
+
+# Структурные логи (events/logs.py): JSON-строки в stderr с request_id, user_id и route.
+# SAMPLE_RATE - доля запросов, у которых пишутся строка доступа и записи ниже WARNING;
+# ошибки 5xx, запросы дольше SLOW_MS мс и логи вне запросов (воркер, команды) пишутся всегда.
+# Запись в поток идёт из фонового потока через очередь на QUEUE_SIZE записей
+REQUEST_LOGGING = {
+    'SAMPLE_RATE': 0.1,
+    'SLOW_MS': 1000,
+    'QUEUE_SIZE': 10000,
+}
+
+# Логи идут в stderr, stdout остаётся выводу команд. Под manage.py test пишутся
+# только предупреждения и ошибки, чтобы строки доступа не перемешивались с выводом тестов
+LOGGING_LEVEL = 'WARNING' if sys.argv[1:2] == ['test'] else 'INFO'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'filters': {
+        'request_context': {'()': 'events.logs.RequestContextFilter'},
+        'sampling': {'()': 'events.logs.SamplingFilter'},
+    },
+    'formatters': {
+        'json': {'()': 'events.logs.JsonFormatter'},
+    },
+    'handlers': {
+        'json': {
+            'class': 'events.logs.QueuedStreamHandler',
+            'stream': 'ext://sys.stderr',
+            'formatter': 'json',
+            'filters': ['request_context', 'sampling'],
+        },
+    },
+    'root': {'handlers': ['json'], 'level': LOGGING_LEVEL},
+    'loggers': {
+        'django': {'handlers': ['json'], 'level': LOGGING_LEVEL, 'propagate': False},
+        # 4xx уже есть в строке доступа events.requests, здесь остаются только 5xx
+        'django.request': {'level': 'ERROR'},
+    },
+}
+
+# Метрики по маршрутам (events/metrics.py) на /metrics в формате Prometheus:
+# время ответа, число и время SQL-запросов, размер ответа. Запрос, в котором один
+# SQL-шаблон повторился N_PLUS_ONE_THRESHOLD раз, считается подозрением на N+1
+# и пишется в лог. ALLOWED_IPS - адреса, с которых доступен /metrics (пусто - все)
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'N_PLUS_ONE_THRESHOLD': 10,
+    'ALLOWED_IPS': ['127.0.0.1', '::1'],
+}
+
+# Кэш аутентификации по токену: TTL в секундах, размер LRU в памяти процесса.
+# SHARED_CACHE - имя кэша из CACHES для общего бэкенда (None - только локальный LRU)
+AUTH_TOKEN_CACHE = {
+    'TTL': 60,
+    'MAX_SIZE': 10000,
+    'SHARED_CACHE': None,
+}
+
+# Кэш из CACHES для снимков публичной ленты и их версии. При нескольких воркерах
+# нужен общий бэкенд (Redis/Memcached), как для AUTH_TOKEN_CACHE['SHARED_CACHE'],
+# иначе сброс версии виден только одному процессу (manage.py check --deploy предупредит)
+PUBLIC_FEED_CACHE = 'default'
+PUBLIC_FEED_SNAPSHOT_TIMEOUT = 60 * 60 * 24
+
+# Срок аренды заявки модератором (секунды) и максимум заявок за один claim-next
+MODERATION_LEASE_SECONDS = 300
+MODERATION_CLAIM_MAX = 50
+
+# Очередь фоновых задач (manage.py run_worker): число потоков воркера, интервал опроса (с),
+# попытки по умолчанию, экспоненциальная задержка между попытками (с) и таймаут зависшей задачи (с)
+JOBS = {
+    'CONCURRENCY': 4,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 5,
+    'BACKOFF_MAX': 60 * 60,
+    'LOCK_TIMEOUT': 10 * 60,
+}
+
+# HTML-страницы мероприятий: Cache-Control max-age (с) и срок жизни кэша карточек (с)
+EVENT_PAGES = {
+    'MAX_AGE': 60,
+    'FRAGMENT_TIMEOUT': 60 * 60,
+}
+
 CORS_ALLOWED_ORIGINS = [
     "http://localhost:3000",
 ]
@@ -1,11 +1,14 @@
+from django.conf import settings
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework.authtoken.views import obtain_auth_token
 from rest_framework.routers import DefaultRouter
-from events import views
+from events import views, async_views
+from events.metrics import metrics_view
 from events.views import (
     EventViewSet, CategoryViewSet, LocationViewSet, PublicEventsView, 
-    RegisterView, RequestViewSet, UserViewSet, get_user_role, UpdateUserRoleView
+    RegisterView, RequestViewSet, UserViewSet, get_user_role, UpdateUserRoleView, JobViewSet,
+    auth_cache_stats, dashboard_stats, db_pool_stats
 )
 
 router = DefaultRouter()
@@ -14,16 +17,30 @@ router.register(r'categories', CategoryViewSet)
 router.register(r'locations', LocationViewSet)
 router.register(r'requests', RequestViewSet)
 router.register(r'users', UserViewSet)
+router.register(r'jobs', JobViewSet)
 
-urlpatterns = [
+# Async-версии read-only эндпоинтов (events/async_views.py) стоят раньше роутера;
+# запись и неподдержанные варианты они передают синхронным представлениям
+async_urlpatterns = [
+    path('api/events/', async_views.event_list, name='event-list'),
+    path('api/events/<int:pk>/', async_views.event_detail, name='event-detail'),
+    path('api/public-events/', async_views.public_events, name='public-events'),
+    path('api/user-role/', async_views.user_role, name='user-role'),
+] if settings.ASYNC_READ_VIEWS else []
+
+urlpatterns = async_urlpatterns + [
     path('api/', include(router.urls)),
     path('api/register/', RegisterView.as_view(), name='register'),
     path('api/token/', obtain_auth_token, name='get_token'),
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('', views.event_list, name='event_list'),
     path('event/<int:event_id>/', views.event_detail, name='event_detail'),
     path('events/', views.event_list, name='event_list'),
     path('api/user-role/', get_user_role, name='user-role'),
+    path('api/auth-cache/stats/', auth_cache_stats, name='auth-cache-stats'),
+    path('api/stats/', dashboard_stats, name='dashboard-stats'),
+    path('api/db-pool/stats/', db_pool_stats, name='db-pool-stats'),
     path('api/public-events/', PublicEventsView.as_view(), name='public-events'),
     path('api/users/<int:user_id>/update-role/', UpdateUserRoleView.as_view(), name='update-user-role'), 
 ]
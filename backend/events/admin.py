@@ -1,6 +1,6 @@
 from django.contrib import admin
 from django.contrib.admin import ModelAdmin
-from .models import Category, Location, Event, UserProfile, Request
+from .models import Category, Location, Event, UserProfile, Request, RequestCounter, Job
 
 # Регистрация UserProfile
 @admin.register(UserProfile)
@@ -15,6 +15,27 @@ class RequestAdmin(admin.ModelAdmin):
     list_display = ('user', 'request_type', 'status', 'created_at', 'reviewed_by')
     list_filter = ('request_type', 'status')
     search_fields = ('user__username',)
+    list_select_related = ('user', 'reviewed_by')
+
+# Счётчики заявок (только просмотр)
+@admin.register(RequestCounter)
+class RequestCounterAdmin(admin.ModelAdmin):
+    list_display = ('status', 'request_type', 'count')
+    list_filter = ('status',)
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+# Фоновые задачи
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('name', 'status', 'attempts', 'run_at', 'locked_by', 'created_at')
+    list_filter = ('status', 'name')
+    readonly_fields = ('locked_by', 'locked_at', 'last_error', 'result', 'created_at', 'updated_at')
 
 
 # Настройка админ-панели для Event
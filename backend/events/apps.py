@@ -5,4 +5,7 @@ class YourAppConfig(AppConfig):
     name = 'events'
 
     def ready(self):
-        import events.signals
\ No newline at end of file
+        import events.dbpool
+        import events.metrics
+        import events.signals
+        import events.tasks
\ No newline at end of file
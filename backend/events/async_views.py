@@ -0,0 +1,153 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse
+from django.views.decorators.csrf import csrf_exempt
+from rest_framework import exceptions
+from rest_framework.request import Request as DRFRequest
+
+from . import feed
+from .authentication import aauthenticate
+from .fastpath import compile_serializer
+from .fieldsets import Fieldset
+from .filters import filter_search, filter_time_window
+from .models import Event
+from .pagination import EventCursorPagination
+from .replicas import replica_reads
+from .renderers import FastJSONRenderer
+from .serializers import EventSerializer
+from .sideload import sideload_requested
+from .views import EventViewSet, PublicEventsView, get_user_role
+
+# Async-версии read-only эндпоинтов для работы под ASGI (uvicorn/daphne).
+# Под ASGI медленные клиенты не держат поток воркера, а запросы к БД идут через
+# async ORM. Всё, что здесь не поддержано (запись, ?sideload=, не-JSON форматы,
+# поля без быстрого пути), передаётся синхронным DRF-представлениям.
+
+event_list_view = EventViewSet.as_view({'get': 'list', 'post': 'create'})
+event_detail_view = EventViewSet.as_view({
+    'get': 'retrieve', 'put': 'update', 'patch': 'partial_update', 'delete': 'destroy',
+})
+public_events_view = PublicEventsView.as_view()
+
+
+def json_response(data, status=200):
+    response = HttpResponse(FastJSONRenderer().render(data), status=status, content_type='application/json')
+    response['Vary'] = 'Accept'
+    return response
+
+
+# Ошибки в том же виде, что у обработчика исключений DRF
+def error_response(exc):
+    data = exc.detail if isinstance(exc.detail, (dict, list)) else {'detail': exc.detail}
+    response = json_response(data, exc.status_code)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        response['WWW-Authenticate'] = 'Token'
+    return response
+
+
+# Async-путь строится на быстром сериализаторе, поэтому выключается вместе с ним
+def wants_json(request):
+    if request.method not in ('GET', 'HEAD') or not getattr(settings, 'EVENTS_FAST_SERIALIZERS', True):
+        return False
+    if request.GET.get('format', 'json') != 'json' or sideload_requested(request.GET):
+        return False
+    accept = request.headers.get('Accept', '*/*')
+    return 'application/json' in accept or ('*/*' in accept and 'text/html' not in accept)
+
+
+# Ответ DRF рендерит сам обработчик Django (тоже через sync_to_async)
+async def sync_fallback(view, request, *args, **kwargs):
+    return await sync_to_async(view)(request, *args, **kwargs)
+
+
+async def authenticate(request, required):
+    result = await aauthenticate(request)
+    user = result[0] if result else AnonymousUser()
+    request.user = user
+    if required and not user.is_authenticated:
+        raise exceptions.NotAuthenticated()
+    return user
+
+
+def compiled_events(request, queryset):
+    serializer = EventSerializer(context={'request': request})
+    fieldset = Fieldset.from_params(request.GET)
+    if fieldset is not None:
+        queryset = fieldset.restrict(queryset, EventSerializer(context={'request': request}), ('start_time',))
+        fieldset.prune(serializer)
+    compiled = compile_serializer(serializer, Event)
+    return compiled, queryset
+
+
+async def event_page(request, queryset):
+    compiled, queryset = compiled_events(request, queryset)
+    if compiled is None:
+        return None
+    queryset = filter_search(filter_time_window(queryset, request.GET), request.GET)
+    paginator = EventCursorPagination()
+    page = await paginator.apaginate_queryset(compiled.rows(queryset, paginator), DRFRequest(request))
+    return paginator.get_paginated_response([compiled.build(row) for row in page]).data
+
+
+@replica_reads
+@csrf_exempt
+async def event_list(request):
+    if not wants_json(request):
+        return await sync_fallback(event_list_view, request)
+    try:
+        await authenticate(request, required=False)
+        data = await event_page(request, Event.objects.with_relations())
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    if data is None:
+        return await sync_fallback(event_list_view, request)
+    return json_response(data)
+
+
+@replica_reads
+@csrf_exempt
+async def event_detail(request, pk):
+    if not wants_json(request):
+        return await sync_fallback(event_detail_view, request, pk=pk)
+    try:
+        await authenticate(request, required=True)
+        compiled, queryset = compiled_events(request, Event.objects.with_relations().filter(pk=pk))
+        if compiled is None:
+            return await sync_fallback(event_detail_view, request, pk=pk)
+        row = await compiled.rows(queryset).afirst()
+        if row is None:
+            raise exceptions.NotFound('No Event matches the given query.')
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    return json_response(compiled.build(row))
+
+
+@replica_reads
+@csrf_exempt
+async def public_events(request):
+    if not wants_json(request):
+        return await sync_fallback(public_events_view, request)
+    try:
+        await authenticate(request, required=False)
+        queryset = Event.objects.with_relations().filter(is_public=True)
+        if not request.GET:
+            snapshot = await feed.aget_snapshot(request, lambda: event_page(request, queryset))
+            return feed.snapshot_response(request, snapshot)
+        data = await event_page(request, queryset)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    if data is None:
+        return await sync_fallback(public_events_view, request)
+    return json_response(data)
+
+
+@csrf_exempt
+async def user_role(request):
+    if not wants_json(request):
+        return await sync_fallback(get_user_role, request)
+    try:
+        user = await authenticate(request, required=True)
+    except exceptions.APIException as exc:
+        return error_response(exc)
+    return json_response({'role': user._resolved_role, 'username': user.username})
@@ -0,0 +1,182 @@
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .models import UserProfile
+from .roles import resolve_role
+
+
+# Кэш token -> (user, token, role) с TTL.
+# По умолчанию живёт в памяти процесса (LRU); если в AUTH_TOKEN_CACHE указан
+# SHARED_CACHE, используется общий бэкенд Django cache, чтобы инвалидация
+# была видна всем воркерам.
+class TokenCache:
+    key_prefix = 'auth-token:'
+
+    def __init__(self, ttl=60, max_size=10000, shared_cache=None):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.shared_cache = shared_cache
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @classmethod
+    def from_settings(cls):
+        options = getattr(settings, 'AUTH_TOKEN_CACHE', {})
+        return cls(
+            ttl=options.get('TTL', 60),
+            max_size=options.get('MAX_SIZE', 10000),
+            shared_cache=options.get('SHARED_CACHE'),
+        )
+
+    @property
+    def backend(self):
+        return caches[self.shared_cache] if self.shared_cache else None
+
+    def get(self, key):
+        if self.backend is not None:
+            entry = self.backend.get(self.key_prefix + key)
+        else:
+            with self._lock:
+                item = self._entries.get(key)
+                if item is not None and item[0] < time.monotonic():
+                    del self._entries[key]
+                    item = None
+                if item is not None:
+                    self._entries.move_to_end(key)
+                entry = item[1] if item is not None else None
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    def set(self, key, entry):
+        if self.backend is not None:
+            self.backend.set(self.key_prefix + key, entry, self.ttl)
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, entry)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    # Для async-представлений: общий бэкенд читается через aget/aset,
+    # локальный LRU не делает ввода-вывода и обходится без await
+    async def aget(self, key):
+        if self.backend is None:
+            return self.get(key)
+        entry = await self.backend.aget(self.key_prefix + key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return entry
+
+    async def aset(self, key, entry):
+        if self.backend is None:
+            return self.set(key, entry)
+        await self.backend.aset(self.key_prefix + key, entry, self.ttl)
+
+    def invalidate(self, *keys):
+        if self.backend is not None:
+            self.backend.delete_many([self.key_prefix + key for key in keys])
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+            self.invalidations += len(keys)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_ratio': round(self.hits / total, 4) if total else 0.0,
+                'size': len(self._entries),
+                'backend': self.shared_cache or 'local',
+            }
+
+
+token_cache = TokenCache.from_settings()
+
+
+def invalidate_user_tokens(user_id):
+    from rest_framework.authtoken.models import Token
+
+    keys = list(Token.objects.filter(user_id=user_id).values_list('key', flat=True))
+    if keys:
+        token_cache.invalidate(*keys)
+
+
+# TokenAuthentication, который на горячем пути не обращается к БД:
+# пользователь и его роль берутся из token_cache
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        entry = token_cache.get(key)
+        if entry is not None:
+            user, token, role = entry
+            # Копия, чтобы запросы не делили один объект пользователя
+            user = copy.copy(user)
+            user._resolved_role = role
+            return user, token
+
+        user, token = super().authenticate_credentials(key)
+        role = resolve_role(user)
+        token_cache.set(key, (user, token, role))
+        return user, token
+
+
+# Async-вариант CachedTokenAuthentication для представлений в async_views.py:
+# те же заголовок, сообщения об ошибках и кэш, запросы к БД через async ORM.
+# Возвращает (user, token) или None, если заголовка нет
+async def aauthenticate(request):
+    from rest_framework.authtoken.models import Token
+
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != CachedTokenAuthentication.keyword.lower().encode():
+        return None
+    if len(auth) == 1:
+        raise exceptions.AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+    if len(auth) > 2:
+        raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+    try:
+        key = auth[1].decode()
+    except UnicodeError:
+        raise exceptions.AuthenticationFailed(_('Invalid token header. Token string should not contain invalid characters.'))
+
+    entry = await token_cache.aget(key)
+    if entry is not None:
+        user, token, role = entry
+        user = copy.copy(user)
+        user._resolved_role = role
+        return user, token
+
+    try:
+        token = await Token.objects.select_related('user').aget(key=key)
+    except Token.DoesNotExist:
+        raise exceptions.AuthenticationFailed(_('Invalid token.'))
+    user = token.user
+    if not user.is_active:
+        raise exceptions.AuthenticationFailed(_('User inactive or deleted.'))
+    role = await UserProfile.objects.filter(user=user).values_list('role', flat=True).afirst() or 'user'
+    user._resolved_role = role
+    await token_cache.aset(key, (user, token, role))
+    return user, token
@@ -0,0 +1,121 @@
+from collections import defaultdict
+
+from django.db import connections
+
+from .models import Event
+
+# Ограничение исключения: на одной локации не может быть двух пересекающихся
+# мероприятий (см. миграцию 0017). Интервалы полуоткрытые, [start, end), поэтому
+# мероприятия «встык» не конфликтуют.
+EXCLUSION_CONSTRAINT = 'event_location_no_overlap'
+MAX_SLOTS_WINDOW_DAYS = 366
+
+
+def is_booking_conflict(error):
+    diag = getattr(getattr(error, '__cause__', None), 'diag', None)
+    if diag is not None and getattr(diag, 'constraint_name', None):
+        return diag.constraint_name == EXCLUSION_CONSTRAINT
+    return EXCLUSION_CONSTRAINT in str(error)
+
+
+# Мероприятия, занимающие локацию в [start, end); поиск идёт по GiST-индексу ограничения
+def conflicts(location_id, start, end, exclude_pk=None):
+    queryset = Event.objects.filter(location_id=location_id).overlapping(start, end)
+    if exclude_pk is not None:
+        queryset = queryset.exclude(pk=exclude_pk)
+    return queryset
+
+
+def conflict_message(event_id):
+    if event_id is None:
+        return 'Локация уже занята в это время другим мероприятием из этой же пачки'
+    return f'Локация уже занята в это время (мероприятие {event_id})'
+
+
+CONFLICT_CHUNK_SIZE = 500
+
+
+# Первое сохранённое мероприятие, пересекающееся с каждым кандидатом [(индекс, событие), ...].
+# В PostgreSQL - один запрос на CONFLICT_CHUNK_SIZE кандидатов: VALUES с кандидатами
+# соединяется с events_event по тому же выражению, что и GiST-индекс ограничения.
+# На других СУБД - отдельный индексируемый запрос на кандидата
+def stored_conflicts(located, exclude):
+    connection = connections[Event.objects.db]
+    if connection.vendor != 'postgresql':
+        result = {}
+        for i, event in located:
+            clash = (
+                conflicts(event.location_id, event.start_time, event.end_time)
+                .exclude(pk__in=exclude).order_by('pk').values_list('pk', flat=True).first()
+            )
+            if clash is not None:
+                result[i] = clash
+        return result
+
+    result = {}
+    table = connection.ops.quote_name(Event._meta.db_table)
+    for offset in range(0, len(located), CONFLICT_CHUNK_SIZE):
+        chunk = located[offset:offset + CONFLICT_CHUNK_SIZE]
+        params = [value for i, e in chunk for value in (i, e.location_id, e.start_time, e.end_time)]
+        values = ', '.join(['(%s, %s::bigint, %s::timestamptz, %s::timestamptz)'] * len(chunk))
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT DISTINCT ON (c.idx) c.idx, e.id '
+                f'FROM (VALUES {values}) AS c (idx, location_id, start_time, end_time) '
+                f'JOIN {table} e ON e.location_id = c.location_id '
+                f'AND tstzrange(e.start_time, e.end_time) && tstzrange(c.start_time, c.end_time) '
+                f'WHERE NOT (e.id = ANY(%s::bigint[])) '
+                f'ORDER BY c.idx, e.id',
+                params + [list(exclude)],
+            )
+            result.update(cursor.fetchall())
+    return result
+
+
+# Проверка пачки новых/изменённых мероприятий: конфликты с сохранёнными мероприятиями
+# ищутся по индексу для каждого кандидата, друг с другом - в памяти. Возвращает
+# {индекс в events: id занявшего мероприятия}; id равен None, если место заняло
+# ещё не сохранённое мероприятие пачки. Сохранённые версии изменяемых мероприятий
+# пачки не учитываются - их заменяют новые интервалы
+def find_conflicts(events):
+    located = [(i, e) for i, e in enumerate(events) if e.location_id]
+    if not located:
+        return {}
+    result = stored_conflicts(located, {e.pk for _, e in located if e.pk})
+
+    busy = defaultdict(list)
+    for i, event in located:
+        if i in result:
+            continue
+        taken = busy[event.location_id]
+        clash = next((pk for start, end, pk in taken if start < event.end_time and event.start_time < end), False)
+        if clash is not False:
+            result[i] = clash
+        else:
+            taken.append((event.start_time, event.end_time, event.pk))
+    return result
+
+
+# Свободные промежутки локации внутри окна [start, end): занятые интервалы
+# читаются одним запросом по индексу, сливаются и вычитаются из окна
+def free_slots(location_id, start, end, min_duration=None):
+    busy = []
+    rows = conflicts(location_id, start, end).order_by('start_time').values_list('start_time', 'end_time')
+    for busy_start, busy_end in rows:
+        busy_start, busy_end = max(busy_start, start), min(busy_end, end)
+        if busy and busy_start <= busy[-1][1]:
+            busy[-1][1] = max(busy[-1][1], busy_end)
+        else:
+            busy.append([busy_start, busy_end])
+
+    free = []
+    cursor = start
+    for busy_start, busy_end in busy:
+        if busy_start > cursor:
+            free.append((cursor, busy_start))
+        cursor = max(cursor, busy_end)
+    if cursor < end:
+        free.append((cursor, end))
+    if min_duration:
+        free = [(a, b) for a, b in free if b - a >= min_duration]
+    return [tuple(interval) for interval in busy], free
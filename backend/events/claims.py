@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .models import Request
+
+LEASE_SECONDS = getattr(settings, 'MODERATION_LEASE_SECONDS', 300)
+CLAIM_MAX = getattr(settings, 'MODERATION_CLAIM_MAX', 50)
+
+
+class ClaimConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Заявка уже обработана или взята в работу другим модератором'
+    default_code = 'claim_conflict'
+
+
+def lease_until():
+    return timezone.now() + timedelta(seconds=LEASE_SECONDS)
+
+
+# Заявка свободна для модератора: не арендована, аренда истекла или принадлежит ему
+def available_to(user, now=None):
+    now = now or timezone.now()
+    return Q(claimed_by__isnull=True) | Q(claimed_until__lt=now) | Q(claimed_by=user)
+
+
+# Условный UPDATE ... WHERE status='pending': без блокировок, выигрывает один модератор
+def claim(request_id, user):
+    now = timezone.now()
+    return Request.objects.filter(available_to(user, now), pk=request_id, status='pending').update(
+        claimed_by=user, claimed_until=lease_until()
+    ) == 1
+
+
+def release(request_id, user):
+    return Request.objects.filter(pk=request_id, claimed_by=user).update(claimed_by=None, claimed_until=None) == 1
+
+
+# Правка без решения: строка блокируется, только если аренда не у другого модератора
+def holds(request_id, user):
+    return Request.objects.select_for_update().filter(available_to(user), pk=request_id).exists()
+
+
+# "Следующие N для меня": SELECT ... FOR UPDATE SKIP LOCKED пропускает строки,
+# которые прямо сейчас забирает другой модератор, и не ждёт их
+def claim_next(user, limit, request_type=None):
+    limit = max(1, min(limit, CLAIM_MAX))
+    now = timezone.now()
+    with transaction.atomic():
+        queryset = Request.objects.filter(
+            Q(claimed_by__isnull=True) | Q(claimed_until__lt=now), status='pending'
+        )
+        if request_type:
+            queryset = queryset.filter(request_type=request_type)
+        ids = list(
+            queryset.select_for_update(skip_locked=True)
+            .order_by('created_at', 'id').values_list('pk', flat=True)[:limit]
+        )
+        Request.objects.filter(pk__in=ids).update(claimed_by=user, claimed_until=lease_until())
+    return ids
+
+
+# Перевод pending -> approved/rejected одним условным UPDATE.
+# Возвращает False, если заявку уже обработали или её арендовал другой модератор.
+def finish(request_id, user, new_status):
+    now = timezone.now()
+    return Request.objects.filter(available_to(user, now), pk=request_id, status='pending').update(
+        status=new_status, reviewed_by=user, claimed_by=None, claimed_until=None, updated_at=now
+    ) == 1
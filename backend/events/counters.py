@@ -0,0 +1,46 @@
+from collections import Counter
+
+from django.db.models import Count, F
+
+from .models import Request, RequestCounter
+
+
+def adjust_counters(deltas):
+    for (status, request_type), delta in deltas.items():
+        if not delta:
+            continue
+        counters = RequestCounter.objects.filter(status=status, request_type=request_type)
+        if not counters.update(count=F('count') + delta):
+            RequestCounter.objects.get_or_create(status=status, request_type=request_type)
+            counters.update(count=F('count') + delta)
+
+
+# Переходы вида [((старый статус, тип), (новый статус, тип)), ...]
+def record_transitions(transitions):
+    deltas = Counter()
+    for old, new in transitions:
+        if old == new:
+            continue
+        if old is not None:
+            deltas[old] -= 1
+        if new is not None:
+            deltas[new] += 1
+    adjust_counters(deltas)
+
+
+def counter_snapshot():
+    by_status = {status: 0 for status, _ in Request._meta.get_field('status').choices}
+    matrix = {}
+    for status, request_type, count in RequestCounter.objects.values_list('status', 'request_type', 'count'):
+        by_status[status] = by_status.get(status, 0) + count
+        matrix.setdefault(status, {})[request_type] = count
+    return {'by_status': by_status, 'by_status_and_type': matrix}
+
+
+# Полный пересчёт из таблицы заявок (на случай расхождения после queryset.update)
+def rebuild_counters():
+    RequestCounter.objects.all().delete()
+    RequestCounter.objects.bulk_create([
+        RequestCounter(status=row['status'], request_type=row['request_type'], count=row['total'])
+        for row in Request.objects.values('status', 'request_type').annotate(total=Count('id')).order_by()
+    ])
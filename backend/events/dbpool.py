@@ -0,0 +1,78 @@
+import threading
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# connection_created по алиасам БД. Без пула это открытие физического соединения:
+# с CONN_MAX_AGE счётчик растёт только при прогреве и пересоздании соединений, рост
+# на каждый запрос означает, что соединения не переиспользуются. В режиме пула
+# (Django 5.1) сигнал приходит на каждую выдачу соединения из пула, поэтому
+# физические соединения берутся из статистики самого пула (connections_num)
+_lock = threading.Lock()
+_created = {}
+
+
+def count_connection(sender, connection, **kwargs):
+    with _lock:
+        _created[connection.alias] = _created.get(connection.alias, 0) + 1
+
+
+connection_created.connect(count_connection, dispatch_uid='events.dbpool.count_connection')
+
+
+def created_connections(alias):
+    with _lock:
+        return _created.get(alias, 0)
+
+
+# Метрики пула psycopg_pool (get_stats()): время ожидания выдачи соединения
+# и насыщенность пула - доля занятых соединений от max_size
+def pool_metrics(raw):
+    requests = raw.get('requests_num', 0)
+    in_use = raw.get('pool_size', 0) - raw.get('pool_available', 0)
+    pool_max = raw.get('pool_max', 0)
+    return {
+        'min_size': raw.get('pool_min', 0),
+        'max_size': pool_max,
+        'size': raw.get('pool_size', 0),
+        'available': raw.get('pool_available', 0),
+        'in_use': in_use,
+        'saturation': round(in_use / pool_max, 4) if pool_max else 0.0,
+        'waiting': raw.get('requests_waiting', 0),
+        'checkouts': requests,
+        'checkouts_queued': raw.get('requests_queued', 0),
+        'checkout_wait_ms_total': raw.get('requests_wait_ms', 0),
+        'checkout_wait_ms_avg': round(raw.get('requests_wait_ms', 0) / requests, 2) if requests else 0.0,
+        'checkout_timeouts': raw.get('requests_errors', 0),
+        'bad_returns': raw.get('returns_bad', 0),
+        'connections_lost': raw.get('connections_lost', 0),
+        'connect_errors': raw.get('connections_errors', 0),
+        # connections_num - все попытки соединиться, включая неудачные
+        'connections_opened': raw.get('connections_num', 0) - raw.get('connections_errors', 0),
+    }
+
+
+def database_stats(alias):
+    connection = connections[alias]
+    settings_dict = connection.settings_dict
+    result = {'vendor': connection.vendor}
+    # pool есть только у postgresql-бэкенда с OPTIONS['pool'] (Django 5.1 + psycopg 3)
+    pool = getattr(connection, 'pool', None)
+    if pool is not None:
+        result['mode'] = 'pool'
+        result['pool'] = pool_metrics(pool.get_stats())
+        result['connections_opened'] = result['pool']['connections_opened']
+        result['connection_checkouts'] = created_connections(alias)
+        return result
+    result['connections_opened'] = created_connections(alias)
+    if settings_dict.get('CONN_MAX_AGE'):
+        result['mode'] = 'persistent'
+        result['conn_max_age'] = settings_dict['CONN_MAX_AGE']
+        result['health_checks'] = settings_dict.get('CONN_HEALTH_CHECKS', False)
+    else:
+        result['mode'] = 'per-request'
+    return result
+
+
+def pool_stats():
+    return {alias: database_stats(alias) for alias in connections}
@@ -0,0 +1,116 @@
+import csv
+import json
+from datetime import timezone as dt_timezone
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+    'ics': 'text/calendar; charset=utf-8',
+}
+# Колонки совпадают с полями импорта, так что выгрузку можно загрузить обратно
+EXPORT_COLUMNS = (
+    'id', 'title', 'description', 'start_time', 'end_time', 'is_public',
+    'category_id', 'location_id', 'category__name', 'location__name', 'location__city',
+)
+EXPORT_HEADER = (
+    'id', 'title', 'description', 'start_time', 'end_time', 'is_public',
+    'category_id', 'location_id', 'category_name', 'location_name', 'location_city',
+)
+EXPORT_CHUNK_SIZE = 2000
+
+
+# Строки берутся кортежами из values_list через iterator(): без моделей и
+# сериализаторов, в памяти только текущая пачка курсора
+def iter_export_rows(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    queryset = queryset.order_by('start_time', 'id').values_list(*EXPORT_COLUMNS)
+    for row in queryset.iterator(chunk_size=chunk_size):
+        yield dict(zip(EXPORT_HEADER, row))
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def encode_csv(rows):
+    writer = csv.writer(Echo())
+    yield '\ufeff' + writer.writerow(EXPORT_HEADER)
+    for row in rows:
+        values = [row[name] for name in EXPORT_HEADER]
+        values[3] = values[3].isoformat()
+        values[4] = values[4].isoformat()
+        yield writer.writerow(values)
+
+
+def encode_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+
+def ics_escape(value):
+    return (
+        str(value or '')
+        .replace('\\', '\\\\')
+        .replace(';', '\\;')
+        .replace(',', '\\,')
+        .replace('\r\n', '\\n')
+        .replace('\n', '\\n')
+    )
+
+
+def ics_time(value):
+    return value.astimezone(dt_timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+
+
+# Строки длиннее 75 октетов переносятся по RFC 5545
+def ics_line(line):
+    encoded = line.encode('utf-8')
+    if len(encoded) <= 75:
+        return line + '\r\n'
+    parts = []
+    current = ''
+    limit = 75
+    for char in line:
+        if len((current + char).encode('utf-8')) > limit:
+            parts.append(current)
+            current = ' '
+            limit = 75
+        current += char
+    parts.append(current)
+    return '\r\n'.join(parts) + '\r\n'
+
+
+def encode_ics(rows, host='event-manager'):
+    stamp = ics_time(timezone.now())
+    yield ics_line('BEGIN:VCALENDAR')
+    yield ics_line('VERSION:2.0')
+    yield ics_line('PRODID:-//Event Manager//RU')
+    for row in rows:
+        location = ', '.join(part for part in (row['location_name'], row['location_city']) if part)
+        lines = [
+            'BEGIN:VEVENT',
+            f"UID:event-{row['id']}@{host}",
+            f'DTSTAMP:{stamp}',
+            f"DTSTART:{ics_time(row['start_time'])}",
+            f"DTEND:{ics_time(row['end_time'])}",
+            f"SUMMARY:{ics_escape(row['title'])}",
+        ]
+        if row['description']:
+            lines.append(f"DESCRIPTION:{ics_escape(row['description'])}")
+        if location:
+            lines.append(f'LOCATION:{ics_escape(location)}')
+        if row['category_name']:
+            lines.append(f"CATEGORIES:{ics_escape(row['category_name'])}")
+        lines.append('END:VEVENT')
+        yield ''.join(ics_line(line) for line in lines)
+    yield ics_line('END:VCALENDAR')
+
+
+ENCODERS = {
+    'csv': encode_csv,
+    'ndjson': encode_ndjson,
+    'ics': encode_ics,
+}
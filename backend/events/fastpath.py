@@ -0,0 +1,141 @@
+from django.conf import settings
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .renderers import FAST_RENDERER_CLASSES
+from .sideload import sideload_requested
+
+# Поля, чьё представление совпадает со значением из БД (str, int, bool),
+# и типы колонок, для которых это верно
+IDENTITY_FIELDS = {
+    serializers.CharField: ('CharField', 'TextField', 'SlugField', 'EmailField'),
+    serializers.EmailField: ('CharField', 'EmailField'),
+    serializers.SlugField: ('CharField', 'SlugField'),
+    serializers.IntegerField: (
+        'AutoField', 'BigAutoField', 'IntegerField', 'BigIntegerField',
+        'PositiveIntegerField', 'PositiveSmallIntegerField', 'SmallIntegerField',
+    ),
+    serializers.BooleanField: ('BooleanField',),
+}
+
+
+def fast_path_allowed(request):
+    return (
+        getattr(settings, 'EVENTS_FAST_SERIALIZERS', True)
+        and request.accepted_renderer.format == 'json'
+        and not sideload_requested(request.query_params)
+    )
+
+
+# Скомпилированный сериализатор: список колонок для values() и функция,
+# собирающая из строки values() тот же словарь, что и to_representation.
+# Поддерживаются обычные поля модели и вложенные ModelSerializer по FK/OneToOne;
+# для остального compile_serializer возвращает None и работает обычный путь.
+class CompiledSerializer:
+    def __init__(self, columns, build):
+        self.columns = columns
+        self.build = build
+
+    # Аннотации (например, search_rank для пагинации) сохраняются в строках.
+    # Поле сортировки пагинатора и id нужны курсору, даже если ?fields= их убрал;
+    # в ответ они не попадают - build собирает только поля сериализатора
+    def rows(self, queryset, paginator=None):
+        columns = list(self.columns)
+        annotations = queryset.query.annotation_select
+        if paginator is not None and hasattr(paginator, 'get_ordering'):
+            for name in (paginator.get_ordering(queryset).lstrip('-'), 'id'):
+                if name not in columns and name not in annotations:
+                    columns.append(name)
+        return queryset.values(*columns, *annotations)
+
+
+def hidden_fields(serializer):
+    hide = getattr(serializer, 'hidden_fields', None)
+    return hide() if hide is not None else set()
+
+
+def compile_steps(serializer, model, prefix, columns):
+    # to_representation может переопределяться только ради скрытия полей (hidden_fields)
+    if type(serializer).to_representation is not serializers.Serializer.to_representation \
+            and not hasattr(serializer, 'hidden_fields'):
+        return None
+    hidden = hidden_fields(serializer)
+    pk_column = prefix + model._meta.pk.attname
+    columns.append(pk_column)
+    steps = []
+    for name, field in serializer.fields.items():
+        if field.write_only or name in hidden:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        if isinstance(field, (serializers.ListSerializer, serializers.RelatedField, serializers.ManyRelatedField)):
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        path = prefix + field.source
+
+        if isinstance(field, serializers.Serializer):
+            if not model_field.is_relation or model_field.many_to_many or model_field.one_to_many:
+                return None
+            nested = compile_steps(field, model_field.related_model, path + '__', columns)
+            if nested is None:
+                return None
+            steps.append((name, path + '__' + model_field.related_model._meta.pk.attname, None, make_builder(nested)))
+            continue
+
+        if model_field.is_relation:
+            return None
+        columns.append(path)
+        if model_field.get_internal_type() in IDENTITY_FIELDS.get(type(field), ()):
+            steps.append((name, path, None, None))
+        else:
+            steps.append((name, path, field.to_representation, None))
+    return steps
+
+
+def make_builder(steps):
+    def build(row):
+        data = {}
+        for name, column, convert, nested in steps:
+            value = row[column]
+            if value is None:
+                data[name] = None
+            elif nested is not None:
+                data[name] = nested(row)
+            elif convert is None:
+                data[name] = value
+            else:
+                data[name] = convert(value)
+        return data
+    return build
+
+
+def compile_serializer(serializer, model):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    columns = []
+    steps = compile_steps(serializer, model, '', columns)
+    if steps is None:
+        return None
+    return CompiledSerializer(list(dict.fromkeys(columns)), make_builder(steps))
+
+
+# list() по строкам values() вместо моделей и ModelSerializer
+class FastListMixin:
+    renderer_classes = FAST_RENDERER_CLASSES
+
+    def list(self, request, *args, **kwargs):
+        if not fast_path_allowed(request):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        compiled = compile_serializer(self.get_serializer(), queryset.model)
+        if compiled is None:
+            return super().list(request, *args, **kwargs)
+        rows = compiled.rows(queryset, self.paginator)
+        page = self.paginate_queryset(rows)
+        if page is not None:
+            return self.get_paginated_response([compiled.build(row) for row in page])
+        return Response([compiled.build(row) for row in rows])
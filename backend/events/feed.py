@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+import uuid
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.checks import Tags, Warning, register
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+
+from .renderers import FastJSONRenderer
+from .replicas import use_primary
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+VERSION_KEY = 'public-feed:version'
+SNAPSHOT_KEY = 'public-feed:snapshot:%s:%s'
+SNAPSHOT_TIMEOUT = getattr(settings, 'PUBLIC_FEED_SNAPSHOT_TIMEOUT', 60 * 60 * 24)
+
+
+# Снимок публичной ленты: готовые JSON-байты, их gzip/brotli-варианты и ETag.
+# Снимки и версия хранятся в кэше PUBLIC_FEED_CACHE под текущей версией; сигналы
+# на Event, Category, Location и авторах меняют версию после коммита транзакции,
+# и лента пересобирается при следующем обращении. Пересборка читает основную БД:
+# снимок с отстающей реплики остался бы в кэше под новой версией до следующего изменения.
+# При нескольких процессах кэш должен быть общим (Redis/Memcached), иначе сброс
+# версии увидит только процесс, в котором прошло изменение.
+def feed_cache():
+    return caches[getattr(settings, 'PUBLIC_FEED_CACHE', 'default')]
+
+
+@register(Tags.caches, deploy=True)
+def check_feed_cache(app_configs, **kwargs):
+    alias = getattr(settings, 'PUBLIC_FEED_CACHE', 'default')
+    if isinstance(caches[alias], LocMemCache):
+        return [Warning(
+            f'PUBLIC_FEED_CACHE = {alias!r} использует LocMemCache: при нескольких процессах '
+            'сброс снимка публичной ленты не виден остальным процессам.',
+            hint='Укажите в PUBLIC_FEED_CACHE кэш с общим бэкендом (Redis, Memcached).',
+            id='events.W001',
+        )]
+    return []
+
+
+def current_version():
+    cache = feed_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+async def acurrent_version():
+    cache = feed_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        await cache.aadd(VERSION_KEY, uuid.uuid4().hex, None)
+        version = await cache.aget(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    feed_cache().set(VERSION_KEY, uuid.uuid4().hex, None)
+
+
+# Версия меняется только после коммита: иначе параллельный запрос успел бы собрать
+# под новой версией снимок из ещё не закоммиченных (старых) данных
+def invalidate():
+    transaction.on_commit(bump_version)
+
+
+def build_snapshot(data):
+    body = FastJSONRenderer().render(data)
+    digest = hashlib.sha256(body).hexdigest()[:32]
+    return {
+        'etag': digest,
+        'identity': body,
+        'gzip': gzip.compress(body, compresslevel=6),
+        'br': brotli.compress(body) if brotli is not None else None,
+    }
+
+
+def get_snapshot(request, build_data):
+    # Ссылки next/previous абсолютные, поэтому снимок строится на каждый адрес
+    url_key = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = SNAPSHOT_KEY % (current_version(), url_key)
+    cache = feed_cache()
+    snapshot = cache.get(key)
+    if snapshot is None:
+        with use_primary():
+            snapshot = build_snapshot(build_data())
+        cache.set(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+# Вариант get_snapshot для async-представлений; build_data - корутина
+async def aget_snapshot(request, build_data):
+    url_key = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    key = SNAPSHOT_KEY % (await acurrent_version(), url_key)
+    cache = feed_cache()
+    snapshot = await cache.aget(key)
+    if snapshot is None:
+        with use_primary():
+            snapshot = build_snapshot(await build_data())
+        await cache.aset(key, snapshot, SNAPSHOT_TIMEOUT)
+    return snapshot
+
+
+def accepted_encodings(request):
+    encodings = set()
+    for part in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.replace(' ', '') in ('q=0', 'q=0.0', 'q=0.00', 'q=0.000'):
+            continue
+        if name:
+            encodings.add(name.lower())
+    return encodings
+
+
+def etag_matches(request, etag):
+    header = request.META.get('HTTP_IF_NONE_MATCH')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    for candidate in header.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        # Варианты с разным сжатием имеют суффикс, но описывают одни и те же данные
+        if candidate.strip('"').split('-')[0] == etag:
+            return True
+    return False
+
+
+def snapshot_response(request, snapshot):
+    etag = snapshot['etag']
+    if etag_matches(request, etag):
+        response = HttpResponseNotModified()
+        response['ETag'] = '"%s"' % etag
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+
+    encodings = accepted_encodings(request)
+    if snapshot['br'] is not None and 'br' in encodings:
+        body, encoding = snapshot['br'], 'br'
+    elif 'gzip' in encodings:
+        body, encoding = snapshot['gzip'], 'gzip'
+    else:
+        body, encoding = snapshot['identity'], None
+
+    response = HttpResponse(body, content_type='application/json')
+    if encoding:
+        response['Content-Encoding'] = encoding
+        response['ETag'] = '"%s-%s"' % (etag, encoding)
+    else:
+        response['ETag'] = '"%s"' % etag
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
@@ -0,0 +1,141 @@
+from django.core.exceptions import FieldDoesNotExist
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+# ?fields=id,title,location.name и ?exclude=description,author.email -> дерево
+# {'id': None, 'location': {'name': None}}; None означает поле целиком
+def parse_paths(value):
+    tree = {}
+    for path in (value or '').split(','):
+        path = path.strip()
+        if not path:
+            continue
+        node = tree
+        parts = path.split('.')
+        for part in parts[:-1]:
+            if node.get(part, {}) is None:
+                break
+            node = node.setdefault(part, {})
+        else:
+            node[parts[-1]] = None
+    return tree
+
+
+class Fieldset:
+    def __init__(self, include=None, exclude=None):
+        self.include = include
+        self.exclude = exclude or {}
+
+    @classmethod
+    def from_params(cls, params):
+        include = parse_paths(params.get('fields')) or None
+        exclude = parse_paths(params.get('exclude'))
+        if include is None and not exclude:
+            return None
+        return cls(include, exclude)
+
+    # Убирает невыбранные поля из сериализатора (и из вложенных сериализаторов)
+    def prune(self, serializer):
+        if isinstance(serializer, serializers.ListSerializer):
+            serializer = serializer.child
+        prune_fields(serializer, self.include, self.exclude)
+        return serializer
+
+    # Оставляет в SQL только колонки и JOIN-ы, нужные оставшимся полям.
+    # required - колонки, которые нужны самому представлению (например, для пагинации)
+    def restrict(self, queryset, serializer, required=()):
+        serializer = self.prune(serializer)
+        plan = column_plan(serializer, queryset.model)
+        if plan is None:
+            return queryset
+        columns, relations = plan
+        queryset = queryset.select_related(None)
+        if relations:
+            queryset = queryset.select_related(*relations)
+        return queryset.only(*columns, *required)
+
+
+def readable_fields(serializer):
+    return {name for name, field in serializer.fields.items() if not field.write_only}
+
+
+def prune_fields(serializer, include, exclude, prefix=''):
+    fields = serializer.fields
+    readable = readable_fields(serializer)
+    for param, tree in (('fields', include), ('exclude', exclude)):
+        for name, subtree in (tree or {}).items():
+            if name not in readable:
+                raise ValidationError({param: f'Неизвестное поле: {prefix}{name}'})
+            if subtree is not None and not isinstance(fields[name], serializers.Serializer):
+                raise ValidationError({param: f'У поля {prefix}{name} нет вложенных полей'})
+
+    for name in list(fields):
+        if name not in readable:
+            continue
+        if (include is not None and name not in include) or (name in exclude and exclude[name] is None):
+            fields.pop(name)
+            continue
+        sub_include = include.get(name) if include is not None else None
+        sub_exclude = exclude.get(name) or {}
+        if sub_include is not None or sub_exclude:
+            prune_fields(fields[name], sub_include, sub_exclude, f'{prefix}{name}.')
+
+
+# Пути для only() и select_related() по оставшимся полям сериализатора.
+# None - если какое-то поле не соответствует колонке модели (тогда запрос не трогаем)
+def column_plan(serializer, model, prefix=''):
+    columns = [prefix + model._meta.pk.name]
+    relations = []
+    for field in serializer.fields.values():
+        if field.write_only:
+            continue
+        if field.source == '*' or '.' in field.source:
+            return None
+        try:
+            model_field = model._meta.get_field(field.source)
+        except FieldDoesNotExist:
+            return None
+        path = prefix + field.source
+        if isinstance(field, serializers.Serializer):
+            if not model_field.is_relation or model_field.many_to_many or model_field.one_to_many:
+                return None
+            nested = column_plan(field, model_field.related_model, path + '__')
+            if nested is None:
+                return None
+            relations.append(path)
+            columns.extend(nested[0])
+            relations.extend(nested[1])
+        elif model_field.is_relation and not model_field.concrete:
+            return None
+        else:
+            columns.append(path)
+    return columns, relations
+
+
+# Подключает ?fields=/?exclude= к спискам и карточкам ModelViewSet
+class SparseFieldsetMixin:
+    fieldset_actions = ('list', 'retrieve')
+    fieldset_required = ()
+
+    def get_fieldset(self):
+        if not hasattr(self, '_fieldset'):
+            self._fieldset = None
+            if self.action in self.fieldset_actions:
+                self._fieldset = Fieldset.from_params(self.request.query_params)
+        return self._fieldset
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            serializer = self.get_serializer_class()(context=self.get_serializer_context())
+            queryset = fieldset.restrict(queryset, serializer, self.fieldset_required)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            fieldset.prune(serializer)
+        return serializer
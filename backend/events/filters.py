@@ -0,0 +1,44 @@
+from datetime import datetime, time
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+
+from .search import search_events
+
+
+def parse_moment(value, param):
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValidationError({param: 'Некорректная дата, ожидается ISO 8601'})
+        moment = datetime.combine(day, time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+# Окно времени из ?from=&to= (полуинтервал [from, to)); любой конец может отсутствовать
+def parse_time_window(params):
+    start = params.get('from')
+    end = params.get('to')
+    start = parse_moment(start, 'from') if start else None
+    end = parse_moment(end, 'to') if end else None
+    if start is not None and end is not None and start >= end:
+        raise ValidationError({'to': 'Конец периода должен быть позже начала'})
+    return start, end
+
+
+def filter_time_window(queryset, params):
+    start, end = parse_time_window(params)
+    if start is None and end is None:
+        return queryset
+    return queryset.overlapping(start, end)
+
+
+def filter_search(queryset, params):
+    text = params.get('q', '').strip()
+    if not text:
+        return queryset
+    return search_events(queryset, text)
@@ -0,0 +1,202 @@
+import csv
+import io
+import json
+
+from django.core.exceptions import ValidationError
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from . import feed
+from .models import Category, Event, Location
+from .search import refresh_search_vectors
+from .stats import event_state, record_event_changes
+from .booking import conflict_message, find_conflicts, is_booking_conflict
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+IMPORT_FIELDS = ('title', 'description', 'start_time', 'end_time', 'is_public', 'category_id', 'location_id')
+TRUE_VALUES = ('1', 'true', 'yes', 'да')
+
+
+def detect_format(filename, default='csv'):
+    name = (filename or '').lower()
+    if name.endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if name.endswith('.csv'):
+        return 'csv'
+    return default
+
+
+# Построчное чтение файла: в памяти одновременно только текущая строка
+def iter_rows(stream, file_format):
+    if isinstance(stream, (io.TextIOBase, io.StringIO)):
+        text = stream
+    else:
+        text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    if file_format == 'csv':
+        for line_number, row in enumerate(csv.DictReader(text), start=2):
+            yield line_number, row
+    elif file_format == 'ndjson':
+        for line_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield line_number, {'__error__': f'Некорректный JSON: {e}'}
+                continue
+            yield line_number, row if isinstance(row, dict) else {'__error__': 'Ожидался JSON-объект'}
+    else:
+        raise ValueError(f'Неподдерживаемый формат: {file_format}')
+
+
+def parse_reference(value):
+    if value in (None, ''):
+        return None
+    return int(value)
+
+
+def parse_bool(value, default=True):
+    if value in (None, ''):
+        return default
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() in TRUE_VALUES
+
+
+# Импорт мероприятий пачками: ссылки на категории/локации проверяются одним
+# запросом на пачку, строки проходят validate_year и Event.clean, запись - bulk_create.
+# Ошибки собираются по строкам и не прерывают импорт файла.
+class EventImporter:
+    def __init__(self, author=None, batch_size=500, max_reported_errors=1000):
+        self.author = author
+        self.batch_size = batch_size
+        self.max_reported_errors = max_reported_errors
+        self.created = 0
+        self.failed = 0
+        self.errors = []
+        self.known_categories = set()
+        self.known_locations = set()
+
+    def run(self, rows):
+        batch = []
+        for line_number, row in rows:
+            batch.append((line_number, row))
+            if len(batch) >= self.batch_size:
+                self.process_batch(batch)
+                batch = []
+        if batch:
+            self.process_batch(batch)
+        if self.created:
+            feed.invalidate()
+        return self.summary()
+
+    def summary(self):
+        return {
+            'created': self.created,
+            'failed': self.failed,
+            'errors': self.errors,
+            'errors_truncated': self.failed > len(self.errors),
+        }
+
+    def add_error(self, line_number, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_reported_errors:
+            self.errors.append({'row': line_number, 'errors': errors})
+
+    def load_references(self, model, ids, known):
+        missing = ids - known
+        if missing:
+            known.update(model.objects.filter(pk__in=missing).values_list('pk', flat=True))
+
+    def build_event(self, row):
+        if '__error__' in row:
+            raise ValidationError({'__all__': [row['__error__']]})
+        errors = {}
+        references = {}
+        for field in ('category_id', 'location_id'):
+            try:
+                references[field] = parse_reference(row.get(field))
+            except (TypeError, ValueError):
+                errors[field] = ['Ожидается числовой идентификатор']
+        if errors:
+            raise ValidationError(errors)
+
+        event = Event(
+            title=row.get('title') or '',
+            description=row.get('description') or 'Описание отсутствует',
+            start_time=row.get('start_time') or None,
+            end_time=row.get('end_time') or None,
+            is_public=parse_bool(row.get('is_public')),
+            author=self.author,
+            **references,
+        )
+        # Связи проверяются пачкой в process_batch, поэтому здесь их пропускаем
+        event.clean_fields(exclude=['author', 'category', 'location', 'search_vector'])
+        # Время без часового пояса считаем заданным в TIME_ZONE проекта
+        for field in ('start_time', 'end_time'):
+            value = getattr(event, field)
+            if timezone.is_naive(value):
+                setattr(event, field, timezone.make_aware(value))
+        event.clean()
+        return event
+
+    def process_batch(self, batch):
+        candidates = []
+        for line_number, row in batch:
+            try:
+                candidates.append((line_number, self.build_event(row)))
+            except ValidationError as e:
+                self.add_error(line_number, e.message_dict if hasattr(e, 'error_dict') else {'__all__': e.messages})
+
+        self.load_references(Category, {e.category_id for _, e in candidates if e.category_id}, self.known_categories)
+        self.load_references(Location, {e.location_id for _, e in candidates if e.location_id}, self.known_locations)
+
+        valid = []
+        for line_number, event in candidates:
+            errors = {}
+            if event.category_id and event.category_id not in self.known_categories:
+                errors['category_id'] = [f'Категория {event.category_id} не найдена']
+            if event.location_id and event.location_id not in self.known_locations:
+                errors['location_id'] = [f'Локация {event.location_id} не найдена']
+            if errors:
+                self.add_error(line_number, errors)
+            else:
+                valid.append((line_number, event))
+
+        # Пересечения по локации - одним запросом на пачку, до bulk_create
+        clashes = find_conflicts([event for _, event in valid])
+        rows = []
+        for index, (line_number, event) in enumerate(valid):
+            if index in clashes:
+                self.add_error(line_number, {'location_id': [conflict_message(clashes[index])]})
+            else:
+                rows.append((line_number, event))
+
+        if not rows:
+            return
+        try:
+            self.insert([event for _, event in rows])
+        except IntegrityError:
+            # Пересекающееся мероприятие вставили параллельно уже после find_conflicts:
+            # пачка откатилась, вставляем её построчно и отмечаем строки с конфликтом
+            self.insert_rows(rows)
+
+    def insert(self, events):
+        with transaction.atomic():
+            created = Event.objects.bulk_create(events)
+            # bulk_create не вызывает сигналы, поэтому поисковый вектор считаем сами
+            refresh_search_vectors(Event.objects.filter(pk__in=[e.pk for e in created if e.pk]))
+            record_event_changes([(None, event_state(e)) for e in created])
+        self.created += len(created)
+
+    def insert_rows(self, rows):
+        for line_number, event in rows:
+            # После отката bulk_create у части объектов мог остаться pk
+            event.pk = None
+            event._state.adding = True
+            try:
+                self.insert([event])
+            except IntegrityError as e:
+                if not is_booking_conflict(e):
+                    raise
+                self.add_error(line_number, {'location_id': ['Локация уже занята в это время']})
@@ -0,0 +1,151 @@
+import logging
+import os
+import socket
+import threading
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+JOB_SETTINGS = {
+    'CONCURRENCY': 4,
+    'POLL_INTERVAL': 1.0,
+    'MAX_ATTEMPTS': 5,
+    'BACKOFF_BASE': 5,
+    'BACKOFF_MAX': 60 * 60,
+    'LOCK_TIMEOUT': 10 * 60,
+    **getattr(settings, 'JOBS', {}),
+}
+
+registry = {}
+failure_handlers = {}
+
+
+# Ошибка, которую бессмысленно повторять: задача сразу помечается failed
+class PermanentJobError(Exception):
+    pass
+
+
+# on_failure(payload, error) вызывается, когда задача окончательно помечена failed:
+# откатывает то, что было сделано до постановки задачи в очередь
+def register(name, on_failure=None):
+    def decorator(func):
+        registry[name] = func
+        if on_failure is not None:
+            failure_handlers[name] = on_failure
+        return func
+    return decorator
+
+
+# Задача пишется в ту же транзакцию, что и данные, поэтому не потеряется и
+# не выполнится раньше коммита
+def enqueue(name, payload=None, user=None, run_at=None, max_attempts=None):
+    if name not in registry:
+        raise KeyError(f'Неизвестная задача: {name}')
+    return Job.objects.create(
+        name=name,
+        payload=payload or {},
+        created_by=user,
+        run_at=run_at or timezone.now(),
+        max_attempts=max_attempts or JOB_SETTINGS['MAX_ATTEMPTS'],
+    )
+
+
+def backoff(attempts):
+    return min(JOB_SETTINGS['BACKOFF_BASE'] * 2 ** (attempts - 1), JOB_SETTINGS['BACKOFF_MAX'])
+
+
+def default_worker_id():
+    return f'{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}'
+
+
+# Забирает следующую готовую задачу. SELECT ... FOR UPDATE SKIP LOCKED позволяет
+# нескольким воркерам опрашивать очередь параллельно, не блокируя друг друга.
+# Задачи, зависшие в running дольше LOCK_TIMEOUT (воркер упал), забираются повторно.
+def acquire(worker_id):
+    now = timezone.now()
+    stale = now - timedelta(seconds=JOB_SETTINGS['LOCK_TIMEOUT'])
+    with transaction.atomic():
+        job = (
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(Q(status='queued', run_at__lte=now) | Q(status='running', locked_at__lt=stale))
+            .order_by('run_at', 'id')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.locked_by = worker_id
+        job.locked_at = now
+        job.attempts += 1
+        job.save(update_fields=['status', 'locked_by', 'locked_at', 'attempts', 'updated_at'])
+    return job
+
+
+def execute(job):
+    handler = registry.get(job.name)
+    try:
+        if handler is None:
+            raise PermanentJobError(f'Неизвестная задача: {job.name}')
+        with transaction.atomic():
+            result = handler(job.payload)
+    except Exception as e:
+        job.last_error = ''.join(traceback.format_exception_only(type(e), e)).strip()
+        if isinstance(e, PermanentJobError) or job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'queued'
+            job.run_at = timezone.now() + timedelta(seconds=backoff(job.attempts))
+        logger.warning('Задача %s завершилась ошибкой (попытка %s): %s', job, job.attempts, job.last_error,
+                       extra={'job_id': job.pk, 'job_name': job.name})
+    else:
+        job.status = 'done'
+        job.result = result
+        job.last_error = ''
+    job.locked_by = ''
+    job.locked_at = None
+    with transaction.atomic():
+        job.save(update_fields=['status', 'result', 'last_error', 'run_at', 'locked_by', 'locked_at', 'updated_at'])
+        if job.status == 'failed' and job.name in failure_handlers:
+            failure_handlers[job.name](job.payload, job.last_error)
+    return job
+
+
+# Выполняет все готовые задачи в текущем потоке (manage.py run_worker --once, тесты)
+def run_pending(worker_id=None, limit=None):
+    worker_id = worker_id or default_worker_id()
+    done = 0
+    while limit is None or done < limit:
+        job = acquire(worker_id)
+        if job is None:
+            break
+        execute(job)
+        done += 1
+    return done
+
+
+def worker_loop(stop_event, worker_id, poll_interval):
+    while not stop_event.is_set():
+        close_old_connections()
+        try:
+            job = acquire(worker_id)
+        except Exception:
+            logger.exception('Ошибка опроса очереди задач')
+            job = None
+        if job is None:
+            stop_event.wait(poll_interval)
+            continue
+        # Ошибка сохранения одной задачи не должна останавливать воркер:
+        # задача останется running и будет забрана повторно через LOCK_TIMEOUT
+        try:
+            execute(job)
+        except Exception:
+            logger.exception('Ошибка выполнения задачи %s', job, extra={'job_id': job.pk, 'job_name': job.name})
+    close_old_connections()
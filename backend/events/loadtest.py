@@ -0,0 +1,317 @@
+import importlib
+import random
+import threading
+import time
+from contextlib import ExitStack
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connections, transaction
+from django.db.models import Max
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from . import feed, stats
+from .models import Category, Event, Location, Request, UserProfile
+from .search import refresh_search_vectors
+
+# Синтетические данные для нагрузочных тестов (manage.py generate_fixtures) и
+# бенчмарк API по ним (manage.py benchmark_api). Всё создаётся через bulk_create
+# пачками, поэтому сигналы не срабатывают: поисковые векторы, сводная статистика,
+# счётчики заявок и снимок ленты пересчитываются в конце явно.
+
+PASSWORD = 'loadtest123'
+CITIES = [
+    'Москва', 'Санкт-Петербург', 'Казань', 'Новосибирск', 'Екатеринбург',
+    'Нижний Новгород', 'Самара', 'Ростов-на-Дону', 'Краснодар', 'Воронеж',
+]
+EVENT_KINDS = [
+    'Концерт', 'Лекция', 'Выставка', 'Мастер-класс', 'Спектакль',
+    'Фестиваль', 'Турнир', 'Встреча', 'Кинопоказ', 'Экскурсия',
+]
+TOPICS = [
+    'джаз', 'история города', 'современное искусство', 'программирование', 'шахматы',
+    'фотография', 'классическая музыка', 'кулинария', 'театр', 'наука',
+]
+# Доли ролей; первый пользователь всегда admin, второй - moderator
+ROLE_WEIGHTS = {'user': 95, 'moderator': 4, 'admin': 1}
+
+
+class FixtureGenerator:
+    def __init__(self, prefix='load', seed=None, batch_size=5000, progress=None):
+        self.prefix = prefix
+        self.random = random.Random(seed)
+        self.batch_size = batch_size
+        self.progress = progress or (lambda message: None)
+
+    def exists(self):
+        return User.objects.filter(username__startswith=f'{self.prefix}_user_').exists()
+
+    def batches(self, total):
+        for start in range(0, total, self.batch_size):
+            yield start, min(self.batch_size, total - start)
+
+    def run(self, users, categories, locations, events, requests):
+        first_event = Event.objects.aggregate(last=Max('id'))['last'] or 0
+        user_ids = self.create_users(users)
+        category_ids = self.create_categories(categories)
+        location_ids = self.create_locations(locations)
+        self.create_events(events, user_ids, category_ids, location_ids)
+        self.create_requests(requests, user_ids, category_ids)
+
+        self.progress('Поисковые векторы, статистика и счётчики заявок')
+        last_event = Event.objects.aggregate(last=Max('id'))['last'] or 0
+        for start in range(first_event + 1, last_event + 1, self.batch_size * 10):
+            refresh_search_vectors(Event.objects.filter(pk__gte=start, pk__lt=start + self.batch_size * 10))
+        stats.reconcile()
+        feed.invalidate()
+        return {
+            'users': len(user_ids), 'categories': len(category_ids), 'locations': len(location_ids),
+            'events': events, 'requests': requests,
+        }
+
+    def create_users(self, total):
+        password = make_password(PASSWORD)
+        roles, weights = zip(*ROLE_WEIGHTS.items())
+        user_ids = []
+        for start, size in self.batches(total):
+            with transaction.atomic():
+                created = User.objects.bulk_create([
+                    User(username=f'{self.prefix}_user_{start + i:07d}', password=password,
+                         email=f'{self.prefix}_user_{start + i:07d}@example.com')
+                    for i in range(size)
+                ])
+                ids = [user.pk for user in created]
+                UserProfile.objects.bulk_create([
+                    UserProfile(user_id=pk, role=(
+                        'admin' if start + i == 0 else 'moderator' if start + i == 1
+                        else self.random.choices(roles, weights)[0]
+                    ))
+                    for i, pk in enumerate(ids)
+                ])
+            user_ids.extend(ids)
+            self.progress(f'Пользователи: {len(user_ids)}/{total}')
+        return user_ids
+
+    def create_categories(self, total):
+        created = Category.objects.bulk_create([
+            Category(name=f'{self.prefix} {TOPICS[i % len(TOPICS)]} {i}', slug=f'{self.prefix}-category-{i}')
+            for i in range(total)
+        ])
+        return [category.pk for category in created]
+
+    def create_locations(self, total):
+        created = Location.objects.bulk_create([
+            Location(
+                name=f'{self.prefix} площадка {i}', city=self.random.choice(CITIES),
+                address=f'ул. Тестовая, {i + 1}', capacity=self.random.choice([50, 100, 300, 1000, 5000]),
+            )
+            for i in range(total)
+        ])
+        return [location.pk for location in created]
+
+    # У каждой локации свой «курсор» времени: следующее мероприятие начинается после
+    # окончания предыдущего, поэтому ограничение на пересечение в локации не нарушается
+    def create_events(self, total, user_ids, category_ids, location_ids):
+        origin = timezone.now().replace(minute=0, second=0, microsecond=0) - timedelta(days=365)
+        cursors = {pk: origin for pk in location_ids}
+        for start, size in self.batches(total):
+            batch = []
+            for i in range(size):
+                number = start + i
+                kind = self.random.choice(EVENT_KINDS)
+                topic = self.random.choice(TOPICS)
+                location_id = self.random.choice(location_ids) if location_ids and self.random.random() < 0.9 else None
+                duration = timedelta(minutes=self.random.choice([60, 90, 120, 180, 240]))
+                if location_id is not None:
+                    begins = cursors[location_id] + timedelta(minutes=self.random.choice([0, 30, 60, 120, 240]))
+                    cursors[location_id] = begins + duration
+                else:
+                    begins = origin + timedelta(hours=self.random.randrange(24 * 730))
+                batch.append(Event(
+                    title=f'{kind}: {topic} #{number}',
+                    description=f'{kind} для всех, кому интересна тема «{topic}».',
+                    start_time=begins, end_time=begins + duration,
+                    author_id=self.random.choice(user_ids) if user_ids else None,
+                    location_id=location_id,
+                    category_id=self.random.choice(category_ids) if category_ids and self.random.random() < 0.95 else None,
+                    is_public=self.random.random() < 0.85,
+                ))
+            with transaction.atomic():
+                Event.objects.bulk_create(batch)
+            self.progress(f'Мероприятия: {start + size}/{total}')
+
+    # Ожидающие модерации заявки: в основном на создание мероприятий, без локации,
+    # чтобы одобрение не упиралось в занятость площадок
+    def create_requests(self, total, user_ids, category_ids):
+        if not user_ids:
+            return
+        begins = timezone.now() + timedelta(days=30)
+        for start, size in self.batches(total):
+            batch = []
+            for i in range(size):
+                number = start + i
+                kind = self.random.random()
+                if kind < 0.8:
+                    data = {
+                        'title': f'{self.random.choice(EVENT_KINDS)}: заявка #{number}',
+                        'description': 'Новое мероприятие',
+                        'start_time': (begins + timedelta(hours=number)).isoformat(),
+                        'end_time': (begins + timedelta(hours=number + 2)).isoformat(),
+                        'category_id': self.random.choice(category_ids) if category_ids else None,
+                        'location_id': None,
+                        'is_public': True,
+                    }
+                    request_type = 'event'
+                elif kind < 0.9:
+                    data, request_type = {'name': f'{self.prefix} новая категория {number}'}, 'category'
+                else:
+                    data, request_type = {'name': f'{self.prefix} новая площадка {number}', 'city': self.random.choice(CITIES)}, 'location'
+                batch.append(Request(user_id=self.random.choice(user_ids), request_type=request_type, action='create', data=data))
+            with transaction.atomic():
+                Request.objects.bulk_create(batch)
+            self.progress(f'Заявки: {start + size}/{total}')
+
+
+# Эндпоинты бенчмарка: список и карточка (последний объект) каждого ресурса роутера
+# и публичная лента; имена как у маршрутов в /metrics
+def discover_endpoints():
+    router = importlib.import_module(settings.ROOT_URLCONF).router
+    endpoints = {}
+    for prefix, viewset, basename in router.registry:
+        endpoints[f'{basename}-list'] = f'/api/{prefix}/'
+        pk = viewset.queryset.model._default_manager.order_by('-pk').values_list('pk', flat=True).first()
+        if pk is not None:
+            endpoints[f'{basename}-detail'] = f'/api/{prefix}/{pk}/'
+    endpoints['public-events'] = '/api/public-events/'
+    return endpoints
+
+
+def percentile(values, q):
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def make_client(host):
+    return Client(HTTP_HOST=host, HTTP_ACCEPT='application/json', raise_request_exception=False)
+
+
+def fetch(client, path, headers):
+    started = time.perf_counter()
+    response = client.get(path, **headers)
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    return time.perf_counter() - started, response.status_code
+
+
+# Число SQL-запросов одного запроса после прогрева (кэш токенов и снимки уже заполнены)
+def count_queries(client, path, headers):
+    fetch(client, path, headers)
+    with ExitStack() as stack:
+        captured = [stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections]
+        fetch(client, path, headers)
+    return sum(len(capture.captured_queries) for capture in captured)
+
+
+# requests запросов в concurrency потоков; у каждого потока свой Client и свои соединения.
+# При concurrency = 1 всё идёт в текущем потоке
+def measure(path, requests, concurrency, headers, host):
+    timings = []
+    errors = []
+    lock = threading.Lock()
+
+    def worker(count, own_thread):
+        client = make_client(host)
+        local_timings, local_errors = [], 0
+        try:
+            for _ in range(count):
+                elapsed, status = fetch(client, path, headers)
+                local_timings.append(elapsed)
+                local_errors += status >= 400
+        finally:
+            if own_thread:
+                connections.close_all()
+        with lock:
+            timings.extend(local_timings)
+            errors.append(local_errors)
+
+    shares = [requests // concurrency + (i < requests % concurrency) for i in range(concurrency)]
+    started = time.perf_counter()
+    if concurrency == 1:
+        worker(requests, own_thread=False)
+    else:
+        threads = [threading.Thread(target=worker, args=(share, True)) for share in shares if share]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    wall = time.perf_counter() - started
+    return {
+        'requests': len(timings),
+        'errors': sum(errors),
+        'mean_ms': round(sum(timings) / len(timings) * 1000, 2) if timings else 0.0,
+        'p50_ms': round(percentile(timings, 50) * 1000, 2),
+        'p95_ms': round(percentile(timings, 95) * 1000, 2),
+        'p99_ms': round(percentile(timings, 99) * 1000, 2),
+        'rps': round(len(timings) / wall, 1) if wall else 0.0,
+    }
+
+
+def run_benchmark(token, requests=200, concurrency=4, host='localhost', only=None, progress=None):
+    progress = progress or (lambda message: None)
+    headers = {'HTTP_AUTHORIZATION': f'Token {token}'}
+    endpoints = discover_endpoints()
+    results = {}
+    for name, path in endpoints.items():
+        if only and name not in only:
+            continue
+        result = {'path': path, 'queries': count_queries(make_client(host), path, headers)}
+        result.update(measure(path, requests, concurrency, headers, host))
+        results[name] = result
+        progress(f"{name}: p95 {result['p95_ms']} мс, {result['rps']} запр/с, запросов к БД {result['queries']}")
+    return {
+        'created_at': timezone.now().isoformat(),
+        'database': connections['default'].vendor,
+        'scale': {
+            'events': Event.objects.count(),
+            'users': User.objects.count(),
+            'requests': Request.objects.count(),
+        },
+        'requests': requests,
+        'concurrency': concurrency,
+        'endpoints': results,
+    }
+
+
+# Сравнение с базовым прогоном. Регрессия: p95 выросло больше чем на threshold
+# (и больше чем на min_delta_ms - шум на быстрых эндпоинтах), пропускная способность
+# упала больше чем на threshold, стало больше SQL-запросов или появились ошибки
+def compare(results, baseline, threshold=0.2, min_delta_ms=2.0):
+    rows = []
+    for name, current in results['endpoints'].items():
+        base = baseline.get('endpoints', {}).get(name)
+        if base is None:
+            rows.append({'endpoint': name, 'status': 'new', 'problems': []})
+            continue
+        problems = []
+        if current['p95_ms'] > base['p95_ms'] * (1 + threshold) and current['p95_ms'] - base['p95_ms'] > min_delta_ms:
+            problems.append(f"p95 {base['p95_ms']} -> {current['p95_ms']} мс")
+        if current['rps'] < base['rps'] * (1 - threshold):
+            problems.append(f"запр/с {base['rps']} -> {current['rps']}")
+        if current['queries'] > base['queries']:
+            problems.append(f"запросов к БД {base['queries']} -> {current['queries']}")
+        if current['errors'] > base['errors']:
+            problems.append(f"ошибок {base['errors']} -> {current['errors']}")
+        rows.append({
+            'endpoint': name,
+            'status': 'regression' if problems else 'ok',
+            'p95_change': round(current['p95_ms'] / base['p95_ms'] - 1, 3) if base['p95_ms'] else None,
+            'problems': problems,
+        })
+    return rows
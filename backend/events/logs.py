@@ -0,0 +1,213 @@
+import contextvars
+import copy
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import re
+import sys
+import time
+import uuid
+from datetime import datetime, timezone
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.functional import SimpleLazyObject, empty
+
+# Структурные логи: JSON-строки с request_id, пользователем и маршрутом текущего запроса.
+# RequestLogMiddleware заводит контекст запроса (X-Request-ID из заголовка или новый),
+# пишет по строке на запрос в логгер events.requests и возвращает X-Request-ID в ответе.
+# Записи ниже WARNING внутри запроса проходят только у запросов, попавших в выборку
+# SAMPLE_RATE; ошибки, медленные запросы (SLOW_MS) и всё вне запросов пишутся всегда.
+# QueuedStreamHandler только кладёт запись в очередь, JSON собирается и пишется
+# в отдельном потоке.
+
+logger = logging.getLogger('events.requests')
+
+REQUEST_ID_PATTERN = re.compile(r'^[\w.\-]{1,64}$')
+
+_context = contextvars.ContextVar('request_log_context', default=None)
+
+# Атрибуты, которые есть у любой LogRecord; всё остальное пришло через extra=.
+# request (django.request) не выводится: его заменяют поля контекста
+RECORD_ATTRS = set(vars(logging.LogRecord('', 0, '', 0, '', None, None))) | {'message', 'asctime', 'request'}
+
+
+def logging_settings():
+    config = {'SAMPLE_RATE': 1.0, 'SLOW_MS': 1000, 'QUEUE_SIZE': 10000}
+    config.update(getattr(settings, 'REQUEST_LOGGING', {}))
+    return config
+
+
+def request_id_from(request):
+    value = request.META.get('HTTP_X_REQUEST_ID', '')
+    return value if REQUEST_ID_PATTERN.match(value) else uuid.uuid4().hex
+
+
+# Пользователь без лишних запросов: ленивый request.user из сессии не вычисляется,
+# токен DRF к этому моменту уже подставил настоящего пользователя
+def request_user_id(request):
+    user = getattr(request, 'user', None)
+    if user is None or (isinstance(user, SimpleLazyObject) and user._wrapped is empty):
+        return None
+    return user.pk if user.is_authenticated else None
+
+
+class RequestContext:
+    def __init__(self, request, sampled):
+        self.request = request
+        self.request_id = request_id_from(request)
+        self.sampled = sampled
+
+    def fields(self):
+        match = getattr(self.request, 'resolver_match', None)
+        return {
+            'request_id': self.request_id,
+            'user_id': request_user_id(self.request),
+            'route': match.view_name if match is not None else None,
+            'method': self.request.method,
+            'path': self.request.path,
+        }
+
+
+# django.request пишет ошибки уже после middleware, поэтому контекст ищется и на record.request
+def record_context(record):
+    context = _context.get()
+    if context is None:
+        context = getattr(getattr(record, 'request', None), 'log_context', None)
+    return context
+
+
+class RequestContextFilter(logging.Filter):
+    def filter(self, record):
+        context = record_context(record)
+        if context is not None:
+            for name, value in context.fields().items():
+                if not hasattr(record, name):
+                    setattr(record, name, value)
+        return True
+
+
+class SamplingFilter(logging.Filter):
+    def filter(self, record):
+        context = record_context(record)
+        return context is None or context.sampled or record.levelno >= logging.WARNING
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        data = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for name, value in record.__dict__.items():
+            if name not in RECORD_ATTRS and not name.startswith('_'):
+                data[name] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            data['exception'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+# Запись уходит в очередь, JSON собирается и пишется потоком QueueListener.
+# Сообщение и трейсбек фиксируются сразу (аргументы могут измениться),
+# при переполнении очереди записи отбрасываются и считаются в dropped
+class QueuedStreamHandler(logging.handlers.QueueHandler):
+    def __init__(self, stream=None, capacity=None):
+        super().__init__(queue.Queue(capacity or logging_settings()['QUEUE_SIZE']))
+        self.target = logging.StreamHandler(stream or sys.stderr)
+        self.dropped = 0
+        self.listener = logging.handlers.QueueListener(self.queue, self.target)
+        self.listener.start()
+
+    def setFormatter(self, fmt):
+        self.target.setFormatter(fmt)
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    # Ждёт, пока поток запишет всё из очереди
+    def flush(self):
+        if self.listener._thread is not None:
+            self.queue.join()
+        self.target.flush()
+
+    # Вызывается logging.shutdown() при выходе: поток дописывает очередь и завершается
+    def close(self):
+        if self.listener._thread is not None:
+            self.listener.stop()
+        super().close()
+
+
+def log_request(context, response, duration):
+    config = logging_settings()
+    duration_ms = round(duration * 1000, 2)
+    if response.status_code >= 500:
+        level = logging.ERROR
+    elif duration_ms >= config['SLOW_MS']:
+        level = logging.WARNING
+    else:
+        level = logging.INFO
+    logger.log(level, '%s %s %s', context.request.method, context.request.path, response.status_code, extra={
+        'status': response.status_code,
+        'duration_ms': duration_ms,
+    })
+
+
+# Стоит первым в MIDDLEWARE: контекст виден остальным middleware и их логам
+class RequestLogMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def start(self, request):
+        context = RequestContext(request, random.random() < logging_settings()['SAMPLE_RATE'])
+        request.log_context = context
+        return context, _context.set(context)
+
+    def finish(self, context, response, start):
+        log_request(context, response, time.perf_counter() - start)
+        response['X-Request-ID'] = context.request_id
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        context, token = self.start(request)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+            self.finish(context, response, start)
+        finally:
+            _context.reset(token)
+        return response
+
+    async def __acall__(self, request):
+        context, token = self.start(request)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+            self.finish(context, response, start)
+        finally:
+            _context.reset(token)
+        return response
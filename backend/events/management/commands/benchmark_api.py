@@ -0,0 +1,79 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.authtoken.models import Token
+
+from events.loadtest import compare, run_benchmark
+
+
+# Бенчмарк эндпоинтов роутера и публичной ленты in-process (без HTTP-сервера):
+# задержки p50/p95/p99, запросов в секунду и число SQL-запросов на эндпоинт.
+# --save сохраняет результат как базовый, --baseline сравнивает с ним и завершается
+# ошибкой при регрессии (для CI). Данные - manage.py generate_fixtures
+class Command(BaseCommand):
+    help = 'Бенчмарк API с сохранением базового результата и сравнением с ним'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200, help='Запросов на эндпоинт')
+        parser.add_argument('--concurrency', type=int, default=4, help='Параллельных клиентов')
+        parser.add_argument('--user', help='Имя пользователя для токена (по умолчанию - первый admin)')
+        parser.add_argument('--endpoint', action='append', help='Только указанные эндпоинты (event-list, public-events, ...)')
+        parser.add_argument('--host', default='localhost')
+        parser.add_argument('--save', metavar='PATH', help='Сохранить результат в JSON')
+        parser.add_argument('--baseline', metavar='PATH', help='Сравнить с сохранённым результатом')
+        parser.add_argument('--threshold', type=float, default=0.2, help='Допустимое ухудшение (0.2 = 20%%)')
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--requests и --concurrency должны быть положительными')
+        baseline = None
+        if options['baseline']:
+            try:
+                with open(options['baseline'], encoding='utf-8') as stream:
+                    baseline = json.load(stream)
+            except (OSError, ValueError) as e:
+                raise CommandError(f'Не удалось прочитать базовый результат: {e}')
+            if baseline.get('concurrency') != options['concurrency']:
+                raise CommandError(f"Базовый результат снят с --concurrency {baseline.get('concurrency')}")
+
+        token = self.get_token(options['user'])
+        results = run_benchmark(
+            token, requests=options['requests'], concurrency=options['concurrency'],
+            host=options['host'], only=options['endpoint'],
+        )
+
+        self.stdout.write(f"{'эндпоинт':<20}{'p50, мс':>10}{'p95, мс':>10}{'p99, мс':>10}{'запр/с':>10}{'SQL':>6}{'ошибки':>8}")
+        for name, row in results['endpoints'].items():
+            self.stdout.write(
+                f"{name:<20}{row['p50_ms']:>10}{row['p95_ms']:>10}{row['p99_ms']:>10}"
+                f"{row['rps']:>10}{row['queries']:>6}{row['errors']:>8}"
+            )
+
+        if options['save']:
+            with open(options['save'], 'w', encoding='utf-8') as stream:
+                json.dump(results, stream, ensure_ascii=False, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Результат сохранён в {options['save']}"))
+
+        if baseline is not None:
+            if baseline.get('database') != results['database']:
+                raise CommandError(f"Базовый результат снят на другой СУБД ({baseline.get('database')})")
+            rows = compare(results, baseline, options['threshold'])
+            regressions = [row for row in rows if row['status'] == 'regression']
+            for row in rows:
+                change = f"{row['p95_change']:+.1%}" if row.get('p95_change') is not None else '-'
+                self.stdout.write(f"{row['endpoint']:<20}{row['status']:>12}  p95 {change}  {'; '.join(row['problems'])}")
+            if regressions:
+                raise CommandError(f'Регрессия на {len(regressions)} эндпоинтах: ' + ', '.join(row['endpoint'] for row in regressions))
+            self.stdout.write(self.style.SUCCESS('Регрессий нет'))
+
+    def get_token(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+            if user is None:
+                raise CommandError(f'Пользователь {username} не найден')
+        else:
+            user = User.objects.filter(userprofile__role='admin').order_by('pk').first()
+            if user is None:
+                raise CommandError('Нет пользователя с ролью admin: сначала запустите generate_fixtures')
+        return Token.objects.get_or_create(user=user)[0].key
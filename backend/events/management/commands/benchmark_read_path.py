@@ -0,0 +1,127 @@
+import asyncio
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlsplit
+
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand
+from django.core.wsgi import get_wsgi_application
+
+
+# Сравнение WSGI и ASGI под множеством медленных клиентов без внешнего сервера:
+# приложения вызываются напрямую, а медленный клиент моделируется задержкой при
+# получении тела ответа. В WSGI эта задержка держит поток воркера (как у
+# gunicorn sync/gthread), в ASGI - только корутину запроса.
+class Command(BaseCommand):
+    help = 'Бенчмарк read-эндпоинтов: WSGI (пул потоков) против ASGI при медленных клиентах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default='/api/public-events/?page_size=20')
+        parser.add_argument('--clients', type=int, default=200, help='Число одновременных клиентов')
+        parser.add_argument('--client-delay', type=float, default=0.2, help='Сколько клиент читает ответ, с')
+        parser.add_argument('--wsgi-threads', type=int, default=8, help='Потоков WSGI-воркера')
+        parser.add_argument('--token', help='Токен для эндпоинтов, требующих входа')
+        parser.add_argument('--host', default='localhost')
+
+    def handle(self, *args, **options):
+        url = urlsplit(options['path'])
+        headers = [(b'host', options['host'].encode()), (b'accept', b'application/json')]
+        if options['token']:
+            headers.append((b'authorization', f"Token {options['token']}".encode()))
+        self.request = {'path': url.path, 'query': url.query, 'headers': headers}
+
+        rows = [
+            ('WSGI', *self.run_wsgi(options['clients'], options['client_delay'], options['wsgi_threads'])),
+            ('ASGI', *self.run_asgi(options['clients'], options['client_delay'])),
+        ]
+        self.stdout.write(f"{options['clients']} клиентов, чтение ответа {options['client_delay']} с, {options['path']}")
+        self.stdout.write(f"{'режим':<6}{'время, с':>10}{'запр/с':>10}{'p50, мс':>10}{'p95, мс':>10}{'ошибки':>8}")
+        for mode, total, latencies, errors in rows:
+            self.stdout.write(
+                f'{mode:<6}{total:>10.2f}{len(latencies) / total:>10.1f}'
+                f'{percentile(latencies, 50):>10.0f}{percentile(latencies, 95):>10.0f}{errors:>8}'
+            )
+
+    def run_wsgi(self, clients, delay, threads):
+        application = get_wsgi_application()
+        environ = {
+            'REQUEST_METHOD': 'GET',
+            'PATH_INFO': self.request['path'],
+            'QUERY_STRING': self.request['query'],
+            'SERVER_NAME': 'localhost',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.version': (1, 0),
+        }
+        for name, value in self.request['headers']:
+            environ['HTTP_' + name.decode().upper().replace('-', '_')] = value.decode()
+
+        def client(started):
+            status = []
+            body = application(dict(environ, **{'wsgi.input': BytesIO()}), lambda s, h, e=None: status.append(s))
+            for _ in body:
+                pass
+            time.sleep(delay)
+            if hasattr(body, 'close'):
+                body.close()
+            return time.perf_counter() - started, not status[0].startswith('200')
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            results = list(pool.map(client, [time.perf_counter()] * clients))
+        return time.perf_counter() - started, [r[0] for r in results], sum(r[1] for r in results)
+
+    def run_asgi(self, clients, delay):
+        application = get_asgi_application()
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': self.request['path'], 'raw_path': self.request['path'].encode(),
+            'query_string': self.request['query'].encode(), 'headers': self.request['headers'],
+            'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+        }
+
+        async def client(started):
+            status = []
+            requested = False
+            finished = asyncio.Event()
+
+            # Тело запроса пустое; дальше клиент "висит" до конца ответа, затем отключается
+            async def receive():
+                nonlocal requested
+                if not requested:
+                    requested = True
+                    return {'type': 'http.request', 'body': b'', 'more_body': False}
+                await finished.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    status.append(message['status'])
+                elif not message.get('more_body'):
+                    await asyncio.sleep(delay)
+                    finished.set()
+
+            await application(dict(scope), receive, send)
+            return time.perf_counter() - started, status[0] != 200
+
+        async def run():
+            started = time.perf_counter()
+            results = await asyncio.gather(*(client(started) for _ in range(clients)))
+            return time.perf_counter() - started, [r[0] for r in results], sum(r[1] for r in results)
+
+        return asyncio.run(run())
+
+
+def percentile(values, q):
+    if len(values) < 2:
+        return values[0] * 1000 if values else 0
+    return statistics.quantiles(values, n=100)[q - 1] * 1000
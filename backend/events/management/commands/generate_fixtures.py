@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from events.loadtest import PASSWORD, FixtureGenerator
+
+
+class Command(BaseCommand):
+    help = 'Генерация синтетических данных для нагрузочного тестирования (пользователи, справочники, мероприятия, заявки)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--categories', type=int, default=50)
+        parser.add_argument('--locations', type=int, default=200)
+        parser.add_argument('--events', type=int, default=100000)
+        parser.add_argument('--requests', type=int, default=5000, help='Ожидающих модерации заявок')
+        parser.add_argument('--prefix', default='load', help='Префикс имён пользователей, категорий и локаций')
+        parser.add_argument('--seed', type=int, help='Seed генератора для воспроизводимых данных')
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        for name in ('users', 'categories', 'locations', 'events', 'requests', 'batch_size'):
+            if options[name] < 0 or (name == 'batch_size' and options[name] == 0):
+                raise CommandError(f'Недопустимое значение --{name.replace("_", "-")}')
+        if options['users'] == 0 and (options['events'] or options['requests']):
+            raise CommandError('Для мероприятий и заявок нужен хотя бы один пользователь')
+
+        generator = FixtureGenerator(
+            prefix=options['prefix'], seed=options['seed'], batch_size=options['batch_size'],
+            progress=self.stdout.write,
+        )
+        if generator.exists():
+            raise CommandError(f"Данные с префиксом {options['prefix']} уже есть: укажите другой --prefix или чистую БД")
+        summary = generator.run(
+            options['users'], options['categories'], options['locations'], options['events'], options['requests'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"Пользователей: {summary['users']}, категорий: {summary['categories']}, локаций: {summary['locations']}, "
+            f"мероприятий: {summary['events']}, заявок: {summary['requests']}. "
+            f"Пароль пользователей: {PASSWORD}, администратор: {options['prefix']}_user_0000000"
+        ))
@@ -0,0 +1,35 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from events.importers import EventImporter, IMPORT_FORMATS, detect_format, iter_rows
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт мероприятий из CSV или NDJSON с проверкой пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Путь к файлу')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Формат файла (по умолчанию - по расширению)')
+        parser.add_argument('--author', help='Имя пользователя-автора мероприятий')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        author = None
+        if options['author']:
+            try:
+                author = User.objects.get(username=options['author'])
+            except User.DoesNotExist:
+                raise CommandError(f"Пользователь {options['author']} не найден")
+
+        file_format = options['format'] or detect_format(options['path'])
+        importer = EventImporter(author=author, batch_size=options['batch_size'])
+        with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+            summary = importer.run(iter_rows(stream, file_format))
+
+        for error in summary['errors']:
+            self.stderr.write(f"Строка {error['row']}: {error['errors']}")
+        if summary['errors_truncated']:
+            self.stderr.write('Показаны не все ошибки')
+        self.stdout.write(self.style.SUCCESS(
+            f"Создано: {summary['created']}, с ошибками: {summary['failed']}"
+        ))
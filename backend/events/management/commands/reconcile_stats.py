@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from events.stats import reconcile
+
+
+class Command(BaseCommand):
+    help = 'Пересчёт сводной статистики и счётчиков заявок из исходных таблиц (запускать по ночам из cron)'
+
+    def handle(self, *args, **options):
+        result = reconcile()
+        self.stdout.write(self.style.SUCCESS(
+            f"Статистика мероприятий: {result['event_stats']} строк, модераторов: {result['reviewer_stats']} строк"
+        ))
@@ -0,0 +1,44 @@
+import signal
+import threading
+
+from django.core.management.base import BaseCommand
+
+from events.jobs import JOB_SETTINGS, default_worker_id, run_pending, worker_loop
+
+
+class Command(BaseCommand):
+    help = 'Запускает воркер очереди фоновых задач (таблица events_job)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=JOB_SETTINGS['CONCURRENCY'], help='Число потоков')
+        parser.add_argument('--poll-interval', type=float, default=JOB_SETTINGS['POLL_INTERVAL'], help='Пауза при пустой очереди, с')
+        parser.add_argument('--once', action='store_true', help='Выполнить готовые задачи и выйти')
+
+    def handle(self, *args, **options):
+        if options['once']:
+            done = run_pending()
+            self.stdout.write(self.style.SUCCESS(f'Выполнено задач: {done}'))
+            return
+
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            self.stdout.write('Остановка воркера...')
+            stop_event.set()
+
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+
+        threads = []
+        for number in range(max(1, options['concurrency'])):
+            thread = threading.Thread(
+                target=worker_loop,
+                args=(stop_event, f'{default_worker_id()}:{number}', options['poll_interval']),
+                name=f'job-worker-{number}',
+            )
+            thread.start()
+            threads.append(thread)
+        self.stdout.write(self.style.SUCCESS(f"Воркер запущен, потоков: {len(threads)}"))
+        for thread in threads:
+            while thread.is_alive():
+                thread.join(timeout=1)
@@ -0,0 +1,276 @@
+import bisect
+import contextvars
+import logging
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse, HttpResponseForbidden
+from django.views.decorators.http import require_safe
+
+logger = logging.getLogger(__name__)
+
+# Метрики по маршрутам (имя из resolver_match: event-list, request-detail, public-events):
+# гистограммы времени ответа, числа SQL-запросов и размера ответа, суммарное время
+# в БД, число ответов по статусам и подозрения на N+1 - один и тот же SQL-шаблон
+# повторился за запрос N_PLUS_ONE_THRESHOLD раз и больше. Данные копятся в памяти
+# процесса и отдаются в формате Prometheus на /metrics; при нескольких воркерах
+# Prometheus опрашивает каждый процесс отдельно.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576)
+UNMATCHED = '<unmatched>'
+
+_collector = contextvars.ContextVar('request_metrics', default=None)
+
+
+def metrics_settings():
+    config = {'ENABLED': True, 'N_PLUS_ONE_THRESHOLD': 10, 'ALLOWED_IPS': ['127.0.0.1', '::1']}
+    config.update(getattr(settings, 'REQUEST_METRICS', {}))
+    return config
+
+
+# SQL одного запроса. Шаблон - текст с плейсхолдерами до подстановки параметров,
+# поэтому запросы одного цикла с разными id совпадают
+class QueryCollector:
+    def __init__(self):
+        self.count = 0
+        self.time = 0.0
+        self.templates = {}
+
+    def add(self, sql, duration):
+        self.count += 1
+        self.time += duration
+        self.templates[sql] = self.templates.get(sql, 0) + 1
+
+    def repeated(self, threshold):
+        return {sql: count for sql, count in self.templates.items() if count >= threshold}
+
+
+def capture_query(execute, sql, params, many, context):
+    collector = _collector.get()
+    if collector is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        collector.add(sql, time.perf_counter() - start)
+
+
+def install_wrapper(sender, connection, **kwargs):
+    if capture_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(capture_query)
+
+
+connection_created.connect(install_wrapper, dispatch_uid='events.metrics.install_wrapper')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+def copy_histograms(histograms):
+    return {
+        route: (histogram.buckets, list(histogram.counts), histogram.sum, histogram.count)
+        for route, histogram in histograms.items()
+    }
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        self.latency = {}
+        self.queries = {}
+        self.sizes = {}
+        self.db_time = {}
+        self.responses = {}
+        self.n_plus_one = {}
+
+    def record(self, route, status, duration, collector, size, suspected):
+        with self._lock:
+            self.latency.setdefault(route, Histogram(LATENCY_BUCKETS)).observe(duration)
+            self.queries.setdefault(route, Histogram(QUERY_BUCKETS)).observe(collector.count)
+            self.db_time[route] = self.db_time.get(route, 0.0) + collector.time
+            key = (route, status)
+            self.responses[key] = self.responses.get(key, 0) + 1
+            if size is not None:
+                self.sizes.setdefault(route, Histogram(SIZE_BUCKETS)).observe(size)
+            if suspected:
+                self.n_plus_one[route] = self.n_plus_one.get(route, 0) + 1
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'latency': copy_histograms(self.latency),
+                'queries': copy_histograms(self.queries),
+                'sizes': copy_histograms(self.sizes),
+                'db_time': dict(self.db_time),
+                'responses': dict(self.responses),
+                'n_plus_one': dict(self.n_plus_one),
+            }
+
+
+registry = Registry()
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match is not None else UNMATCHED
+
+
+def response_size(response):
+    if response.streaming:
+        return None
+    return len(response.content)
+
+
+def record_request(request, response, duration, collector):
+    route = route_name(request)
+    repeated = collector.repeated(metrics_settings()['N_PLUS_ONE_THRESHOLD'])
+    for sql, count in repeated.items():
+        logger.warning('Возможный N+1 на %s: запрос повторился %s раз: %s', route, count, sql[:300])
+    registry.record(route, response.status_code, duration, collector, response_size(response), bool(repeated))
+
+
+# Стоит первым в MIDDLEWARE, чтобы время включало остальные middleware.
+# Запросы потоковых ответов, выполненные после возврата ответа, не учитываются
+class RequestMetricsMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        if not metrics_settings()['ENABLED']:
+            return self.get_response(request)
+        collector = QueryCollector()
+        token = _collector.set(collector)
+        start = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            _collector.reset(token)
+        record_request(request, response, time.perf_counter() - start, collector)
+        return response
+
+    async def __acall__(self, request):
+        if not metrics_settings()['ENABLED']:
+            return await self.get_response(request)
+        collector = QueryCollector()
+        token = _collector.set(collector)
+        start = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            _collector.reset(token)
+        record_request(request, response, time.perf_counter() - start, collector)
+        return response
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def format_number(value):
+    if isinstance(value, float):
+        return repr(round(value, 6))
+    return str(value)
+
+
+def render_histograms(lines, name, help_text, histograms):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} histogram')
+    for route, (buckets, counts, total, count) in sorted(histograms.items()):
+        label = f'route="{escape_label(route)}"'
+        cumulative = 0
+        for bound, bucket_count in zip(buckets, counts):
+            cumulative += bucket_count
+            lines.append(f'{name}_bucket{{{label},le="{bound}"}} {cumulative}')
+        lines.append(f'{name}_bucket{{{label},le="+Inf"}} {count}')
+        lines.append(f'{name}_sum{{{label}}} {format_number(total)}')
+        lines.append(f'{name}_count{{{label}}} {count}')
+
+
+def render_counters(lines, name, help_text, values, labels=('route',)):
+    lines.append(f'# HELP {name} {help_text}')
+    lines.append(f'# TYPE {name} counter')
+    for key, value in sorted(values.items()):
+        key = key if isinstance(key, tuple) else (key,)
+        label = ','.join(f'{label}="{escape_label(part)}"' for label, part in zip(labels, key))
+        lines.append(f'{name}{{{label}}} {format_number(value)}')
+
+
+# Пул соединений с БД (events/dbpool.py) - gauge по каждому алиасу
+def render_pool(lines):
+    from .dbpool import pool_stats
+
+    gauges = {'size': [], 'in_use': [], 'waiting': []}
+    counters = {'checkout_wait_ms_total': [], 'checkout_timeouts': []}
+    opened = []
+    checkouts = []
+    for alias, stats in sorted(pool_stats().items()):
+        opened.append((alias, stats['connections_opened']))
+        pool = stats.get('pool')
+        if pool is None:
+            continue
+        checkouts.append((alias, stats['connection_checkouts']))
+        for name, values in (*gauges.items(), *counters.items()):
+            values.append((alias, pool[name]))
+    lines.append('# HELP db_connections_opened_total Физические соединения, открытые процессом (в режиме пула - самим пулом)')
+    lines.append('# TYPE db_connections_opened_total counter')
+    lines.extend(f'db_connections_opened_total{{alias="{alias}"}} {value}' for alias, value in opened)
+    if checkouts:
+        lines.append('# HELP db_connection_checkouts_total Выдачи соединений из пула (растут с каждым запросом)')
+        lines.append('# TYPE db_connection_checkouts_total counter')
+        lines.extend(f'db_connection_checkouts_total{{alias="{alias}"}} {value}' for alias, value in checkouts)
+    for name, values in gauges.items():
+        if values:
+            lines.append(f'# TYPE db_pool_{name} gauge')
+            lines.extend(f'db_pool_{name}{{alias="{alias}"}} {value}' for alias, value in values)
+    for name, values in counters.items():
+        if values:
+            lines.append(f'# TYPE db_pool_{name} counter')
+            lines.extend(f'db_pool_{name}{{alias="{alias}"}} {value}' for alias, value in values)
+
+
+def render():
+    snapshot = registry.snapshot()
+    lines = []
+    render_histograms(lines, 'http_request_duration_seconds', 'Время ответа', snapshot['latency'])
+    render_histograms(lines, 'http_request_db_queries', 'SQL-запросов за запрос', snapshot['queries'])
+    render_histograms(lines, 'http_response_size_bytes', 'Размер ответа (без потоковых)', snapshot['sizes'])
+    render_counters(lines, 'http_request_db_seconds_total', 'Время в БД', snapshot['db_time'])
+    render_counters(lines, 'http_responses_total', 'Ответы по статусам', snapshot['responses'], ('route', 'status'))
+    render_counters(lines, 'http_request_n_plus_one_total', 'Запросы с повторяющимся SQL-шаблоном', snapshot['n_plus_one'])
+    render_pool(lines)
+    return '\n'.join(lines) + '\n'
+
+
+@require_safe
+def metrics_view(request):
+    allowed = metrics_settings()['ALLOWED_IPS']
+    if allowed and request.META.get('REMOTE_ADDR') not in allowed:
+        return HttpResponseForbidden()
+    return HttpResponse(render(), content_type='text/plain; version=0.0.4; charset=utf-8')
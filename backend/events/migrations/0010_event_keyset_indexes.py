@@ -0,0 +1,23 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:01
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0009_delete_eventparticipant'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(fields=['start_time', 'id'], name='event_start_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='event',
+            index=models.Index(condition=models.Q(('is_public', True)), fields=['start_time', 'id'], name='event_public_start_id_idx'),
+        ),
+    ]
@@ -0,0 +1,55 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:05
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Перед CHECK (end_time > start_time) ищем строки, которые его нарушат, и называем их,
+# вместо непонятной ошибки СУБД посреди миграции
+def check_event_spans(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    broken = list(
+        Event.objects.using(schema_editor.connection.alias)
+        .filter(end_time__lte=models.F('start_time'))
+        .order_by('id').values_list('id', flat=True)[:50]
+    )
+    if broken:
+        raise RuntimeError(
+            f'Найдены мероприятия с end_time не позже start_time: {", ".join(map(str, broken))}. '
+            'Исправьте их даты (например, UPDATE events_event SET end_time = start_time + interval \'1 hour\' '
+            'WHERE end_time <= start_time) и повторите миграцию.'
+        )
+
+
+# GiST-индекс по tstzrange(start_time, end_time) для запросов пересечения с окном времени.
+# Выражение есть только в PostgreSQL, на других СУБД индекс не создаётся.
+def create_time_span_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS event_time_span_gist ON events_event '
+        'USING gist (tstzrange(start_time, end_time))'
+    )
+
+
+def drop_time_span_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS event_time_span_gist')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0010_event_keyset_indexes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(check_event_spans, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='event',
+            constraint=models.CheckConstraint(condition=models.Q(('end_time__gt', models.F('start_time'))), name='event_end_after_start'),
+        ),
+        migrations.RunPython(create_time_span_index, drop_time_span_index),
+    ]
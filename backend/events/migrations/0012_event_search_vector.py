@@ -0,0 +1,50 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:06
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+
+# GIN-индекс по search_vector и заполнение вектора для уже существующих мероприятий.
+# Только для PostgreSQL (to_tsvector с конфигурацией russian).
+BACKFILL_SQL = '''
+UPDATE events_event SET search_vector =
+    setweight(to_tsvector('russian', coalesce(title, '')), 'A') ||
+    setweight(to_tsvector('russian', coalesce(
+        (SELECT name FROM events_category WHERE events_category.id = events_event.category_id), ''
+    )), 'B') ||
+    setweight(to_tsvector('russian', coalesce(
+        (SELECT concat_ws(' ', name, city) FROM events_location WHERE events_location.id = events_event.location_id), ''
+    )), 'B') ||
+    setweight(to_tsvector('russian', coalesce(description, '')), 'C')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(BACKFILL_SQL)
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS event_search_vector_gin ON events_event USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS event_search_vector_gin')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0011_event_time_span_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='event',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
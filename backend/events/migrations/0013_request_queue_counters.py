@@ -0,0 +1,51 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:11
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def fill_counters(apps, schema_editor):
+    Request = apps.get_model('events', 'Request')
+    RequestCounter = apps.get_model('events', 'RequestCounter')
+    RequestCounter.objects.bulk_create([
+        RequestCounter(status=row['status'], request_type=row['request_type'], count=row['total'])
+        for row in Request.objects.values('status', 'request_type').annotate(total=Count('id')).order_by()
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0012_event_search_vector'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RequestCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(max_length=20)),
+                ('request_type', models.CharField(max_length=50)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Счётчик заявок',
+                'verbose_name_plural': 'Счётчики заявок',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['created_at', 'id'], name='request_pending_queue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='request',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['request_type', 'created_at', 'id'], name='request_pending_type_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='requestcounter',
+            constraint=models.UniqueConstraint(fields=('status', 'request_type'), name='request_counter_unique'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,87 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+
+
+def fill_stats(apps, schema_editor):
+    Event = apps.get_model('events', 'Event')
+    Request = apps.get_model('events', 'Request')
+    EventStat = apps.get_model('events', 'EventStat')
+    ReviewerStat = apps.get_model('events', 'ReviewerStat')
+    rows = []
+    for dimension, field in (('category', 'category_id'), ('location', 'location_id'), ('city', 'location__city')):
+        queryset = Event.objects.filter(**{f'{dimension}__isnull': False} if dimension != 'city' else {'location__isnull': False})
+        for row in queryset.values(field).annotate(total=Count('id')).order_by():
+            rows.append(EventStat(dimension=dimension, key=str(row[field] or ''), count=row['total']))
+    for row in Event.objects.annotate(month=TruncMonth('start_time')).values('month').annotate(total=Count('id')).order_by():
+        rows.append(EventStat(dimension='month', key=timezone.localtime(row['month']).strftime('%Y-%m'), count=row['total']))
+    EventStat.objects.bulk_create(rows)
+
+    reviewed = (
+        Request.objects.filter(~Q(status='pending'), reviewed_by__isnull=False)
+        .annotate(day=TruncDate('updated_at'))
+        .values('reviewed_by', 'day')
+        .annotate(
+            reviewed=Count('id'),
+            approved=Count('id', filter=Q(status='approved')),
+            rejected=Count('id', filter=Q(status='rejected')),
+            latency=Sum(F('updated_at') - F('created_at')),
+        )
+        .order_by()
+    )
+    ReviewerStat.objects.bulk_create([
+        ReviewerStat(
+            reviewer_id=row['reviewed_by'], day=row['day'], reviewed=row['reviewed'],
+            approved=row['approved'], rejected=row['rejected'],
+            total_latency_seconds=row['latency'].total_seconds() if row['latency'] else 0,
+        )
+        for row in reviewed
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0015_job_queue'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EventStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('dimension', models.CharField(choices=[('category', 'Категория'), ('location', 'Локация'), ('city', 'Город'), ('month', 'Месяц')], max_length=20)),
+                ('key', models.CharField(max_length=100)),
+                ('count', models.BigIntegerField(default=0)),
+            ],
+            options={
+                'verbose_name': 'Статистика мероприятий',
+                'verbose_name_plural': 'Статистика мероприятий',
+                'constraints': [models.UniqueConstraint(fields=('dimension', 'key'), name='event_stat_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ReviewerStat',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('reviewed', models.PositiveIntegerField(default=0)),
+                ('approved', models.PositiveIntegerField(default=0)),
+                ('rejected', models.PositiveIntegerField(default=0)),
+                ('total_latency_seconds', models.FloatField(default=0)),
+                ('reviewer', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='review_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Статистика модератора',
+                'verbose_name_plural': 'Статистика модераторов',
+                'constraints': [models.UniqueConstraint(fields=('reviewer', 'day'), name='reviewer_stat_unique')],
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
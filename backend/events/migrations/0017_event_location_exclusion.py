@@ -0,0 +1,49 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:18
+
+from django.contrib.postgres.operations import BtreeGistExtension
+from django.db import migrations
+
+
+# Исключающее ограничение: два мероприятия на одной локации не могут пересекаться
+# по времени. btree_gist нужен, чтобы location_id (=) и tstzrange (&&) попали в один
+# GiST-индекс; он же обслуживает поиск конфликтов и свободных слотов.
+# Есть только в PostgreSQL, на других СУБД проверка остаётся на уровне приложения.
+def create_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT a.id, b.id, a.location_id FROM events_event a '
+            'JOIN events_event b ON a.location_id = b.location_id AND a.id < b.id '
+            'AND tstzrange(a.start_time, a.end_time) && tstzrange(b.start_time, b.end_time) '
+            'LIMIT 20'
+        )
+        overlaps = cursor.fetchall()
+    if overlaps:
+        details = ', '.join(f'{a} и {b} (локация {location})' for a, b, location in overlaps)
+        raise RuntimeError(
+            f'Найдены пересекающиеся мероприятия на одной локации: {details}. '
+            'Разведите их по времени или локациям и повторите миграцию.'
+        )
+    schema_editor.execute(
+        'ALTER TABLE events_event ADD CONSTRAINT event_location_no_overlap '
+        'EXCLUDE USING gist (location_id WITH =, tstzrange(start_time, end_time) WITH &&)'
+    )
+
+
+def drop_exclusion(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute('ALTER TABLE events_event DROP CONSTRAINT IF EXISTS event_location_no_overlap')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0016_summary_stats'),
+    ]
+
+    operations = [
+        BtreeGistExtension(),
+        migrations.RunPython(create_exclusion, drop_exclusion),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.7 on 2026-10-18 17:55
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('events', '0017_event_location_exclusion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='request',
+            name='review_error',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
@@ -1,9 +1,10 @@
 from django.core.exceptions import ValidationError
 from django.utils.timezone import now
-from django.db import models
+from django.db import models, connections
+from django.contrib.postgres.fields import DateTimeRangeField
+from django.contrib.postgres.fields.ranges import DateTimeTZRange
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
-from django.db.models.signals import post_save
-from django.dispatch import receiver 
 
 ROLE_CHOICES = (
     ('user', 'Обычный пользователь'),
@@ -51,16 +52,51 @@ class Request(models.Model):
         default='pending'
     )
     reviewed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='reviewed_requests')
+    # Аренда заявки модератором: пока claimed_until не истёк, другие её не обрабатывают
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='claimed_requests')
+    claimed_until = models.DateTimeField(null=True, blank=True)
+    # Почему одобрение не удалось применить: заявка возвращается в pending с этой ошибкой
+    review_error = models.TextField(blank=True, default='')
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         verbose_name = "Заявка"
         verbose_name_plural = "Заявки"
+        indexes = [
+            # Очередь модерации: только pending, по времени создания (и по типу)
+            models.Index(fields=['created_at', 'id'], name='request_pending_queue_idx', condition=models.Q(status='pending')),
+            models.Index(fields=['request_type', 'created_at', 'id'], name='request_pending_type_idx', condition=models.Q(status='pending')),
+        ]
 
     def __str__(self):
         return f"{self.request_type} - {self.action} - {self.user.username}"
 
+    # Запоминаем загруженные статус и тип, чтобы счётчики знали, откуда был переход
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_state = (instance.__dict__.get('status'), instance.__dict__.get('request_type'))
+        return instance
+
+
+# Счётчики заявок по (статус, тип): обновляются при переходах статуса,
+# чтобы панель модератора не считала COUNT(*) на каждой загрузке
+class RequestCounter(models.Model):
+    status = models.CharField(max_length=20)
+    request_type = models.CharField(max_length=50)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Счётчик заявок"
+        verbose_name_plural = "Счётчики заявок"
+        constraints = [
+            models.UniqueConstraint(fields=['status', 'request_type'], name='request_counter_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.status} / {self.request_type}: {self.count}"
+
 
 # Валидатор для года
 def validate_year(value):
@@ -95,6 +131,38 @@ class Location(models.Model):
     def __str__(self):
         return f"{self.name} ({self.city or 'Город не указан'})"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_city = instance.__dict__.get('city')
+        return instance
+
+
+# tstzrange(start, end) - то же выражение, что и в GiST-индексе event_time_span_gist
+class TsTzRange(models.Func):
+    function = 'TSTZRANGE'
+    output_field = DateTimeRangeField()
+
+
+class EventQuerySet(models.QuerySet):
+    # Все связи, которые разворачивает EventSerializer, одним JOIN-запросом
+    def with_relations(self):
+        return self.select_related('author__userprofile', 'category', 'location')
+
+    # Мероприятия, пересекающиеся с полуинтервалом [start, end).
+    # В PostgreSQL условие совпадает с выражением GiST-индекса по tstzrange
+    def overlapping(self, start=None, end=None):
+        if start is not None and end is not None and connections[self.db].vendor == 'postgresql':
+            return self.alias(time_span=TsTzRange('start_time', 'end_time')).filter(
+                time_span__overlap=DateTimeTZRange(start, end)
+            )
+        queryset = self
+        if end is not None:
+            queryset = queryset.filter(start_time__lt=end)
+        if start is not None:
+            queryset = queryset.filter(end_time__gt=start)
+        return queryset
+
 
 # Модель мероприятия
 class Event(models.Model):
@@ -114,21 +182,122 @@ class Event(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)  
     updated_at = models.DateTimeField(auto_now=True)  
 
+    # Полнотекстовый индекс (title, category, location, description); обновляется сигналами
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = EventQuerySet.as_manager()
+
     class Meta:
         verbose_name = "Мероприятие"
         verbose_name_plural = "Мероприятия"
+        indexes = [
+            # Индексы под keyset-пагинацию по (start_time, id)
+            models.Index(fields=['start_time', 'id'], name='event_start_id_idx'),
+            models.Index(fields=['start_time', 'id'], name='event_public_start_id_idx', condition=models.Q(is_public=True)),
+        ]
+        constraints = [
+            # Пустой или перевёрнутый интервал ломает tstzrange, поэтому правило из clean() закреплено в БД
+            models.CheckConstraint(condition=models.Q(end_time__gt=models.F('start_time')), name='event_end_after_start'),
+            # event_location_no_overlap (EXCLUDE USING gist по location_id и tstzrange) создаётся
+            # миграцией 0017 только в PostgreSQL; проверки в приложении - events/booking.py
+        ]
 
     def __str__(self):
         return self.title
 
+    # Загруженные значения нужны сводной статистике, чтобы перенести событие между срезами
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_stat_state = (
+            instance.__dict__.get('category_id'),
+            instance.__dict__.get('location_id'),
+            instance.__dict__.get('start_time'),
+        )
+        return instance
+
     # Проверка на корректность времени
     def clean(self):
         if self.start_time >= self.end_time:
             raise ValidationError("Время окончания не может быть раньше времени начала")
 
-    
-    
-@receiver(post_save, sender=User)
-def create_user_profile(sender, instance, created, **kwargs):
-    if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+
+# Фоновая задача в очереди на базе таблицы (см. events/jobs.py и manage.py run_worker)
+class Job(models.Model):
+    STATUS_CHOICES = [
+        ('queued', 'В очереди'),
+        ('running', 'Выполняется'),
+        ('done', 'Выполнена'),
+        ('failed', 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100)
+    payload = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    run_at = models.DateTimeField(default=now)
+    locked_by = models.CharField(max_length=100, blank=True, default='')
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True, default='')
+    result = models.JSONField(null=True, blank=True)
+    created_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='jobs')
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = "Фоновая задача"
+        verbose_name_plural = "Фоновые задачи"
+        indexes = [
+            # Опрос очереди: только задачи в ожидании, по времени запуска
+            models.Index(fields=['run_at', 'id'], name='job_queued_idx', condition=models.Q(status='queued')),
+            models.Index(fields=['locked_at'], name='job_running_idx', condition=models.Q(status='running')),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+# Сводные счётчики мероприятий по срезам: category / location / city / month.
+# Обновляются сигналами, сверяются командой reconcile_stats
+class EventStat(models.Model):
+    DIMENSION_CHOICES = [
+        ('category', 'Категория'),
+        ('location', 'Локация'),
+        ('city', 'Город'),
+        ('month', 'Месяц'),
+    ]
+
+    dimension = models.CharField(max_length=20, choices=DIMENSION_CHOICES)
+    key = models.CharField(max_length=100)
+    count = models.BigIntegerField(default=0)
+
+    class Meta:
+        verbose_name = "Статистика мероприятий"
+        verbose_name_plural = "Статистика мероприятий"
+        constraints = [
+            models.UniqueConstraint(fields=['dimension', 'key'], name='event_stat_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.dimension}={self.key}: {self.count}"
+
+
+# Производительность модераторов по дням: число решений и суммарное время ожидания заявок
+class ReviewerStat(models.Model):
+    reviewer = models.ForeignKey(User, on_delete=models.CASCADE, related_name='review_stats')
+    day = models.DateField()
+    reviewed = models.PositiveIntegerField(default=0)
+    approved = models.PositiveIntegerField(default=0)
+    rejected = models.PositiveIntegerField(default=0)
+    total_latency_seconds = models.FloatField(default=0)
+
+    class Meta:
+        verbose_name = "Статистика модератора"
+        verbose_name_plural = "Статистика модераторов"
+        constraints = [
+            models.UniqueConstraint(fields=['reviewer', 'day'], name='reviewer_stat_unique'),
+        ]
+
+    def __str__(self):
+        return f"{self.reviewer_id} {self.day}: {self.reviewed}"
@@ -0,0 +1,366 @@
+from collections import defaultdict
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import feed
+from .models import Category, Event, Location, Request
+from .search import refresh_search_vectors
+from .counters import record_transitions
+from .stats import aware, event_state, record_event_changes, record_reviews
+from .booking import conflicts, conflict_message, find_conflicts
+
+DECISIONS = ('approved', 'rejected')
+EVENT_UPDATE_FIELDS = ('title', 'description', 'start_time', 'end_time', 'location_id', 'category_id', 'is_public')
+
+
+class DecisionError(Exception):
+    pass
+
+
+def category_slug(name):
+    return (name or '').lower().replace(' ', '-')
+
+
+# Время без зоны в заявке считается временем текущей зоны
+def parse_event_times(data, event=None):
+    try:
+        start_time = aware(data.get('start_time', event.start_time if event else None))
+        end_time = aware(data.get('end_time', event.end_time if event else None))
+    except (AttributeError, ValueError):
+        raise DecisionError('Неверный формат времени')
+    if start_time is None or end_time is None:
+        raise DecisionError('Не указано время начала или окончания')
+    if start_time >= end_time:
+        raise DecisionError('Время окончания не может быть раньше времени начала')
+    return start_time, end_time
+
+
+REFERENCE_LABELS = {'category_id': 'Категория', 'location_id': 'Локация'}
+
+
+# id категории/локации из JSON заявки: число или строка из цифр
+def reference_id(data, field):
+    value = data.get(field)
+    if value is None or value == '':
+        return None
+    if isinstance(value, str) and value.strip().isdigit():
+        return int(value)
+    if isinstance(value, int) and not isinstance(value, bool):
+        return value
+    raise DecisionError(f'{REFERENCE_LABELS[field]}: ожидается числовой id, получено {value!r}')
+
+
+def check_location(location_id, start_time, end_time, exclude_pk=None):
+    if not location_id:
+        return
+    clash = conflicts(location_id, start_time, end_time, exclude_pk).values_list('pk', flat=True).first()
+    if clash is not None:
+        raise DecisionError(conflict_message(clash))
+
+
+# Проверки одобрения без изменений в БД. Вызываются до перевода заявки в approved
+# и ещё раз воркером: пока задача ждала в очереди, данные могли измениться
+def validate_approval(request_obj):
+    data = request_obj.data
+    if request_obj.request_type == 'event':
+        if request_obj.action == 'create':
+            start_time, end_time = parse_event_times(data)
+            reference_id(data, 'category_id')
+            check_location(reference_id(data, 'location_id'), start_time, end_time)
+            return
+        event = request_obj.event
+        if event is None:
+            raise DecisionError('Мероприятие не найдено')
+        if request_obj.action == 'update':
+            if event.author_id != request_obj.user_id:
+                raise DecisionError('Можно редактировать только свои мероприятия')
+            start_time, end_time = parse_event_times(data, event)
+            reference_id(data, 'category_id')
+            location_id = reference_id(data, 'location_id') if 'location_id' in data else event.location_id
+            check_location(location_id, start_time, end_time, event.pk)
+            return
+        if request_obj.action == 'delete':
+            if event.author_id != request_obj.user_id:
+                raise DecisionError('Можно удалять только свои мероприятия')
+            return
+    elif request_obj.request_type == 'category' and request_obj.action == 'create':
+        if not data.get('name'):
+            raise DecisionError('Не указано название категории')
+        return
+    elif request_obj.request_type == 'location' and request_obj.action == 'create':
+        if not data.get('name'):
+            raise DecisionError('Не указано название локации')
+        return
+    raise DecisionError('Неподдерживаемый тип заявки')
+
+
+# Побочные эффекты одобрения одной заявки; выполняется фоновой задачей
+# moderation.apply_approval после того, как статус уже переведён в approved
+def apply_approval(request_obj):
+    validate_approval(request_obj)
+    data = request_obj.data
+    if request_obj.request_type == 'event':
+        if request_obj.action == 'create':
+            start_time, end_time = parse_event_times(data)
+            event = Event.objects.create(
+                title=data.get('title'),
+                description=data.get('description', ''),
+                start_time=start_time,
+                end_time=end_time,
+                author=request_obj.user,
+                is_public=data.get('is_public', True),
+                location_id=reference_id(data, 'location_id'),
+                category_id=reference_id(data, 'category_id'),
+            )
+            Request.objects.filter(pk=request_obj.pk).update(event=event)
+            return {'event_id': event.pk}
+
+        event = request_obj.event
+        if request_obj.action == 'update':
+            event.start_time, event.end_time = parse_event_times(data, event)
+            for field in ('title', 'description', 'is_public'):
+                if field in data:
+                    setattr(event, field, data[field])
+            for field in REFERENCE_LABELS:
+                if field in data:
+                    setattr(event, field, reference_id(data, field))
+            event.save()
+            return {'event_id': event.pk}
+        event_id = event.pk
+        event.delete()
+        return {'event_id': event_id}
+    if request_obj.request_type == 'category':
+        name = data['name']
+        category = Category.objects.create(name=name, slug=category_slug(name))
+        return {'category_id': category.pk}
+    location = Location.objects.create(name=data['name'], city=data.get('city'))
+    return {'location_id': location.pk}
+
+
+# Одобрение так и не применилось (задача failed): заявка возвращается в очередь
+# с текстом ошибки, а решение модератора вычитается из его статистики
+def revert_approval(request_id, error):
+    request_obj = Request.objects.select_for_update().filter(pk=request_id, status='approved').first()
+    if request_obj is None:
+        return
+    review = (request_obj.reviewed_by_id, request_obj.status, request_obj.created_at, request_obj.updated_at)
+    request_obj.status = 'pending'
+    request_obj.reviewed_by = None
+    request_obj.review_error = error
+    request_obj.save(update_fields=['status', 'reviewed_by', 'review_error', 'updated_at'])
+    record_reviews([review], sign=-1)
+
+
+# Пакетная обработка заявок: всё в одной транзакции, побочные эффекты
+# сгруппированы по (request_type, action) и выполняются bulk-операциями.
+# Для каждой заявки возвращается отдельный результат; ошибка одной заявки
+# оставляет её в статусе pending и не откатывает остальные.
+class ModerationBatch:
+    def __init__(self, reviewer):
+        self.reviewer = reviewer
+        self.results = {}
+        self.processed = []
+
+    def fail(self, request_obj, message):
+        self.results[request_obj.pk] = {'id': request_obj.pk, 'error': message}
+
+    def succeed(self, request_obj, status, **extra):
+        request_obj.status = status
+        request_obj.reviewed_by = self.reviewer
+        request_obj.updated_at = timezone.now()
+        request_obj.claimed_by = None
+        request_obj.claimed_until = None
+        self.processed.append(request_obj)
+        self.results[request_obj.pk] = {'id': request_obj.pk, 'status': status, **extra}
+
+    def run(self, decisions):
+        ids = list(decisions)
+        now = timezone.now()
+        with transaction.atomic():
+            requests = {
+                r.pk: r for r in Request.objects.select_for_update(of=('self',))
+                .select_related('event').filter(pk__in=ids)
+            }
+            groups = defaultdict(list)
+            for pk in ids:
+                request_obj = requests.get(pk)
+                if request_obj is None:
+                    self.results[pk] = {'id': pk, 'error': 'Заявка не найдена'}
+                elif request_obj.status != 'pending':
+                    self.fail(request_obj, 'Заявка уже обработана')
+                elif (request_obj.claimed_by_id not in (None, self.reviewer.pk)
+                      and request_obj.claimed_until and request_obj.claimed_until > now):
+                    self.fail(request_obj, 'Заявка взята в работу другим модератором')
+                elif decisions[pk] == 'rejected':
+                    self.succeed(request_obj, 'rejected')
+                else:
+                    groups[(request_obj.request_type, request_obj.action)].append(request_obj)
+
+            self.known_categories = self.existing_ids(Category, groups, 'category_id')
+            self.known_locations = self.existing_ids(Location, groups, 'location_id')
+            self.touched_events = []
+            self.event_changes = []
+            self.apply_event_creates(groups.pop(('event', 'create'), []))
+            self.apply_event_updates(groups.pop(('event', 'update'), []))
+            self.apply_event_deletes(groups.pop(('event', 'delete'), []))
+            self.apply_category_creates(groups.pop(('category', 'create'), []))
+            self.apply_location_creates(groups.pop(('location', 'create'), []))
+            for request_objs in groups.values():
+                for request_obj in request_objs:
+                    self.fail(request_obj, 'Неподдерживаемый тип заявки')
+
+            Request.objects.bulk_update(self.processed, ['status', 'reviewed_by', 'updated_at', 'claimed_by', 'claimed_until'])
+            # bulk_update не вызывает сигналы - переходы статусов учитываем сами
+            record_transitions([
+                (('pending', r.request_type), (r.status, r.request_type)) for r in self.processed
+            ])
+            record_reviews([(self.reviewer.pk, r.status, r.created_at, r.updated_at) for r in self.processed])
+            record_event_changes(self.event_changes)
+            if self.touched_events:
+                refresh_search_vectors(Event.objects.filter(pk__in=self.touched_events))
+        feed.invalidate()
+        return [self.results[pk] for pk in ids]
+
+    # Ссылки на категории/локации из всех заявок проверяются одним запросом;
+    # нечисловые id здесь пропускаются, их отклонит check_references
+    def existing_ids(self, model, groups, field):
+        ids = set()
+        for key in (('event', 'create'), ('event', 'update')):
+            for r in groups.get(key, []):
+                try:
+                    value = reference_id(r.data, field)
+                except DecisionError:
+                    continue
+                if value is not None:
+                    ids.add(value)
+        return set(model.objects.filter(pk__in=ids).values_list('pk', flat=True)) if ids else set()
+
+    # Возвращает приведённые к int ссылки из заявки (только переданные поля)
+    def check_references(self, data):
+        known = {'category_id': self.known_categories, 'location_id': self.known_locations}
+        references = {}
+        for field, label in REFERENCE_LABELS.items():
+            if field not in data:
+                continue
+            value = reference_id(data, field)
+            if value is not None and value not in known[field]:
+                raise DecisionError(f'{label} {value} не найдена')
+            references[field] = value
+        return references
+
+    def apply_event_creates(self, request_objs):
+        pending = []
+        for request_obj in request_objs:
+            data = request_obj.data
+            try:
+                start_time, end_time = parse_event_times(data)
+                references = self.check_references(data)
+            except DecisionError as e:
+                self.fail(request_obj, str(e))
+                continue
+            pending.append((request_obj, Event(
+                title=data.get('title'),
+                description=data.get('description', ''),
+                start_time=start_time,
+                end_time=end_time,
+                author=request_obj.user,
+                is_public=data.get('is_public', True),
+                location_id=references.get('location_id'),
+                category_id=references.get('category_id'),
+            )))
+        pending = self.drop_conflicts(pending)
+        created = Event.objects.bulk_create([event for _, event in pending])
+        for (request_obj, _), event in zip(pending, created):
+            request_obj.event = event
+            self.touched_events.append(event.pk)
+            self.event_changes.append((None, event_state(event)))
+            self.succeed(request_obj, 'approved', event_id=event.pk)
+        # Заявка на создание ссылается на созданное мероприятие
+        Request.objects.bulk_update([request_obj for request_obj, _ in pending], ['event'])
+
+    # Пересечения по локации отсекаются заранее: иначе ограничение
+    # event_location_no_overlap откатило бы всю пачку
+    def drop_conflicts(self, pending):
+        clashes = find_conflicts([event for _, event in pending])
+        for index, event_id in clashes.items():
+            self.fail(pending[index][0], conflict_message(event_id))
+        return [item for index, item in enumerate(pending) if index not in clashes]
+
+    def apply_event_updates(self, request_objs):
+        pending = []
+        for request_obj in request_objs:
+            event, data = request_obj.event, request_obj.data
+            if event is None:
+                self.fail(request_obj, 'Мероприятие не найдено')
+                continue
+            if event.author_id != request_obj.user_id:
+                self.fail(request_obj, 'Можно редактировать только свои мероприятия')
+                continue
+            try:
+                event.start_time, event.end_time = parse_event_times(data, event)
+                references = self.check_references(data)
+            except DecisionError as e:
+                self.fail(request_obj, str(e))
+                continue
+            for field in ('title', 'description', 'is_public'):
+                if field in data:
+                    setattr(event, field, data[field])
+            for field, value in references.items():
+                setattr(event, field, value)
+            event.updated_at = timezone.now()
+            pending.append((request_obj, event))
+        accepted = self.drop_conflicts(pending)
+        for request_obj, event in accepted:
+            self.touched_events.append(event.pk)
+            self.event_changes.append((event._loaded_stat_state, event_state(event)))
+            event._loaded_stat_state = event_state(event)
+            self.succeed(request_obj, 'approved', event_id=event.pk)
+        Event.objects.bulk_update([event for _, event in accepted], EVENT_UPDATE_FIELDS + ('updated_at',))
+
+    def apply_event_deletes(self, request_objs):
+        event_ids = []
+        for request_obj in request_objs:
+            event = request_obj.event
+            if event is None:
+                self.fail(request_obj, 'Мероприятие не найдено')
+            elif event.author_id != request_obj.user_id:
+                self.fail(request_obj, 'Можно удалять только свои мероприятия')
+            else:
+                event_ids.append(event.pk)
+                self.succeed(request_obj, 'approved', event_id=event.pk)
+        if event_ids:
+            Event.objects.filter(pk__in=event_ids).delete()
+
+    def apply_category_creates(self, request_objs):
+        names = {r.data.get('name') for r in request_objs}
+        slugs = {category_slug(name) for name in names}
+        taken_names = set(Category.objects.filter(name__in=names).values_list('name', flat=True))
+        taken_slugs = set(Category.objects.filter(slug__in=slugs).values_list('slug', flat=True))
+        pending = []
+        for request_obj in request_objs:
+            name = request_obj.data.get('name')
+            slug = category_slug(name)
+            if not name:
+                self.fail(request_obj, 'Не указано название категории')
+            elif name in taken_names or slug in taken_slugs:
+                self.fail(request_obj, f'Категория «{name}» уже существует')
+            else:
+                taken_names.add(name)
+                taken_slugs.add(slug)
+                pending.append((request_obj, Category(name=name, slug=slug)))
+        created = Category.objects.bulk_create([category for _, category in pending])
+        for (request_obj, _), category in zip(pending, created):
+            self.succeed(request_obj, 'approved', category_id=category.pk)
+
+    def apply_location_creates(self, request_objs):
+        pending = []
+        for request_obj in request_objs:
+            data = request_obj.data
+            if not data.get('name'):
+                self.fail(request_obj, 'Не указано название локации')
+                continue
+            pending.append((request_obj, Location(name=data['name'], city=data.get('city'))))
+        created = Location.objects.bulk_create([location for _, location in pending])
+        for (request_obj, _), location in zip(pending, created):
+            self.succeed(request_obj, 'approved', location_id=location.pk)
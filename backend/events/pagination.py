@@ -0,0 +1,158 @@
+import base64
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+# Keyset-пагинация по (ordering, id): курсор хранит позицию последней записи,
+# поэтому глубокие страницы стоят столько же, сколько первая
+class KeysetCursorPagination(BasePagination):
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+    page_size = getattr(settings, 'EVENTS_PAGE_SIZE', 50)
+    max_page_size = getattr(settings, 'EVENTS_MAX_PAGE_SIZE', 500)
+    invalid_cursor_message = 'Некорректный курсор'
+    ordering = 'start_time'
+
+    # Поле позиции курсора и функция разбора его значения из строки
+    position_parsers = {
+        'start_time': parse_datetime,
+        'created_at': parse_datetime,
+        'search_rank': float,
+    }
+
+    def get_ordering(self, queryset):
+        return self.ordering
+
+    def paginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page(list(queryset))
+
+    # То же для async-представлений: страница читается через асинхронный ORM
+    async def apaginate_queryset(self, queryset, request, view=None):
+        queryset = self.page_queryset(queryset, request)
+        return self.set_page([row async for row in queryset])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        ordering = self.get_ordering(queryset)
+        self.field = ordering.lstrip('-')
+        self.cursor = self.decode_cursor(request)
+
+        if self.cursor is None:
+            self.reverse, position, pk = False, None, None
+        else:
+            self.reverse, position, pk = self.cursor
+
+        descending = ordering.startswith('-') != self.reverse
+        prefix, op = ('-', 'lt') if descending else ('', 'gt')
+        queryset = queryset.order_by(prefix + self.field, prefix + 'id')
+        if position is not None:
+            queryset = queryset.filter(**{'%s__%se' % (self.field, op): position}).filter(
+                Q(**{'%s__%s' % (self.field, op): position}) | Q(**{'id__%s' % op: pk})
+            )
+        # Берём на одну запись больше, чтобы узнать, есть ли следующая страница
+        return queryset[:self.page_size + 1]
+
+    def set_page(self, results):
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+
+        if self.reverse:
+            self.has_next = self.cursor is not None
+            self.has_previous = has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = self.cursor is not None
+        return self.page
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+        try:
+            raw = base64.urlsafe_b64decode(encoded.encode('ascii')).decode('ascii')
+            direction, position, pk = raw.split('|')
+            position = self.position_parsers[self.field](position)
+            if direction not in ('n', 'p') or position is None:
+                raise ValueError
+            return direction == 'p', position, int(pk)
+        except (TypeError, ValueError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    # Страница может состоять из моделей или из словарей values() (fastpath.py)
+    def encode_cursor(self, reverse, obj):
+        if isinstance(obj, dict):
+            position, pk = obj[self.field], obj['id']
+        else:
+            position, pk = getattr(obj, self.field), obj.pk
+        position = position.isoformat() if hasattr(position, 'isoformat') else repr(position)
+        raw = '%s|%s|%s' % ('p' if reverse else 'n', position, pk)
+        encoded = base64.urlsafe_b64encode(raw.encode('ascii')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        if not self.page:
+            # Пустая страница при движении назад: возвращаемся к началу списка
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(False, self.page[-1])
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return None
+        return self.encode_cursor(True, self.page[0])
+
+    def get_paginated_response(self, data):
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data),
+        ]))
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+# Мероприятия: по (start_time, id), результаты полнотекстового поиска -
+# по убыванию релевантности (search_rank, id)
+class EventCursorPagination(KeysetCursorPagination):
+    def get_ordering(self, queryset):
+        if 'search_rank' in queryset.query.annotations:
+            return '-search_rank'
+        return 'start_time'
+
+
+# Очередь модерации: сначала самые старые заявки
+class RequestQueuePagination(KeysetCursorPagination):
+    ordering = 'created_at'
@@ -1,16 +1,17 @@
+import logging
+
 from rest_framework import permissions
-from .models import UserProfile, Event
+from .models import Event
+from .roles import resolve_role
+
+logger = logging.getLogger(__name__)
 
 class RoleBasedPermission(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return view.action == 'list' and hasattr(view, 'queryset') and view.queryset.model == Event
 
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-            role = profile.role
-        except UserProfile.DoesNotExist:
-            role = 'user'
+        role = resolve_role(request.user)
 
         if role == 'user':
             return view.action in ['list', 'retrieve']
@@ -24,18 +25,13 @@ class CanManageUsers(permissions.BasePermission):
     def has_permission(self, request, view):
         if not request.user.is_authenticated:
             return False
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-            return profile.role == 'admin'
-        except UserProfile.DoesNotExist:
-            return False 
+        return resolve_role(request.user) == 'admin'
         
 
 class IsRoleAdmin(permissions.BasePermission):
     def has_permission(self, request, view):
-        try:
-            profile = UserProfile.objects.get(user=request.user)
-            print(f"Checking permission - User: {request.user}, Role: {profile.role}")
-            return profile.role == "admin"
-        except UserProfile.DoesNotExist:
-            return False
\ No newline at end of file
+        if not request.user.is_authenticated:
+            return False
+        role = resolve_role(request.user)
+        logger.debug('Проверка прав администратора', extra={'role': role})
+        return role == "admin"
\ No newline at end of file
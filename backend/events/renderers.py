@@ -0,0 +1,35 @@
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import api_settings
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# JSON через orjson, байт в байт совпадающий с JSONRenderer: компактные разделители,
+# UTF-8 без \u-экранирования, экранированные U+2028/U+2029. datetime, date, time и
+# dataclass не отдаются orjson (у него свой формат), а идут в DRF JSONEncoder.
+# Числа с плавающей точкой orjson пишет по-своему (1e16 вместо 1e+16), поэтому
+# рендерер подключается только к ответам без float.
+# Без orjson, с отступами или при UNICODE_JSON/COMPACT_JSON = False работает обычный JSONRenderer.
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if orjson is None or indent is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+        body = orjson.dumps(
+            data,
+            default=self.encoder_class().default,
+            option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_NON_STR_KEYS,
+        )
+        return body.replace('\u2028'.encode(), b'\\u2028').replace('\u2029'.encode(), b'\\u2029')
+
+
+# Рендереры по умолчанию, где JSONRenderer заменён на FastJSONRenderer
+FAST_RENDERER_CLASSES = [
+    FastJSONRenderer if renderer is JSONRenderer else renderer
+    for renderer in api_settings.DEFAULT_RENDERER_CLASSES
+]
@@ -0,0 +1,121 @@
+import contextvars
+import hashlib
+import random
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.signals import request_finished
+from django.utils.deprecation import MiddlewareMixin
+
+# Чтение с реплик. Реплика выбирается только для безопасных запросов (GET/HEAD/OPTIONS)
+# к представлениям с replica_reads = True (или обёрнутым в @replica_reads), и только
+# если клиент недавно ничего не менял: после успешного запроса на запись клиент
+# PIN_SECONDS секунд читает с основной БД и видит свои изменения.
+# Запись всегда идёт в 'default'. Модели из PRIMARY_MODELS (токены, пользователи,
+# роли) всегда читаются с основной БД, чтобы кэш токенов не запомнил устаревшую роль.
+
+PIN_KEY = 'db-pin:%s'
+
+_read_alias = contextvars.ContextVar('replica_read_alias', default=None)
+
+
+def replica_settings():
+    config = {'ALIASES': [], 'PIN_SECONDS': 5, 'PRIMARY_MODELS': []}
+    config.update(getattr(settings, 'DATABASE_REPLICAS', {}))
+    return config
+
+
+def current_alias():
+    return _read_alias.get()
+
+
+# Чтение внутри блока идёт с указанной БД (None - с основной)
+@contextmanager
+def use_alias(alias):
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def use_primary():
+    return use_alias(None)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        alias = _read_alias.get()
+        if alias is None or model._meta.label_lower in replica_settings()['PRIMARY_MODELS']:
+            return None
+        return alias
+
+    # Явный 'default', иначе Django записал бы объект туда, откуда он прочитан
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *replica_settings()['ALIASES']}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+# Клиент определяется по заголовку Authorization, сессии или адресу
+def client_key(request):
+    auth = request.META.get('HTTP_AUTHORIZATION')
+    if auth:
+        ident = 'auth:' + auth
+    elif request.COOKIES.get(settings.SESSION_COOKIE_NAME):
+        ident = 'session:' + request.COOKIES[settings.SESSION_COOKIE_NAME]
+    else:
+        ident = 'addr:' + request.META.get('REMOTE_ADDR', '')
+    return hashlib.sha256(ident.encode()).hexdigest()[:32]
+
+
+def pin(request):
+    cache.set(PIN_KEY % client_key(request), 1, replica_settings()['PIN_SECONDS'])
+
+
+def is_pinned(request):
+    return cache.get(PIN_KEY % client_key(request)) is not None
+
+
+def replica_reads(view):
+    view.replica_reads = True
+    return view
+
+
+def wants_replica(view_func):
+    if getattr(view_func, 'replica_reads', False):
+        return True
+    return getattr(getattr(view_func, 'cls', None), 'replica_reads', False)
+
+
+# Алиас выставляется до вызова представления и сбрасывается по request_finished,
+# а не в process_response: потоковые ответы читают БД уже после middleware
+class ReplicaRoutingMiddleware(MiddlewareMixin):
+    def process_request(self, request):
+        _read_alias.set(None)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        aliases = replica_settings()['ALIASES']
+        if not aliases or request.method not in ('GET', 'HEAD', 'OPTIONS'):
+            return None
+        if wants_replica(view_func) and not is_pinned(request):
+            _read_alias.set(random.choice(aliases))
+        return None
+
+    def process_response(self, request, response):
+        if request.method not in ('GET', 'HEAD', 'OPTIONS') and response.status_code < 400 \
+                and replica_settings()['ALIASES']:
+            pin(request)
+        return response
+
+
+def reset_alias(sender, **kwargs):
+    _read_alias.set(None)
+
+
+request_finished.connect(reset_alias, dispatch_uid='events.replicas.reset_alias')
@@ -0,0 +1,21 @@
+from .models import UserProfile
+
+STAFF_ROLES = ('moderator', 'admin')
+
+
+# Роль пользователя загружается не более одного раза за запрос:
+# результат кэшируется прямо на объекте request.user
+def resolve_role(user):
+    if user is None or not user.is_authenticated:
+        return None
+    try:
+        return user._resolved_role
+    except AttributeError:
+        pass
+    role = UserProfile.objects.filter(user=user).values_list('role', flat=True).first() or 'user'
+    user._resolved_role = role
+    return role
+
+
+def is_staff_role(user):
+    return resolve_role(user) in STAFF_ROLES
@@ -0,0 +1,52 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector
+from django.db import connections
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Cast, Concat
+
+from .models import Category, Location
+
+SEARCH_CONFIG = 'russian'
+
+
+# tsvector мероприятия: название (A), категория и локация (B), описание (C).
+# Имена категории и локации берутся подзапросами, чтобы один UPDATE
+# обновлял сразу все события категории или локации.
+def search_vector_expression():
+    category_name = Subquery(Category.objects.filter(pk=OuterRef('category_id')).values('name')[:1])
+    location_text = Subquery(
+        Location.objects.filter(pk=OuterRef('location_id'))
+        .annotate(text=Concat('name', Value(' '), 'city'))
+        .values('text')[:1]
+    )
+    return (
+        SearchVector('title', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(category_name, weight='B', config=SEARCH_CONFIG)
+        + SearchVector(location_text, weight='B', config=SEARCH_CONFIG)
+        + SearchVector('description', weight='C', config=SEARCH_CONFIG)
+    )
+
+
+def is_postgresql(queryset):
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def refresh_search_vectors(queryset):
+    if not is_postgresql(queryset):
+        return
+    queryset.update(search_vector=search_vector_expression())
+
+
+# Поиск по ?q=: в PostgreSQL - по GIN-индексу с ранжированием,
+# на других СУБД - простое icontains без ранга
+def search_events(queryset, text):
+    if not is_postgresql(queryset):
+        return queryset.filter(
+            Q(title__icontains=text) | Q(description__icontains=text)
+            | Q(category__name__icontains=text)
+            | Q(location__name__icontains=text) | Q(location__city__icontains=text)
+        )
+    query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+    # ts_rank возвращает real; приводим к double, чтобы значение в курсоре совпадало точно
+    return queryset.filter(search_vector=query).annotate(
+        search_rank=Cast(SearchRank(F('search_vector'), query), FloatField())
+    )
@@ -1,6 +1,9 @@
 from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
-from .models import Event, Category, Location, Request, UserProfile, User
+from .models import Event, Category, Location, Request, UserProfile, User, Job
+from .roles import is_staff_role
+from .booking import conflicts, conflict_message, is_booking_conflict
 
 # Сериализатор для UserProfile
 class UserProfileSerializer(serializers.ModelSerializer):
@@ -20,10 +23,18 @@ class UserSerializer(serializers.ModelSerializer):
 class RequestSerializer(serializers.ModelSerializer):
     user = serializers.StringRelatedField()
     reviewed_by = serializers.StringRelatedField()
+    claimed_by = serializers.StringRelatedField()
 
     class Meta:
         model = Request
         fields = '__all__'
+        read_only_fields = ['claimed_until', 'review_error']
+
+# Сериализатор для фоновых задач
+class JobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Job
+        fields = ['id', 'name', 'status', 'attempts', 'max_attempts', 'run_at', 'last_error', 'result', 'created_at', 'updated_at']
 
 # Сериализатор для категорий
 class CategorySerializer(serializers.ModelSerializer):
@@ -31,15 +42,15 @@ class CategorySerializer(serializers.ModelSerializer):
         model = Category
         fields = ['id', 'name', 'slug']
 
+    # slug видят только модераторы и админы
+    def hidden_fields(self):
+        request = self.context.get('request')
+        return set() if request and is_staff_role(request.user) else {'slug'}
+
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            user_profile = UserProfile.objects.get(user=request.user)
-            if user_profile.role not in ['moderator', 'admin']:
-                del representation['slug']
-        else:
-            del representation['slug']
+        for name in self.hidden_fields():
+            representation.pop(name, None)
         return representation
 
 # Сериализатор для локаций
@@ -84,6 +95,29 @@ class EventSerializer(serializers.ModelSerializer):
             'category_id', 'location_id'
         ]
 
+    def validate(self, data):
+        start_time = data.get('start_time', getattr(self.instance, 'start_time', None))
+        end_time = data.get('end_time', getattr(self.instance, 'end_time', None))
+        if start_time and end_time and start_time >= end_time:
+            raise serializers.ValidationError({'end_time': 'Время окончания не может быть раньше времени начала'})
+        location = data.get('location', getattr(self.instance, 'location', None))
+        if location and start_time and end_time:
+            clash = conflicts(location.pk, start_time, end_time, getattr(self.instance, 'pk', None)).values_list('pk', flat=True).first()
+            if clash is not None:
+                raise serializers.ValidationError({'location_id': conflict_message(clash)})
+        return data
+
     def create(self, validated_data):
         validated_data['author'] = self.context['request'].user
-        return super().create(validated_data)
\ No newline at end of file
+        return super().create(validated_data)
+
+    # Проверка в validate() не защищает от гонки двух запросов - её закрывает
+    # ограничение event_location_no_overlap в БД
+    def save(self, **kwargs):
+        try:
+            with transaction.atomic():
+                return super().save(**kwargs)
+        except IntegrityError as e:
+            if is_booking_conflict(e):
+                raise serializers.ValidationError({'location_id': 'Локация уже занята в это время'})
+            raise
@@ -0,0 +1,36 @@
+from rest_framework import serializers
+
+# Вложенные объекты мероприятия и ключи, под которыми они выносятся наверх ответа
+SIDELOADED = {'author': 'users', 'category': 'categories', 'location': 'locations'}
+TRUE_VALUES = ('1', 'true', 'yes')
+
+
+def sideload_requested(params):
+    return params.get('sideload', '').lower() in TRUE_VALUES
+
+
+# Нормализованный ответ: в мероприятии вместо вложенных объектов их id
+# (author_id, category_id, location_id), а каждый пользователь/категория/локация
+# сериализуется один раз и попадает в словарь верхнего уровня {id: объект}.
+# serializer - сериализатор одного мероприятия (после ?fields=, если он был)
+def sideload(serializer, instances):
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    nested = {
+        name: serializer.fields.pop(name)
+        for name in SIDELOADED if name in serializer.fields
+    }
+    included = {name: {} for name in nested}
+    rows = []
+    for instance in instances:
+        row = serializer.to_representation(instance)
+        for name, field in nested.items():
+            related = field.get_attribute(instance)
+            if related is None:
+                row[f'{name}_id'] = None
+                continue
+            row[f'{name}_id'] = related.pk
+            if related.pk not in included[name]:
+                included[name][related.pk] = field.to_representation(related)
+        rows.append(row)
+    return rows, {SIDELOADED[name]: objects for name, objects in included.items()}
@@ -1,9 +1,140 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import UserProfile
+from rest_framework.authtoken.models import Token
+from .models import UserProfile, Event, Category, Location, Request
+from .authentication import token_cache, invalidate_user_tokens
+from . import feed
+from .search import refresh_search_vectors
+from .counters import record_transitions
+from . import stats
 
 @receiver(post_save, sender=User)
 def create_user_profile(sender, instance, created, **kwargs):
     if created:
-        UserProfile.objects.create(user=instance)
\ No newline at end of file
+        UserProfile.objects.create(user=instance)
+
+# Сброс кэша токенов при смене роли, изменении пользователя и удалении токена (выход)
+@receiver(post_save, sender=UserProfile)
+def invalidate_tokens_on_role_change(sender, instance, **kwargs):
+    invalidate_user_tokens(instance.user_id)
+
+@receiver(post_save, sender=User)
+def invalidate_tokens_on_user_change(sender, instance, created=False, **kwargs):
+    if not created:
+        invalidate_user_tokens(instance.pk)
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    token_cache.invalidate(instance.key)
+
+# Любое изменение данных, попадающих в публичную ленту, сбрасывает её снимок
+@receiver(post_save, sender=Event)
+@receiver(post_delete, sender=Event)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+@receiver(post_save, sender=Location)
+@receiver(post_delete, sender=Location)
+def invalidate_public_feed(sender, **kwargs):
+    feed.invalidate()
+
+# Автор в ленте - id, username, email, date_joined и роль. У нового пользователя
+# мероприятий нет, а вход (last_login) и смена пароля ленту не меняют
+FEED_AUTHOR_FIELDS = ('username', 'email', 'date_joined')
+
+@receiver(pre_save, sender=User)
+def remember_feed_author(sender, instance, update_fields=None, **kwargs):
+    instance._feed_author = None
+    if instance.pk is None or (update_fields is not None and not set(update_fields) & set(FEED_AUTHOR_FIELDS)):
+        return
+    instance._feed_author = User.objects.filter(pk=instance.pk).values_list(*FEED_AUTHOR_FIELDS).first()
+
+@receiver(post_save, sender=User)
+def invalidate_public_feed_on_author_change(sender, instance, **kwargs):
+    old = getattr(instance, '_feed_author', None)
+    if old is not None and old != tuple(getattr(instance, name) for name in FEED_AUTHOR_FIELDS):
+        feed.invalidate()
+
+@receiver(post_save, sender=UserProfile)
+def invalidate_public_feed_on_role_change(sender, instance, created, **kwargs):
+    if not created:
+        feed.invalidate()
+
+# Поддержка search_vector: событие пересчитывается при сохранении,
+# а при изменении или удалении категории/локации - все связанные события
+@receiver(post_save, sender=Event)
+def refresh_event_search_vector(sender, instance, **kwargs):
+    refresh_search_vectors(Event.objects.filter(pk=instance.pk))
+
+@receiver(post_save, sender=Category)
+def refresh_category_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_vectors(Event.objects.filter(category_id=instance.pk))
+
+@receiver(post_save, sender=Location)
+def refresh_location_search_vectors(sender, instance, created, **kwargs):
+    if not created:
+        refresh_search_vectors(Event.objects.filter(location_id=instance.pk))
+
+@receiver(pre_delete, sender=Category)
+@receiver(pre_delete, sender=Location)
+def remember_related_events(sender, instance, **kwargs):
+    instance._related_event_ids = list(instance.events.values_list('pk', flat=True))
+
+@receiver(post_delete, sender=Category)
+@receiver(post_delete, sender=Location)
+def refresh_orphaned_search_vectors(sender, instance, **kwargs):
+    event_ids = getattr(instance, '_related_event_ids', None)
+    if event_ids:
+        refresh_search_vectors(Event.objects.filter(pk__in=event_ids))
+
+# Счётчики заявок по статусам и типам
+@receiver(post_save, sender=Request)
+def count_request_transition(sender, instance, created, **kwargs):
+    new_state = (instance.status, instance.request_type)
+    if created:
+        old_state = None
+    else:
+        old_state = getattr(instance, '_loaded_state', None)
+        if old_state is None or None in old_state:
+            # Объект создан не из БД (или поля были отложены) - прошлое состояние неизвестно
+            old_state = None
+    if created or old_state is not None:
+        record_transitions([(old_state, new_state)])
+    if old_state and old_state[0] == 'pending' and instance.status in ('approved', 'rejected'):
+        stats.record_reviews([(instance.reviewed_by_id, instance.status, instance.created_at, instance.updated_at)])
+    instance._loaded_state = new_state
+
+@receiver(post_delete, sender=Request)
+def count_request_delete(sender, instance, **kwargs):
+    record_transitions([(getattr(instance, '_loaded_state', None) or (instance.status, instance.request_type), None)])
+
+# Сводная статистика мероприятий (stats.py): обновляется по дельтам, а ночная
+# сверка manage.py reconcile_stats исправляет возможный дрейф
+@receiver(post_save, sender=Event)
+def count_event_change(sender, instance, created, **kwargs):
+    new_state = stats.event_state(instance)
+    old_state = None if created else getattr(instance, '_loaded_stat_state', None)
+    if created or (old_state is not None and old_state[2] is not None):
+        stats.record_event_changes([(old_state, new_state)])
+    instance._loaded_stat_state = new_state
+
+@receiver(post_delete, sender=Event)
+def count_event_delete(sender, instance, **kwargs):
+    old_state = getattr(instance, '_loaded_stat_state', None) or stats.event_state(instance)
+    if old_state[2] is not None:
+        stats.record_event_changes([(old_state, None)])
+
+@receiver(post_save, sender=Location)
+def move_location_city_stats(sender, instance, created, **kwargs):
+    if not created and hasattr(instance, '_loaded_city'):
+        stats.move_location_city(instance.pk, instance._loaded_city, instance.city)
+    instance._loaded_city = instance.city
+
+@receiver(post_delete, sender=Category)
+def forget_category_stats(sender, instance, **kwargs):
+    stats.forget_dimension('category', instance.pk)
+
+@receiver(post_delete, sender=Location)
+def forget_location_stats(sender, instance, **kwargs):
+    stats.forget_dimension('location', instance.pk, getattr(instance, '_loaded_city', instance.city))
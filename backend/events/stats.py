@@ -0,0 +1,225 @@
+from collections import Counter, defaultdict
+from datetime import timedelta
+
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate, TruncMonth
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from .models import Category, Event, EventStat, Location, Request, RequestCounter, ReviewerStat
+from .counters import rebuild_counters
+
+
+# Строка или наивное время (до сохранения post_save видит то, что передали в create)
+# считаются временем в текущей зоне, как их сохранит и Django
+def aware(moment):
+    if isinstance(moment, str):
+        moment = parse_datetime(moment)
+    if moment is not None and timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def event_state(event):
+    return (event.category_id, event.location_id, aware(event.start_time))
+
+
+def month_key(moment):
+    return timezone.localtime(aware(moment)).strftime('%Y-%m')
+
+
+def state_keys(state, cities):
+    category_id, location_id, start_time = state
+    keys = [('month', month_key(start_time))]
+    if category_id:
+        keys.append(('category', str(category_id)))
+    if location_id:
+        keys.append(('location', str(location_id)))
+        keys.append(('city', cities.get(location_id) or ''))
+    return keys
+
+
+def apply_deltas(deltas):
+    for (dimension, key), delta in deltas.items():
+        if not delta:
+            continue
+        stats = EventStat.objects.filter(dimension=dimension, key=key)
+        if not stats.update(count=F('count') + delta):
+            EventStat.objects.get_or_create(dimension=dimension, key=key)
+            stats.update(count=F('count') + delta)
+
+
+# Изменения мероприятий вида [(старое состояние, новое состояние), ...],
+# где состояние - (category_id, location_id, start_time) или None
+def record_event_changes(changes):
+    changes = [(old, new) for old, new in changes if old != new]
+    if not changes:
+        return
+    location_ids = {state[1] for change in changes for state in change if state and state[1]}
+    cities = dict(Location.objects.filter(pk__in=location_ids).values_list('pk', 'city')) if location_ids else {}
+    deltas = Counter()
+    for old, new in changes:
+        if old is not None:
+            for key in state_keys(old, cities):
+                deltas[key] -= 1
+        if new is not None:
+            for key in state_keys(new, cities):
+                deltas[key] += 1
+    apply_deltas(deltas)
+
+
+# Смена города у локации переносит все её мероприятия в другой срез city
+def move_location_city(location_id, old_city, new_city):
+    stat = EventStat.objects.filter(dimension='location', key=str(location_id)).first()
+    if stat and stat.count and (old_city or '') != (new_city or ''):
+        apply_deltas({('city', old_city or ''): -stat.count, ('city', new_city or ''): stat.count})
+
+
+# При удалении категории/локации события остаются без неё (SET_NULL)
+def forget_dimension(dimension, pk, city=None):
+    stat = EventStat.objects.filter(dimension=dimension, key=str(pk)).first()
+    if stat is None:
+        return
+    if dimension == 'location' and stat.count:
+        apply_deltas({('city', city or ''): -stat.count})
+    stat.delete()
+
+
+# Решения модераторов: [(reviewer_id, status, created_at, reviewed_at), ...];
+# sign=-1 вычитает отменённые решения
+def record_reviews(reviews, sign=1):
+    totals = defaultdict(lambda: [0, 0, 0, 0.0])
+    for reviewer_id, status, created_at, reviewed_at in reviews:
+        if not reviewer_id:
+            continue
+        row = totals[(reviewer_id, timezone.localdate(reviewed_at))]
+        row[0] += sign
+        row[1] += sign * (status == 'approved')
+        row[2] += sign * (status == 'rejected')
+        row[3] += sign * max((reviewed_at - created_at).total_seconds(), 0)
+    for (reviewer_id, day), (reviewed, approved, rejected, latency) in totals.items():
+        stats = ReviewerStat.objects.filter(reviewer_id=reviewer_id, day=day)
+        values = {
+            'reviewed': F('reviewed') + reviewed,
+            'approved': F('approved') + approved,
+            'rejected': F('rejected') + rejected,
+            'total_latency_seconds': F('total_latency_seconds') + latency,
+        }
+        if not stats.update(**values):
+            ReviewerStat.objects.get_or_create(reviewer_id=reviewer_id, day=day)
+            stats.update(**values)
+
+
+# Сводные таблицы блокируются до чтения агрегатов: инкрементальные дельты других
+# транзакций ждут конца пересчёта и ложатся поверх него, а уже записанные ими
+# дельты закоммичены и видны агрегатам. В PostgreSQL - LOCK TABLE (чтение
+# панели не блокируется), на других СУБД - select_for_update существующих строк
+def lock_stat_tables():
+    models = (EventStat, ReviewerStat, RequestCounter)
+    connection = connections[router.db_for_write(EventStat)]
+    if connection.vendor == 'postgresql':
+        tables = ', '.join(connection.ops.quote_name(model._meta.db_table) for model in models)
+        with connection.cursor() as cursor:
+            cursor.execute(f'LOCK TABLE {tables} IN SHARE ROW EXCLUSIVE MODE')
+    else:
+        for model in models:
+            list(model.objects.select_for_update().values_list('pk', flat=True))
+
+
+# Полный пересчёт сводных таблиц из Event и Request (ночная сверка)
+@transaction.atomic
+def reconcile():
+    lock_stat_tables()
+    event_rows = []
+    for dimension, field in (('category', 'category_id'), ('location', 'location_id'), ('city', 'location__city')):
+        queryset = Event.objects.values(field).annotate(total=Count('id')).order_by()
+        if dimension != 'city':
+            queryset = queryset.filter(**{f'{field}__isnull': False})
+        else:
+            queryset = queryset.filter(location__isnull=False)
+        for row in queryset:
+            event_rows.append(EventStat(dimension=dimension, key=str(row[field] or ''), count=row['total']))
+    for row in Event.objects.annotate(month=TruncMonth('start_time')).values('month').annotate(total=Count('id')).order_by():
+        event_rows.append(EventStat(dimension='month', key=month_key(row['month']), count=row['total']))
+
+    reviewer_rows = []
+    reviewed = (
+        Request.objects.filter(~Q(status='pending'), reviewed_by__isnull=False)
+        .annotate(day=TruncDate('updated_at'))
+        .values('reviewed_by', 'day')
+        .annotate(
+            reviewed=Count('id'),
+            approved=Count('id', filter=Q(status='approved')),
+            rejected=Count('id', filter=Q(status='rejected')),
+            latency=Sum(F('updated_at') - F('created_at')),
+        )
+        .order_by()
+    )
+    for row in reviewed:
+        latency = row['latency'].total_seconds() if row['latency'] else 0.0
+        reviewer_rows.append(ReviewerStat(
+            reviewer_id=row['reviewed_by'], day=row['day'], reviewed=row['reviewed'],
+            approved=row['approved'], rejected=row['rejected'], total_latency_seconds=latency,
+        ))
+
+    EventStat.objects.all().delete()
+    EventStat.objects.bulk_create(event_rows)
+    ReviewerStat.objects.all().delete()
+    ReviewerStat.objects.bulk_create(reviewer_rows)
+    rebuild_counters()
+    return {'event_stats': len(event_rows), 'reviewer_stats': len(reviewer_rows)}
+
+
+# Данные для панели: читаются только сводные таблицы и справочники имён
+def dashboard(days=30):
+    by_dimension = defaultdict(dict)
+    for dimension, key, count in EventStat.objects.filter(count__gt=0).values_list('dimension', 'key', 'count'):
+        by_dimension[dimension][key] = count
+
+    categories = Category.objects.in_bulk([int(k) for k in by_dimension['category']])
+    locations = Location.objects.in_bulk([int(k) for k in by_dimension['location']])
+
+    since = timezone.localdate() - timedelta(days=days - 1)
+    reviewers = (
+        ReviewerStat.objects.filter(day__gte=since)
+        .values('reviewer', 'reviewer__username')
+        .annotate(
+            reviewed=Sum('reviewed'), approved=Sum('approved'), rejected=Sum('rejected'),
+            latency=Sum('total_latency_seconds'),
+        )
+        .order_by('-reviewed')
+    )
+
+    return {
+        'events_by_category': [
+            {'id': int(key), 'name': str(categories.get(int(key), '')), 'count': count}
+            for key, count in sorted(by_dimension['category'].items(), key=lambda item: -item[1])
+        ],
+        'events_by_location': [
+            {'id': int(key), 'name': locations[int(key)].name if int(key) in locations else '', 'count': count}
+            for key, count in sorted(by_dimension['location'].items(), key=lambda item: -item[1])
+        ],
+        'events_by_city': [
+            {'city': key, 'count': count}
+            for key, count in sorted(by_dimension['city'].items(), key=lambda item: -item[1])
+        ],
+        'events_by_month': [
+            {'month': key, 'count': count} for key, count in sorted(by_dimension['month'].items())
+        ],
+        'pending_backlog': dict(
+            RequestCounter.objects.filter(status='pending').values_list('request_type', 'count')
+        ),
+        'reviewers': [
+            {
+                'reviewer_id': row['reviewer'],
+                'username': row['reviewer__username'],
+                'reviewed': row['reviewed'],
+                'approved': row['approved'],
+                'rejected': row['rejected'],
+                'avg_latency_seconds': round(row['latency'] / row['reviewed'], 1) if row['reviewed'] else None,
+            }
+            for row in reviewers
+        ],
+        'period_days': days,
+    }
@@ -0,0 +1,28 @@
+from django.contrib.auth.models import User
+
+from .jobs import PermanentJobError, register
+from .models import Request
+from .moderation import DecisionError, ModerationBatch, apply_approval, revert_approval
+
+
+# Фоновые задачи; модуль импортируется в AppConfig.ready(), чтобы задачи попали в реестр
+
+# В last_error задачи текст вида 'events.jobs.PermanentJobError: ...', модератору нужно только сообщение
+def revert_approval_task(payload, error):
+    revert_approval(payload['request_id'], error.split(': ', 1)[-1])
+
+
+@register('moderation.apply_approval', on_failure=revert_approval_task)
+def apply_approval_task(payload):
+    try:
+        request_obj = Request.objects.select_related('user', 'event').get(pk=payload['request_id'])
+        return apply_approval(request_obj)
+    except (Request.DoesNotExist, DecisionError) as e:
+        raise PermanentJobError(str(e))
+
+
+@register('moderation.batch')
+def moderation_batch_task(payload):
+    reviewer = User.objects.get(pk=payload['reviewer_id'])
+    decisions = {int(pk): decision for pk, decision in payload['decisions'].items()}
+    return {'results': ModerationBatch(reviewer).run(decisions)}
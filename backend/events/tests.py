@@ -1,3 +1,1452 @@
-from django.test import TestCase
+import base64
+import csv
+import gzip
+import io
+import json
+import logging
+import os
+import tempfile
+import threading
+import warnings
+from datetime import datetime, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import CommandError, call_command
+from django.db.backends.signals import connection_created
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from . import booking, dbpool, feed, jobs, loadtest, logs, metrics, renderers, replicas, stats
+from .authentication import token_cache
+from .filters import filter_search
+from .models import Category, Event, EventStat, Job, Location, Request, ReviewerStat, UserProfile
+
+
+def make_client(username, role='user'):
+    user = User.objects.create_user(username=username, password='pass12345')
+    UserProfile.objects.filter(user=user).update(role=role)
+    token = Token.objects.create(user=user)
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+# Роль пользователя должна читаться из БД один раз за запрос
+class RoleResolutionQueryCountTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.moderator = make_client('moderator', role='moderator')
+        for i in range(10):
+            Category.objects.create(name=f'Категория {i}', slug=f'category-{i}')
+
+    def test_category_list_loads_role_once(self):
+        # токен + роль + список категорий
+        with self.assertNumQueries(3):
+            response = self.moderator.get('/api/categories/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('slug', response.json()[0])
+
+    def test_user_role_endpoint(self):
+        with self.assertNumQueries(2):
+            response = self.moderator.get('/api/user-role/')
+        self.assertEqual(response.json()['role'], 'moderator')
+
+    def test_plain_user_does_not_see_slug(self):
+        client = make_client('plain')
+        with self.assertNumQueries(3):
+            response = client.get('/api/categories/')
+        self.assertNotIn('slug', response.json()[0])
+
+
+# Кэш токенов: повторные запросы не ходят в БД за токеном и ролью
+class CachedTokenAuthenticationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('cached', role='moderator')
+
+    def test_second_request_skips_auth_queries(self):
+        self.client.get('/api/user-role/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/user-role/')
+        self.assertEqual(response.json()['role'], 'moderator')
+
+    def test_role_change_invalidates_cache(self):
+        self.client.get('/api/user-role/')
+        profile = UserProfile.objects.get(user__username='cached')
+        profile.role = 'user'
+        profile.save()
+        self.assertEqual(self.client.get('/api/user-role/').json()['role'], 'user')
+
+    def test_deleted_token_is_rejected(self):
+        self.client.get('/api/user-role/')
+        Token.objects.filter(user__username='cached').delete()
+        self.assertEqual(self.client.get('/api/user-role/').status_code, 401)
+
+
+# Снимок публичной ленты: 304 по ETag без обращения к БД и сброс при изменениях
+class PublicFeedSnapshotTests(TestCase):
+    def setUp(self):
+        feed.bump_version()
+        start = timezone.now() + timedelta(days=1)
+        Event.objects.create(title='Концерт', start_time=start, end_time=start + timedelta(hours=2))
+
+    def test_if_none_match_returns_304_without_queries(self):
+        response = self.client.get('/api/public-events/')
+        etag = response['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/public-events/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_gzip_variant(self):
+        response = self.client.get('/api/public-events/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        data = json.loads(gzip.decompress(response.content))
+        self.assertEqual(data['results'][0]['title'], 'Концерт')
+
+    def test_event_change_rebuilds_snapshot(self):
+        etag = self.client.get('/api/public-events/')['ETag']
+        Event.objects.update(title='Спектакль')
+        with self.captureOnCommitCallbacks(execute=True):
+            Event.objects.get().save()
+        response = self.client.get('/api/public-events/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['title'], 'Спектакль')
+
+    # До коммита версия не меняется: иначе снимок собрали бы из старых данных
+    def test_invalidation_waits_for_commit(self):
+        version = feed.current_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            Event.objects.get().save()
+            self.assertEqual(feed.current_version(), version)
+        self.assertEqual(len(callbacks), 1)
+        callbacks[0]()
+        self.assertNotEqual(feed.current_version(), version)
+
+    def test_login_does_not_invalidate(self):
+        author = User.objects.create_user(username='feed-author', password='pass12345')
+        Event.objects.update(author=author)
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.login(username='feed-author', password='pass12345')
+        self.assertEqual(callbacks, [])
+        with self.captureOnCommitCallbacks() as callbacks:
+            author.username = 'renamed-author'
+            author.save()
+        self.assertEqual(len(callbacks), 1)
+
+
+# Число запросов к списку мероприятий не должно зависеть от размера выдачи
+class EventListQueryCountTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('author', role='moderator')
+        self.author = User.objects.get(username='author')
+        self.category = Category.objects.create(name='Музыка', slug='music')
+        self.location = Location.objects.create(name='Филармония', city='Ставрополь')
+        # Прогреваем кэш токенов, чтобы считать только запросы самой выдачи
+        self.client.get('/api/user-role/')
+
+    def create_events(self, count):
+        start = timezone.now()
+        for i in range(count):
+            Event.objects.create(
+                title=f'Событие {i}', start_time=start, end_time=start + timedelta(hours=1),
+                author=self.author, category=self.category, location=self.location,
+            )
+
+    def count_queries(self, url):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_events_list_is_constant(self):
+        self.create_events(2)
+        small = self.count_queries('/api/events/')
+        self.create_events(20)
+        self.assertEqual(self.count_queries('/api/events/'), small)
+
+    def test_public_events_is_constant(self):
+        self.create_events(2)
+        small = self.count_queries('/api/public-events/?page_size=50')
+        self.create_events(20)
+        self.assertEqual(self.count_queries('/api/public-events/?page_size=50'), small)
+
+
+# Keyset-курсор: переходы вперёд и назад, одинаковый start_time, испорченный курсор
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('pager', role='moderator')
+        start = timezone.now().replace(microsecond=0)
+        # Пять мероприятий с одинаковым началом: порядок внутри держится на id
+        self.ids = []
+        for i, hours in enumerate((0, 1, 1, 1, 1, 1, 2)):
+            event = Event.objects.create(
+                title=f'Событие {i}', description='-',
+                start_time=start + timedelta(hours=hours), end_time=start + timedelta(hours=hours + 1),
+            )
+            self.ids.append(event.pk)
+
+    def page(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_ties_on_start_time_are_walked_forward_and_back(self):
+        pages = [self.page('/api/events/', {'page_size': 2})]
+        self.assertIsNone(pages[0]['previous'])
+        while pages[-1]['next']:
+            pages.append(self.page(pages[-1]['next']))
+        forward = [[item['id'] for item in page['results']] for page in pages]
+        self.assertEqual([pk for page in forward for pk in page], self.ids)
+
+        backward = [forward[-1]]
+        data = pages[-1]
+        while data['previous']:
+            data = self.page(data['previous'])
+            backward.append([item['id'] for item in data['results']])
+        self.assertEqual(backward[::-1], forward)
+
+    def test_cursor_round_trip(self):
+        first = self.page('/api/events/', {'page_size': 3})
+        second = self.page(first['next'])
+        self.assertEqual([item['id'] for item in second['results']], self.ids[3:6])
+        # Тот же курсор даёт ту же страницу, а previous второй страницы - первую
+        self.assertEqual(self.page(first['next']), second)
+        back = self.page(second['previous'])
+        self.assertEqual(back['results'], first['results'])
+        self.assertEqual(back['next'], first['next'])
+
+    def test_invalid_cursor_is_404(self):
+        bad = base64.urlsafe_b64encode(b'n|not-a-date|1').decode()
+        for cursor in ('garbage', bad, base64.urlsafe_b64encode(b'x|2025-01-01T00:00:00|1').decode()):
+            for url in ('/api/events/', '/api/public-events/'):
+                response = self.client.get(url, {'cursor': cursor})
+                self.assertEqual(response.status_code, 404, (url, cursor))
+
+
+# Фильтр ?from=&to= возвращает мероприятия, пересекающиеся с окном
+class TimeWindowFilterTests(TestCase):
+    def setUp(self):
+        day = timezone.make_aware(datetime(2025, 5, 10))
+        Event.objects.create(title='До окна', start_time=day - timedelta(days=3), end_time=day - timedelta(days=2))
+        Event.objects.create(title='Через начало', start_time=day - timedelta(hours=2), end_time=day + timedelta(hours=2))
+        Event.objects.create(title='Внутри', start_time=day + timedelta(days=1), end_time=day + timedelta(days=2))
+        Event.objects.create(title='После окна', start_time=day + timedelta(days=7), end_time=day + timedelta(days=8))
+
+    def titles(self, query):
+        response = self.client.get('/api/public-events/' + query)
+        self.assertEqual(response.status_code, 200)
+        return [event['title'] for event in response.json()['results']]
+
+    def test_overlap(self):
+        self.assertEqual(self.titles('?from=2025-05-10&to=2025-05-17'), ['Через начало', 'Внутри'])
+
+    def test_invalid_window(self):
+        response = self.client.get('/api/public-events/?from=2025-05-17&to=2025-05-10')
+        self.assertEqual(response.status_code, 400)
+
+
+# Полнотекстовый поиск ?q=: вес названия выше категории/локации, а их - выше описания;
+# search_vector пересчитывается при изменении события, категории и локации
+@skipUnless(connection.vendor == 'postgresql', 'поиск по tsvector есть только в PostgreSQL')
+class FullTextSearchTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('searcher', role='moderator')
+        self.jazz = Category.objects.create(name='Джаз', slug='jazz')
+        self.club = Location.objects.create(name='Клуб', city='Казань')
+        start = timezone.make_aware(datetime(2025, 9, 1, 19))
+        self.by_description = self.make_event('Встреча', description='Вечер, где играют джаз', start=start)
+        self.by_category = self.make_event('Концерт', category=self.jazz, start=start + timedelta(days=1))
+        self.by_title = self.make_event('Джаз в парке', start=start + timedelta(days=2))
+        self.make_event('Лекция', location=self.club, start=start + timedelta(days=3))
+
+    def make_event(self, title, description='-', start=None, **kwargs):
+        return Event.objects.create(
+            title=title, description=description, start_time=start, end_time=start + timedelta(hours=2), **kwargs,
+        )
+
+    def search(self, text):
+        return list(filter_search(Event.objects.all(), {'q': text}).order_by('-search_rank', 'id').values_list('pk', flat=True))
+
+    def test_ranking(self):
+        self.assertEqual(self.search('джаз'), [self.by_title.pk, self.by_category.pk, self.by_description.pk])
+        # API отдаёт тот же порядок и листает его курсором по (search_rank, id)
+        pages = [self.client.get('/api/events/', {'q': 'джаз', 'page_size': 2}).json()]
+        pages.append(self.client.get(pages[0]['next']).json())
+        self.assertEqual(
+            [item['id'] for page in pages for item in page['results']],
+            [self.by_title.pk, self.by_category.pk, self.by_description.pk],
+        )
+        self.assertIsNone(pages[1]['next'])
+
+    def test_vector_follows_title_category_and_location(self):
+        self.by_title.title = 'Рок в парке'
+        self.by_title.save()
+        self.assertNotIn(self.by_title.pk, self.search('джаз'))
+        self.assertEqual(self.search('рок'), [self.by_title.pk])
+
+        self.jazz.name = 'Блюз'
+        self.jazz.save()
+        self.assertEqual(self.search('блюз'), [self.by_category.pk])
+        self.assertEqual(self.search('джаз'), [self.by_description.pk])
+
+        lecture = Event.objects.get(title='Лекция')
+        self.assertEqual(self.search('казань'), [lecture.pk])
+        self.club.city = 'Самара'
+        self.club.save()
+        self.assertEqual(self.search('казань'), [])
+        self.assertEqual(self.search('самара'), [lecture.pk])
+
+        self.club.delete()
+        self.assertEqual(self.search('клуб'), [])
+
+
+# Массовый импорт: корректные строки создаются, ошибки копятся по строкам
+class EventImportTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('importer', role='moderator')
+        self.category = Category.objects.create(name='Театр', slug='theatre')
+
+    def test_csv_import_reports_row_errors(self):
+        content = (
+            'title,start_time,end_time,category_id\n'
+            f'Спектакль,2025-06-01T19:00:00Z,2025-06-01T21:00:00Z,{self.category.pk}\n'
+            'Перевёрнутое,2025-06-01T21:00:00Z,2025-06-01T19:00:00Z,\n'
+            'Без категории,2025-06-02T19:00:00Z,2025-06-02T21:00:00Z,9999\n'
+            'Далёкое будущее,2150-06-02T19:00:00Z,2150-06-02T21:00:00Z,\n'
+        )
+        upload = SimpleUploadedFile('events.csv', content.encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/events/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(sorted(e['row'] for e in response.json()['errors']), [3, 4, 5])
+        self.assertEqual(Event.objects.get().author.username, 'importer')
+
+    def test_ndjson_import(self):
+        lines = [
+            json.dumps({'title': 'Лекция', 'start_time': '2025-06-01T10:00:00Z', 'end_time': '2025-06-01T11:00:00Z'}),
+            'не json',
+        ]
+        upload = SimpleUploadedFile('events.ndjson', '\n'.join(lines).encode('utf-8'))
+        response = self.client.post('/api/events/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.json()['created'], 1)
+        self.assertEqual(response.json()['errors'][0]['row'], 2)
+
+
+# Потоковая выгрузка в CSV/NDJSON/ICS
+class EventExportTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('exporter', role='moderator')
+        location = Location.objects.create(name='Дом культуры', city='Ставрополь')
+        start = timezone.make_aware(datetime(2025, 6, 1, 19))
+        Event.objects.create(title='Концерт, вечер', start_time=start, end_time=start + timedelta(hours=2), location=location)
+        Event.objects.create(title='Лекция', start_time=start + timedelta(days=30), end_time=start + timedelta(days=30, hours=1))
+
+    def export(self, query):
+        response = self.client.get('/api/events/export/' + query)
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode('utf-8')
+
+    # Выгрузка загружается обратно через импорт без потерь (кроме новых id)
+    def test_csv_roundtrip(self):
+        category = Category.objects.create(name='Театр', slug='theatre')
+        start = timezone.make_aware(datetime(2025, 7, 1, 18, 30))
+        Event.objects.create(
+            title='Спектакль "Чайка"; акт 1', description='Строка 1\nстрока 2, с запятой', is_public=False,
+            category=category, start_time=start, end_time=start + timedelta(hours=3),
+        )
+
+        def rows(content):
+            reader = csv.DictReader(io.StringIO(content.lstrip('\ufeff')))
+            return sorted(({k: v for k, v in row.items() if k != 'id'} for row in reader), key=lambda r: r['start_time'])
+
+        exported = self.export('?type=csv')
+        before = rows(exported)
+        self.assertEqual(len(before), 3)
+        Event.objects.all().delete()
+
+        upload = SimpleUploadedFile('events.csv', exported.encode('utf-8'), content_type='text/csv')
+        response = self.client.post('/api/events/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.json(), {'created': 3, 'failed': 0, 'errors': [], 'errors_truncated': False})
+        self.assertEqual(rows(self.export('?type=csv')), before)
+
+    def test_ndjson_time_window(self):
+        lines = self.export('?type=ndjson&from=2025-06-01&to=2025-06-02').splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Концерт, вечер'])
+
+    def test_ics(self):
+        content = self.export('?type=ics')
+        self.assertIn('SUMMARY:Концерт\\, вечер', content)
+        self.assertIn('DTSTART:20250601T190000Z', content)
+        self.assertEqual(content.count('BEGIN:VEVENT'), 2)
+
+
+# Пакетная модерация заявок
+class ModerationBatchTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('batch-moderator', role='moderator')
+        self.author = User.objects.create_user(username='requester', password='pass12345')
+        self.category = Category.objects.create(name='Кино', slug='cinema')
+
+    def make_request(self, request_type, data, action='create', event=None):
+        return Request.objects.create(user=self.author, request_type=request_type, action=action, data=data, event=event)
+
+    # true/false - подкласс int в Python, но не id заявки
+    def test_batch_rejects_bool_ids(self):
+        self.make_request('location', {'name': 'Парк'})
+        for bad_id in (True, False):
+            response = self.client.post('/api/requests/batch/', {'decisions': [
+                {'id': bad_id, 'status': 'rejected'},
+            ]}, format='json')
+            self.assertEqual(response.status_code, 400)
+        self.assertFalse(Request.objects.exclude(status='pending').exists())
+
+    def test_batch_groups_side_effects(self):
+        event_request = self.make_request('event', {
+            'title': 'Показ', 'start_time': '2025-07-01T18:00:00Z', 'end_time': '2025-07-01T20:00:00Z',
+            'category_id': self.category.pk,
+        })
+        bad_request = self.make_request('event', {
+            'title': 'Плохое', 'start_time': '2025-07-01T20:00:00Z', 'end_time': '2025-07-01T18:00:00Z',
+        })
+        category_request = self.make_request('category', {'name': 'Выставки'})
+        duplicate_request = self.make_request('category', {'name': 'Кино'})
+        rejected_request = self.make_request('location', {'name': 'Парк'})
+
+        response = self.client.post('/api/requests/batch/', {'decisions': [
+            {'id': event_request.pk, 'status': 'approved'},
+            {'id': bad_request.pk, 'status': 'approved'},
+            {'id': category_request.pk, 'status': 'approved'},
+            {'id': duplicate_request.pk, 'status': 'approved'},
+            {'id': rejected_request.pk, 'status': 'rejected'},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'approved')
+        self.assertIn('error', results[1])
+        self.assertEqual(results[2]['status'], 'approved')
+        self.assertIn('error', results[3])
+        self.assertEqual(results[4]['status'], 'rejected')
+
+        event = Event.objects.get(title='Показ')
+        self.assertEqual(event.author, self.author)
+        self.assertTrue(Category.objects.filter(name='Выставки').exists())
+        self.assertFalse(Location.objects.exists())
+        event_request.refresh_from_db()
+        self.assertEqual((event_request.status, event_request.event_id), ('approved', event.pk))
+        bad_request.refresh_from_db()
+        self.assertEqual(bad_request.status, 'pending')
+
+    # id из JSON заявки бывают строками, а время - без зоны
+    def test_string_references_and_naive_times(self):
+        hall = Location.objects.create(name='Зал', city='Москва')
+        good_request = self.make_request('event', {
+            'title': 'Показ', 'start_time': '2025-07-01T18:00', 'end_time': '2025-07-01T20:00',
+            'category_id': str(self.category.pk), 'location_id': str(hall.pk),
+        })
+        bad_request = self.make_request('event', {
+            'title': 'Плохое', 'start_time': '2025-07-02T18:00', 'end_time': '2025-07-02T20:00',
+            'location_id': 'зал',
+        })
+        response = self.client.post('/api/requests/batch/', {'decisions': [
+            {'id': good_request.pk, 'status': 'approved'},
+            {'id': bad_request.pk, 'status': 'approved'},
+        ]}, format='json')
+        results = response.json()['results']
+        self.assertEqual(results[0]['status'], 'approved')
+        self.assertIn('ожидается числовой id', results[1]['error'])
+
+        event = Event.objects.get(title='Показ')
+        self.assertEqual((event.category_id, event.location_id), (self.category.pk, hall.pk))
+        self.assertEqual(timezone.localtime(event.start_time).hour, 18)
+        self.assertIn(('city', 'Москва', 1), EventStat.objects.values_list('dimension', 'key', 'count'))
+
+    def test_processed_request_is_not_applied_twice(self):
+        location_request = self.make_request('location', {'name': 'Сквер'})
+        payload = {'decisions': [{'id': location_request.pk, 'status': 'approved'}]}
+        self.client.post('/api/requests/batch/', payload, format='json')
+        response = self.client.post('/api/requests/batch/', payload, format='json')
+        self.assertIn('error', response.json()['results'][0])
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_plain_user_forbidden(self):
+        client = make_client('not-a-moderator')
+        response = client.post('/api/requests/batch/', {'decisions': []}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+# Очередь модерации и счётчики заявок
+class ModerationQueueTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('queue-moderator', role='moderator')
+        self.author = User.objects.create_user(username='queue-author', password='pass12345')
+        for i in range(5):
+            Request.objects.create(user=self.author, request_type='location', data={'name': f'Место {i}'})
+        Request.objects.create(user=self.author, request_type='category', data={'name': 'Спорт'})
+        self.client.get('/api/user-role/')
+
+    def test_queue_pages_oldest_first(self):
+        seen = []
+        url = '/api/requests/queue/?type=location&page_size=2'
+        while url:
+            data = self.client.get(url).json()
+            seen += [item['data']['name'] for item in data['results']]
+            url = data['next']
+        self.assertEqual(seen, [f'Место {i}' for i in range(5)])
+        self.assertEqual(self.client.get('/api/requests/queue/').json()['results'][0]['user'], 'queue-author')
+
+    def test_counters_follow_transitions(self):
+        request_obj = Request.objects.filter(request_type='location').first()
+        request_obj.status = 'rejected'
+        request_obj.save()
+        Request.objects.filter(request_type='category').get().delete()
+        with self.assertNumQueries(1):
+            counters = self.client.get('/api/requests/counters/').json()
+        self.assertEqual(counters['by_status'], {'pending': 4, 'approved': 0, 'rejected': 1})
+        self.assertEqual(counters['by_status_and_type']['pending'], {'location': 4, 'category': 0})
+
+
+# Аренда заявок: одна заявка не обрабатывается дважды
+class RequestClaimTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.first = make_client('first-moderator', role='moderator')
+        self.second = make_client('second-moderator', role='moderator')
+        author = User.objects.create_user(username='claim-author', password='pass12345')
+        self.requests = [
+            Request.objects.create(user=author, request_type='location', data={'name': f'Зал {i}'})
+            for i in range(4)
+        ]
+
+    def test_second_approval_conflicts(self):
+        url = f'/api/requests/{self.requests[0].pk}/'
+        self.assertEqual(self.first.patch(url, {'status': 'approved'}, format='json').status_code, 200)
+        self.assertEqual(self.second.patch(url, {'status': 'approved'}, format='json').status_code, 409)
+        jobs.run_pending()
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_claimed_request_is_protected(self):
+        pk = self.requests[0].pk
+        self.assertEqual(self.first.post(f'/api/requests/{pk}/claim/').status_code, 200)
+        self.assertEqual(self.second.post(f'/api/requests/{pk}/claim/').status_code, 409)
+        response = self.second.patch(f'/api/requests/{pk}/', {'status': 'rejected'}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.first.post(f'/api/requests/{pk}/release/').status_code, 204)
+        self.assertEqual(self.second.post(f'/api/requests/{pk}/claim/').status_code, 200)
+
+    def test_edit_without_decision_keeps_foreign_lease(self):
+        pk = self.requests[0].pk
+        self.assertEqual(self.first.post(f'/api/requests/{pk}/claim/').status_code, 200)
+        for payload in ({'data': {'name': 'Чужой зал'}}, {'status': 'pending'}):
+            response = self.second.patch(f'/api/requests/{pk}/', payload, format='json')
+            self.assertEqual(response.status_code, 409)
+        request_obj = Request.objects.get(pk=pk)
+        self.assertEqual(request_obj.claimed_by.username, 'first-moderator')
+        self.assertEqual(request_obj.data, {'name': 'Зал 0'})
+        self.assertEqual(self.second.post(f'/api/requests/{pk}/claim/').status_code, 409)
+        # Владелец аренды может править заявку, аренда при этом сохраняется
+        response = self.first.patch(f'/api/requests/{pk}/', {'data': {'name': 'Зал A'}}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNotNone(Request.objects.get(pk=pk).claimed_until)
+
+    def test_decision_cannot_be_reverted_to_pending(self):
+        url = f'/api/requests/{self.requests[0].pk}/'
+        self.assertEqual(self.first.patch(url, {'status': 'approved'}, format='json').status_code, 200)
+        for status_value in ('pending', 'rejected'):
+            response = self.second.patch(url, {'status': status_value}, format='json')
+            self.assertIn(response.status_code, (400, 409))
+        self.assertEqual(Request.objects.get(pk=self.requests[0].pk).status, 'approved')
+        self.assertEqual(jobs.run_pending(), 1)
+        self.assertEqual(Location.objects.count(), 1)
+
+    def test_claim_next_hands_out_disjoint_sets(self):
+        first = [item['id'] for item in self.first.post('/api/requests/claim-next/?limit=2').json()]
+        second = [item['id'] for item in self.second.post('/api/requests/claim-next/?limit=3').json()]
+        self.assertEqual(first, [r.pk for r in self.requests[:2]])
+        self.assertEqual(second, [r.pk for r in self.requests[2:]])
+
+    def test_plain_user_cannot_approve(self):
+        client = make_client('sneaky')
+        own = Request.objects.create(user=User.objects.get(username='sneaky'), request_type='location', data={'name': 'Моё'})
+        response = client.patch(f'/api/requests/{own.pk}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 403)
+
+
+# Очередь фоновых задач: одобрение выполняется воркером, ошибки повторяются с задержкой
+class JobQueueTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('job-moderator', role='moderator')
+        self.author = User.objects.create_user(username='job-author', password='pass12345')
+
+    def test_approval_side_effects_run_in_worker(self):
+        request_obj = Request.objects.create(user=self.author, request_type='event', data={
+            'title': 'Фестиваль', 'start_time': '2025-08-01T10:00:00Z', 'end_time': '2025-08-01T18:00:00Z',
+        })
+        response = self.client.patch(f'/api/requests/{request_obj.pk}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Event.objects.exists())
+        self.assertEqual(jobs.run_pending(), 1)
+        job = Job.objects.get()
+        self.assertEqual(job.status, 'done')
+        self.assertEqual(Event.objects.get().pk, job.result['event_id'])
+
+    def test_invalid_approval_rejected_before_status_change(self):
+        request_obj = Request.objects.create(user=self.author, request_type='event', data={
+            'title': 'Наоборот', 'start_time': '2025-08-01T18:00:00Z', 'end_time': '2025-08-01T10:00:00Z',
+        })
+        response = self.client.patch(f'/api/requests/{request_obj.pk}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('status', response.json())
+        request_obj.refresh_from_db()
+        self.assertEqual(request_obj.status, 'pending')
+        self.assertFalse(Job.objects.exists())
+
+    # Пока задача ждала в очереди, локацию заняли: заявка возвращается в pending с ошибкой
+    def test_failed_approval_returns_request_to_pending(self):
+        hall = Location.objects.create(name='Зал', city='Москва')
+        request_obj = Request.objects.create(user=self.author, request_type='event', data={
+            'title': 'Концерт', 'start_time': '2025-08-01T10:00:00Z', 'end_time': '2025-08-01T12:00:00Z',
+            'location_id': hall.pk,
+        })
+        response = self.client.patch(f'/api/requests/{request_obj.pk}/', {'status': 'approved'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        Event.objects.create(
+            title='Лекция', description='-', location=hall,
+            start_time=datetime.fromisoformat('2025-08-01T11:00:00+00:00'),
+            end_time=datetime.fromisoformat('2025-08-01T13:00:00+00:00'),
+        )
+        self.assertEqual(ReviewerStat.objects.get().approved, 1)
+
+        with self.assertLogs('events.jobs', 'WARNING'):
+            jobs.run_pending()
+        self.assertEqual(Job.objects.get().status, 'failed')
+        request_obj.refresh_from_db()
+        self.assertEqual((request_obj.status, request_obj.reviewed_by), ('pending', None))
+        self.assertTrue(request_obj.review_error.startswith('Локация уже занята'))
+        self.assertEqual(Event.objects.count(), 1)
+        self.assertEqual(ReviewerStat.objects.get().approved, 0)
+        counters = self.client.get('/api/requests/counters/').json()
+        self.assertEqual(counters['by_status']['pending'], 1)
+
+    def test_worker_survives_broken_job(self):
+        stop = threading.Event()
+
+        @jobs.register('tests.unsaved')
+        def unsaved(payload):
+            return object()
+
+        @jobs.register('tests.stop')
+        def stop_worker(payload):
+            stop.set()
+            return {}
+
+        broken = jobs.enqueue('tests.unsaved')
+        last = jobs.enqueue('tests.stop')
+        with mock.patch.object(jobs, 'close_old_connections'), self.assertLogs('events.jobs', 'ERROR'):
+            jobs.worker_loop(stop, 'test-worker', 0)
+        self.assertEqual(Job.objects.get(pk=last.pk).status, 'done')
+        self.assertEqual(Job.objects.get(pk=broken.pk).status, 'running')
+
+    def test_failures_are_retried_with_backoff(self):
+        calls = []
+
+        @jobs.register('tests.flaky')
+        def flaky(payload):
+            calls.append(payload)
+            raise RuntimeError('временная ошибка')
+
+        job = jobs.enqueue('tests.flaky', {'n': 1}, max_attempts=2)
+        with self.assertLogs('events.jobs', 'WARNING'):
+            self.assertEqual(jobs.run_pending(), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts), ('queued', 1))
+        self.assertGreater(job.run_at, timezone.now())
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        with self.assertLogs('events.jobs', 'WARNING'):
+            jobs.run_pending()
+        job.refresh_from_db()
+        self.assertEqual((job.status, len(calls)), ('failed', 2))
+        self.assertIn('временная ошибка', job.last_error)
+
+    def test_batch_async(self):
+        location_request = Request.objects.create(user=self.author, request_type='location', data={'name': 'Стадион'})
+        response = self.client.post('/api/requests/batch/?async=1', {
+            'decisions': [{'id': location_request.pk, 'status': 'approved'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 202)
+        jobs.run_pending()
+        job = self.client.get(f"/api/jobs/{response.json()['job']['id']}/").json()
+        self.assertEqual(job['status'], 'done')
+        self.assertEqual(job['result']['results'][0]['status'], 'approved')
+
+
+# Инкрементальная статистика должна совпадать с полным пересчётом
+class SummaryStatsTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('moderator', role='moderator')
+        self.moderator = User.objects.get(username='moderator')
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.music = Category.objects.create(name='Музыка', slug='music')
+        self.sport = Category.objects.create(name='Спорт', slug='sport')
+        self.hall = Location.objects.create(name='Зал', city='Москва')
+        self.park = Location.objects.create(name='Парк', city='Казань')
+
+    def snapshot(self):
+        return sorted(EventStat.objects.filter(count__gt=0).values_list('dimension', 'key', 'count'))
+
+    def make_event(self, **kwargs):
+        start = kwargs.pop('start', datetime(2025, 3, 10, 12, tzinfo=timezone.get_current_timezone()))
+        return Event.objects.create(
+            title='Событие', description='-', author=self.author,
+            start_time=start, end_time=start + timedelta(hours=2), **kwargs,
+        )
+
+    def test_incremental_matches_reconcile(self):
+        concert = self.make_event(category=self.music, location=self.hall)
+        self.make_event(category=self.sport, location=self.park)
+        match = self.make_event(category=self.sport)
+
+        concert = Event.objects.get(pk=concert.pk)
+        concert.location = self.park
+        concert.start_time += timedelta(days=30)
+        concert.end_time += timedelta(days=30)
+        concert.save()
+        Event.objects.get(pk=match.pk).delete()
+        park = Location.objects.get(pk=self.park.pk)
+        park.city = 'Самара'
+        park.save()
+        self.sport.delete()
+
+        incremental = self.snapshot()
+        self.assertIn(('city', 'Самара', 2), incremental)
+        self.assertIn(('month', '2025-04', 1), incremental)
+        stats.reconcile()
+        self.assertEqual(incremental, self.snapshot())
+
+    def test_bulk_paths_update_stats(self):
+        request_obj = Request.objects.create(user=self.author, request_type='event', data={
+            'title': 'Фестиваль', 'start_time': '2025-08-01T10:00:00Z', 'end_time': '2025-08-01T18:00:00Z',
+            'category_id': self.music.pk,
+        })
+        response = self.client.post('/api/requests/batch/', {
+            'decisions': [{'id': request_obj.pk, 'status': 'approved'}],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ReviewerStat.objects.get(reviewer=self.moderator).approved, 1)
+
+        incremental = self.snapshot()
+        stats.reconcile()
+        self.assertEqual(incremental, self.snapshot())
+
+        data = self.client.get('/api/stats/').json()
+        self.assertEqual(data['events_by_category'], [{'id': self.music.pk, 'name': 'Музыка', 'count': 1}])
+        self.assertEqual(data['reviewers'][0]['reviewed'], 1)
+        self.assertEqual(make_client('user').get('/api/stats/').status_code, 403)
+
+    # Сводные таблицы блокируются до чтения агрегатов, ошибка откатывает весь пересчёт
+    def test_reconcile_locks_first_and_is_atomic(self):
+        self.make_event(category=self.music, location=self.hall)
+        before = self.snapshot()
+        with CaptureQueriesContext(connection) as ctx:
+            stats.reconcile()
+        sql = [query['sql'] for query in ctx.captured_queries]
+        first_read = next(i for i, query in enumerate(sql) if 'FROM "events_event"' in query)
+        for table in ('events_eventstat', 'events_reviewerstat', 'events_requestcounter'):
+            self.assertTrue(any(table in query for query in sql[:first_read]), table)
+        self.assertEqual(self.snapshot(), before)
+
+        EventStat.objects.filter(dimension='category').update(count=5)
+        with mock.patch.object(stats, 'rebuild_counters', side_effect=RuntimeError('сбой')):
+            with self.assertRaises(RuntimeError):
+                stats.reconcile()
+        self.assertIn(('category', str(self.music.pk), 5), self.snapshot())
+
+    # post_save получает start_time в том виде, в каком его передали: строкой или без зоны
+    def test_naive_start_time(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore', RuntimeWarning)
+            event = Event.objects.create(
+                title='Утро', description='-', author=self.author, category=self.music,
+                start_time='2025-07-01T09:00', end_time='2025-07-01T11:00',
+            )
+            event.start_time = datetime(2025, 8, 1, 9)
+            event.end_time = datetime(2025, 8, 1, 11)
+            event.save()
+
+        incremental = self.snapshot()
+        self.assertIn(('month', '2025-08', 1), incremental)
+        self.assertNotIn(('month', '2025-07', 1), incremental)
+        stats.reconcile()
+        self.assertEqual(incremental, self.snapshot())
+
+
+# Пересечения мероприятий на одной локации и поиск свободных слотов
+class VenueBookingTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('moderator', role='moderator')
+        self.hall = Location.objects.create(name='Зал', city='Москва')
+        self.day = datetime(2025, 5, 20, tzinfo=timezone.get_current_timezone())
+        Event.objects.create(
+            title='Лекция', description='-', location=self.hall,
+            start_time=self.day.replace(hour=10), end_time=self.day.replace(hour=12),
+        )
+
+    def post_event(self, start_hour, end_hour):
+        return self.client.post('/api/events/', {
+            'title': 'Концерт', 'description': '-', 'location_id': self.hall.pk,
+            'start_time': self.day.replace(hour=start_hour).isoformat(),
+            'end_time': self.day.replace(hour=end_hour).isoformat(),
+        }, format='json')
+
+    def test_overlap_rejected_and_adjacent_allowed(self):
+        response = self.post_event(11, 13)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('location_id', response.json())
+        self.assertEqual(self.post_event(12, 14).status_code, 201)
+
+    def test_import_reports_conflicts(self):
+        content = (
+            'title,start_time,end_time,location_id\n'
+            f'А,2025-05-20T11:00:00,2025-05-20T11:30:00,{self.hall.pk}\n'
+            f'Б,2025-05-20T14:00:00,2025-05-20T16:00:00,{self.hall.pk}\n'
+            f'В,2025-05-20T15:00:00,2025-05-20T17:00:00,{self.hall.pk}\n'
+        )
+        upload = SimpleUploadedFile('events.csv', content.encode('utf-8'), content_type='text/csv')
+        summary = self.client.post('/api/events/import/', {'file': upload}, format='multipart').json()
+        self.assertEqual(summary['created'], 1)
+        self.assertEqual(sorted(e['row'] for e in summary['errors']), [2, 4])
+
+    # Пересечение, вставленное параллельно после find_conflicts: на SQLite ограничения
+    # исключения нет, поэтому его ошибку для строки «Б» воспроизводим в bulk_create
+    def test_import_reports_concurrent_conflict_per_row(self):
+        bulk_create = Event.objects.bulk_create
+
+        def racing_bulk_create(events, *args, **kwargs):
+            if any(event.title == 'Б' for event in events):
+                raise IntegrityError(f'conflicting key value violates exclusion constraint "{booking.EXCLUSION_CONSTRAINT}"')
+            return bulk_create(events, *args, **kwargs)
+
+        content = (
+            'title,start_time,end_time,location_id\n'
+            f'А,2025-05-21T10:00:00,2025-05-21T11:00:00,{self.hall.pk}\n'
+            f'Б,2025-05-21T12:00:00,2025-05-21T13:00:00,{self.hall.pk}\n'
+            f'В,2025-05-21T14:00:00,2025-05-21T15:00:00,{self.hall.pk}\n'
+        )
+        upload = SimpleUploadedFile('events.csv', content.encode('utf-8'), content_type='text/csv')
+        with mock.patch.object(Event.objects, 'bulk_create', side_effect=racing_bulk_create):
+            response = self.client.post('/api/events/import/', {'file': upload}, format='multipart')
+        self.assertEqual(response.status_code, 200)
+        summary = response.json()
+        self.assertEqual(summary['created'], 2)
+        self.assertEqual([e['row'] for e in summary['errors']], [3])
+        self.assertIn('location_id', summary['errors'][0]['errors'])
+        self.assertEqual(
+            sorted(Event.objects.filter(start_time__date='2025-05-21').values_list('title', flat=True)), ['А', 'В']
+        )
+
+    # Сохранённые пересечения ищутся по каждому кандидату, а не по всему окну пачки
+    def test_find_conflicts_per_candidate(self):
+        for day in range(1, 10):
+            start = self.day + timedelta(days=day, hours=10)
+            Event.objects.create(title=f'День {day}', description='-', location=self.hall,
+                                 start_time=start, end_time=start + timedelta(hours=1))
+        moved = Event.objects.get(title='Лекция')
+        moved.start_time, moved.end_time = self.day.replace(hour=20), self.day.replace(hour=21)
+
+        def candidate(start, hours=1):
+            return Event(location_id=self.hall.pk, start_time=start, end_time=start + timedelta(hours=hours))
+
+        events = [
+            candidate(self.day.replace(hour=10)),
+            candidate(self.day + timedelta(days=5, hours=10, minutes=30)),
+            candidate(self.day + timedelta(days=20)),
+            candidate(self.day + timedelta(days=20, minutes=30)),
+            moved,
+            candidate(self.day.replace(hour=20, minute=30)),
+        ]
+        day5 = Event.objects.get(title='День 5').pk
+        with self.assertNumQueries(len(events)):
+            clashes = booking.find_conflicts(events)
+        self.assertEqual(clashes, {1: day5, 3: None, 5: moved.pk})
+
+    def test_free_slots(self):
+        self.post_event(14, 15)
+        response = self.client.get(f'/api/locations/{self.hall.pk}/free-slots/', {
+            'from': self.day.replace(hour=9).isoformat(), 'to': self.day.replace(hour=18).isoformat(),
+            'min_duration': 90,
+        })
+        self.assertEqual(response.status_code, 200)
+        free = [(slot['start'][11:16], slot['end'][11:16]) for slot in response.json()['free']]
+        self.assertEqual(free, [('12:00', '14:00'), ('15:00', '18:00')])
+        missing = self.client.get(f'/api/locations/{self.hall.pk}/free-slots/')
+        self.assertEqual(missing.status_code, 400)
+
+
+# ?fields=/?exclude= сокращают и ответ, и SQL
+class SparseFieldsetTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('reader')
+        self.client.get('/api/user-role/')
+        hall = Location.objects.create(name='Зал', city='Москва', capacity=100)
+        music = Category.objects.create(name='Музыка', slug='music')
+        start = timezone.now()
+        for i in range(3):
+            Event.objects.create(
+                title=f'Событие {i}', description='Длинное описание', location=hall, category=music,
+                start_time=start + timedelta(days=i), end_time=start + timedelta(days=i, hours=1),
+            )
+
+    def test_fields_shape_output_and_sql(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/events/', {'fields': 'id,title,start_time,location.name'})
+        self.assertEqual(response.status_code, 200)
+        results = response.json()['results']
+        self.assertEqual(len(results), 3)
+        self.assertEqual(set(results[0]), {'id', 'title', 'start_time', 'location'})
+        self.assertEqual(results[0]['location'], {'name': 'Зал'})
+        sql = queries[-1]['sql']
+        self.assertNotIn('description', sql)
+        self.assertNotIn('auth_user', sql)
+        self.assertNotIn('events_category', sql)
+
+    def test_exclude_and_public_feed(self):
+        response = self.client.get('/api/public-events/', {'exclude': 'description,author,category.name'})
+        event = response.json()['results'][0]
+        self.assertNotIn('description', event)
+        self.assertNotIn('author', event)
+        self.assertEqual(set(event['category']), {'id'})
+
+        locations = self.client.get('/api/locations/', {'fields': 'name'}).json()
+        self.assertEqual(locations, [{'name': 'Зал'}])
+
+    def test_unknown_field(self):
+        response = self.client.get('/api/categories/', {'fields': 'id,color'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('fields', response.json())
+
+
+# ?sideload=1: связи выносятся в словари верхнего уровня без повторов
+class SideloadTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.client = make_client('reader')
+        self.author = User.objects.create_user(username='author', password='pass12345')
+        self.hall = Location.objects.create(name='Зал', city='Москва')
+        self.music = Category.objects.create(name='Музыка', slug='music')
+        start = timezone.now()
+        for i in range(4):
+            Event.objects.create(
+                title=f'Событие {i}', description='-', author=self.author, category=self.music,
+                location=self.hall if i % 2 else None,
+                start_time=start + timedelta(days=i), end_time=start + timedelta(days=i, hours=1),
+            )
+
+    def test_events_reference_lookup_maps(self):
+        plain = self.client.get('/api/events/').json()['results']
+        data = self.client.get('/api/events/', {'sideload': '1'}).json()
+        self.assertEqual(list(data['users']), [str(self.author.pk)])
+        self.assertEqual(data['users'][str(self.author.pk)], plain[0]['author'])
+        self.assertEqual(data['categories'], {str(self.music.pk): plain[0]['category']})
+        self.assertEqual(list(data['locations']), [str(self.hall.pk)])
+        for event, expected in zip(data['results'], plain):
+            self.assertEqual(event['author_id'], self.author.pk)
+            self.assertEqual(event['location_id'], expected['location']['id'] if expected['location'] else None)
+            self.assertNotIn('author', event)
+            self.assertEqual(event['title'], expected['title'])
+
+    def test_public_feed_with_fields(self):
+        data = self.client.get('/api/public-events/', {'sideload': 'true', 'fields': 'id,title,location.name'}).json()
+        self.assertEqual(set(data), {'next', 'previous', 'results', 'locations'})
+        self.assertEqual(data['locations'], {str(self.hall.pk): {'name': 'Зал'}})
+        self.assertEqual(set(data['results'][1]), {'id', 'title', 'location_id'})
+
+
+# Быстрый путь (values() + orjson) должен отдавать те же байты, что и ModelSerializer
+class FastPathSerializationTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.reader = make_client('reader')
+        self.moderator = make_client('moderator', role='moderator')
+        author = User.objects.create_user(username='автор', password='pass12345', email='a@example.com')
+        hall = Location.objects.create(name='Зал «Октябрь»', city=None, capacity=None)
+        park = Location.objects.create(name='Парк\n"Сокольники"', city='Москва', capacity=5000)
+        music = Category.objects.create(name='Музыка \u2028 и\tтанцы', slug='music')
+        start = timezone.now().replace(microsecond=123456)
+        for i in range(7):
+            Event.objects.create(
+                title=f'Событие {i} \\ "кавычки" 😀', description=None if i % 3 == 0 else 'Описание\u2028\u2029',
+                author=author if i % 2 else None, category=music if i % 3 else None,
+                location=(hall, park, None)[i % 3], is_public=i != 4,
+                start_time=start + timedelta(days=i), end_time=start + timedelta(days=i, hours=3),
+            )
+
+    def assert_same_bytes(self, client, url, params=None):
+        fast = client.get(url, params)
+        with self.settings(EVENTS_FAST_SERIALIZERS=False):
+            slow = client.get(url, params)
+        self.assertEqual(fast.status_code, 200)
+        self.assertEqual(fast.content, slow.content)
+        return fast
+
+    def test_event_lists(self):
+        first = self.assert_same_bytes(self.reader, '/api/events/', {'page_size': 3})
+        self.assert_same_bytes(self.reader, first.json()['next'])
+        self.assert_same_bytes(self.reader, '/api/events/', {'fields': 'id,title,author.profile,location.name'})
+        self.assert_same_bytes(self.reader, '/api/events/', {'exclude': 'author', 'q': 'Событие'})
+
+    # Колонка курсора (start_time) нужна пагинации, даже если ?fields= её не выбрал
+    def test_fields_on_multi_page_list(self):
+        for url in ('/api/events/', '/api/public-events/'):
+            titles = []
+            response = self.assert_same_bytes(self.reader, url, {'fields': 'title', 'page_size': 2})
+            while True:
+                data = response.json()
+                self.assertTrue(all(set(event) == {'title'} for event in data['results']))
+                titles += [event['title'] for event in data['results']]
+                if data['next'] is None:
+                    break
+                response = self.assert_same_bytes(self.reader, data['next'])
+            self.assertEqual(len(titles), len(set(titles)))
+            self.assertEqual(len(titles), 7 if url == '/api/events/' else 6)
+        # Синхронный FastListMixin (при ASYNC_READ_VIEWS = False)
+        from rest_framework.test import APIRequestFactory
+        from .views import EventViewSet
+
+        view = EventViewSet.as_view({'get': 'list'})
+        response = view(APIRequestFactory().get('/api/events/', {'fields': 'title', 'page_size': 2}))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(set(response.data['results'][0]), {'title'})
+        self.assertIsNotNone(response.data['next'])
+
+    def test_public_feed(self):
+        feed.bump_version()
+        fast = self.reader.get('/api/public-events/').content
+        feed.bump_version()
+        with self.settings(EVENTS_FAST_SERIALIZERS=False):
+            slow = self.reader.get('/api/public-events/').content
+        self.assertEqual(fast, slow)
+        self.assert_same_bytes(self.reader, '/api/public-events/', {'page_size': 2})
+
+    # orjson и brotli закреплены в requirements.txt, но без них ответы те же:
+    # JSON собирает JSONRenderer, а лента отдаётся в gzip вместо br
+    def test_without_orjson_and_brotli(self):
+        fast = self.reader.get('/api/events/', {'page_size': 3}).content
+        with mock.patch.object(renderers, 'orjson', None), mock.patch.object(feed, 'brotli', None):
+            self.assertEqual(self.reader.get('/api/events/', {'page_size': 3}).content, fast)
+            feed.bump_version()
+            response = self.reader.get('/api/public-events/', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(json.loads(gzip.decompress(response.content))['results'][0]['title'], 'Событие 0 \\ "кавычки" 😀')
+
+    @skipUnless(feed.brotli, 'нужен пакет brotli')
+    def test_brotli_variant(self):
+        feed.bump_version()
+        plain = self.reader.get('/api/public-events/').content
+        response = self.reader.get('/api/public-events/', HTTP_ACCEPT_ENCODING='br, gzip')
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(feed.brotli.decompress(response.content), plain)
+
+    def test_categories_and_locations(self):
+        for client in (self.reader, self.moderator):
+            self.assert_same_bytes(client, '/api/categories/')
+            self.assert_same_bytes(client, '/api/locations/')
+        self.assertNotIn(b'slug', self.reader.get('/api/categories/').content)
+
+
+# Серверные страницы: пагинация, кэш карточек, заголовки и 404
+class EventPagesTests(TestCase):
+    def setUp(self):
+        start = timezone.now()
+        self.events = [
+            Event.objects.create(
+                title=f'Событие {i}', description='Описание', start_time=start + timedelta(days=i),
+                end_time=start + timedelta(days=i, hours=1),
+            )
+            for i in range(3)
+        ]
+
+    def test_list_is_paginated_and_streamed(self):
+        response = self.client.get('/events/', {'page_size': 2})
+        self.assertTrue(response.streaming)
+        self.assertIn('public', response['Cache-Control'])
+        html = b''.join(response.streaming_content).decode()
+        self.assertIn('Событие 0', html)
+        self.assertNotIn('Событие 2', html)
+        self.assertIn('rel="next"', html)
+
+    def test_cards_are_cached_until_event_changes(self):
+        b''.join(self.client.get('/').streaming_content)
+        Event.objects.filter(pk=self.events[0].pk).update(title='Изменено без updated_at')
+        html = b''.join(self.client.get('/').streaming_content).decode()
+        self.assertIn('Событие 0', html)
+        event = Event.objects.get(pk=self.events[0].pk)
+        event.title = 'Новое название'
+        event.save()
+        html = b''.join(self.client.get('/').streaming_content).decode()
+        self.assertIn('Новое название', html)
+
+    def test_detail(self):
+        response = self.client.get(f'/event/{self.events[1].pk}/')
+        self.assertContains(response, 'Событие 1')
+        cached = self.client.get(f'/event/{self.events[1].pk}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+        self.assertEqual(self.client.get('/event/999999/').status_code, 404)
+
+
+# Async-эндпоинты отвечают так же, как синхронные DRF-представления
+class AsyncReadPathTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.token = Token.objects.create(user=self.user).key
+        start = timezone.now()
+        self.event = Event.objects.create(
+            title='Концерт', description='-', author=self.user,
+            start_time=start, end_time=start + timedelta(hours=2),
+        )
+
+    def get(self, path, token=None, **params):
+        headers = {'HTTP_AUTHORIZATION': f'Token {token}'} if token else {}
+        fast = self.client.get(path, params, **headers)
+        with self.settings(EVENTS_FAST_SERIALIZERS=False):
+            slow = self.client.get(path, params, **headers)
+        self.assertEqual((fast.status_code, fast.content), (slow.status_code, slow.content))
+        return fast
+
+    def test_same_responses_as_sync_views(self):
+        self.assertEqual(self.get('/api/events/', page_size=1).status_code, 200)
+        self.assertEqual(self.get(f'/api/events/{self.event.pk}/', self.token).status_code, 200)
+        self.assertEqual(self.get(f'/api/events/{self.event.pk}/').status_code, 401)
+        self.assertEqual(self.get('/api/events/999999/', self.token).status_code, 404)
+        self.assertEqual(self.get('/api/events/', 'wrong-token').status_code, 401)
+        self.assertEqual(self.get('/api/events/', fields='id,colour').status_code, 400)
+        self.assertEqual(self.get('/api/user-role/', self.token).json(), {'role': 'user', 'username': 'reader'})
+        self.assertEqual(self.get('/api/public-events/', q='Концерт').json()['results'][0]['title'], 'Концерт')
+
+    def test_writes_fall_back_to_sync_views(self):
+        UserProfile.objects.filter(user=self.user).update(role='moderator')
+        response = self.client.patch(
+            f'/api/events/{self.event.pk}/', {'title': 'Новый концерт'},
+            content_type='application/json', HTTP_AUTHORIZATION=f'Token {self.token}',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['title'], 'Новый концерт')
+
+
+# Метрики пула соединений: насыщенность и ожидание выдачи, доступ только админу
+class DbPoolStatsTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+
+    def test_pool_metrics(self):
+        metrics = dbpool.pool_metrics({
+            'pool_min': 2, 'pool_max': 10, 'pool_size': 8, 'pool_available': 3,
+            'requests_num': 40, 'requests_queued': 4, 'requests_wait_ms': 200, 'requests_errors': 1,
+        })
+        self.assertEqual(metrics['in_use'], 5)
+        self.assertEqual(metrics['saturation'], 0.5)
+        self.assertEqual(metrics['checkout_wait_ms_avg'], 5.0)
+        self.assertEqual(metrics['checkout_timeouts'], 1)
+        self.assertEqual(dbpool.pool_metrics({})['saturation'], 0.0)
+
+    def test_stats_endpoint(self):
+        self.assertEqual(make_client('plain').get('/api/db-pool/stats/').status_code, 403)
+        response = make_client('admin', role='admin').get('/api/db-pool/stats/')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(response.json()['default']['mode'], ('pool', 'persistent', 'per-request'))
+
+    # В режиме пула Django шлёт connection_created на каждую выдачу соединения:
+    # это выдачи, а физические открытия берутся из статистики пула
+    def test_pool_checkouts_are_not_physical_opens(self):
+        class Pool:
+            def get_stats(self):
+                return {'pool_min': 2, 'pool_max': 10, 'pool_size': 2, 'pool_available': 2, 'connections_num': 2}
+
+        connection.pool = Pool()
+        self.addCleanup(delattr, connection, 'pool')
+        client = make_client('admin', role='admin')
+        before = dbpool.database_stats('default')
+        for _ in range(2):
+            connection_created.send(sender=type(connection), connection=connection)
+            client.get('/api/db-pool/stats/')
+        after = dbpool.database_stats('default')
+        self.assertEqual((before['mode'], before['connections_opened']), ('pool', 2))
+        self.assertEqual(after['connections_opened'], 2)
+        self.assertEqual(after['connection_checkouts'], before['connection_checkouts'] + 2)
+        body = metrics.render()
+        self.assertIn('db_connections_opened_total{alias="default"} 2', body)
+        self.assertIn('db_connection_checkouts_total{alias="default"}', body)
+
+
+# Настоящий пул psycopg_pool: соединение возвращается в пул после каждого запроса,
+# а число открытых пулом соединений после прогрева не растёт
+@skipUnless(
+    connection.vendor == 'postgresql' and 'pool' in settings.DATABASES['default'].get('OPTIONS', {}),
+    'нужен PostgreSQL с OPTIONS["pool"]',
+)
+class DbPoolReuseTests(TransactionTestCase):
+    def test_requests_reuse_pooled_connections(self):
+        client = make_client('admin', role='admin')
+        client.get('/api/db-pool/stats/')
+        connection.close()
+        before = dbpool.database_stats('default')
+        for _ in range(2):
+            self.assertEqual(client.get('/api/db-pool/stats/').status_code, 200)
+            connection.close()
+        after = dbpool.database_stats('default')
+        self.assertEqual(after['connections_opened'], before['connections_opened'])
+        self.assertEqual(after['connection_checkouts'], before['connection_checkouts'] + 2)
+
+
+REPLICAS = dict(settings.DATABASE_REPLICAS, ALIASES=['replica'])
+
+
+# Маршрутизация чтения: реплика только для безопасных запросов к отмеченным представлениям
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.router = replicas.ReplicaRouter()
+        self.factory = RequestFactory()
+        self.middleware = replicas.ReplicaRoutingMiddleware(lambda request: None)
+
+    def route(self, request, view):
+        self.middleware.process_request(request)
+        self.middleware.process_view(request, view, (), {})
+        alias = replicas.current_alias()
+        replicas.reset_alias(None)
+        return alias
+
+    def test_router(self):
+        with replicas.use_alias('replica'):
+            self.assertEqual(self.router.db_for_read(Event), 'replica')
+            self.assertIsNone(self.router.db_for_read(Token))
+            self.assertIsNone(self.router.db_for_read(UserProfile))
+        self.assertIsNone(self.router.db_for_read(Event))
+        self.assertEqual(self.router.db_for_write(Event), 'default')
+
+    def test_only_marked_safe_views(self):
+        from .views import EventViewSet, RequestViewSet, event_list
+
+        events = EventViewSet.as_view({'get': 'list'})
+        self.assertEqual(self.route(self.factory.get('/api/events/'), events), 'replica')
+        self.assertEqual(self.route(self.factory.get('/'), event_list), 'replica')
+        self.assertIsNone(self.route(self.factory.post('/api/events/'), events))
+        self.assertIsNone(self.route(self.factory.get('/api/requests/'), RequestViewSet.as_view({'get': 'list'})))
+
+    def test_writer_is_pinned_to_primary(self):
+        from .views import EventViewSet
+
+        events = EventViewSet.as_view({'get': 'list'})
+        writer = self.factory.post('/api/events/', HTTP_AUTHORIZATION='Token writer')
+        self.middleware.process_response(writer, HttpResponse(status=201))
+        self.assertIsNone(self.route(self.factory.get('/api/events/', HTTP_AUTHORIZATION='Token writer'), events))
+        self.assertEqual(self.route(self.factory.get('/api/events/', HTTP_AUTHORIZATION='Token other'), events), 'replica')
+
+        failed = self.factory.post('/api/events/', HTTP_AUTHORIZATION='Token failed')
+        self.middleware.process_response(failed, HttpResponse(status=400))
+        self.assertEqual(self.route(self.factory.get('/api/events/', HTTP_AUTHORIZATION='Token failed'), events), 'replica')
+
+
+# Чтение с настоящей второй БД: нужен DATABASES['replica'] с отдельной тестовой
+# базой (без TEST MIRROR), иначе реплику не отличить от основной
+@skipUnless(
+    'replica' in settings.DATABASES and not settings.DATABASES['replica'].get('TEST', {}).get('MIRROR'),
+    'не настроена отдельная тестовая БД реплики',
+)
+@override_settings(DATABASE_REPLICAS=REPLICAS)
+class ReplicaReadTests(TestCase):
+    databases = {'default', 'replica'} & set(settings.DATABASES)
+
+    def setUp(self):
+        cache.clear()
+        token_cache.clear()
+        self.client = make_client('editor', role='moderator')
+        start = timezone.now()
+        self.event = Event.objects.create(
+            title='Концерт', description='-', start_time=start, end_time=start + timedelta(hours=2),
+        )
+
+    def test_lists_read_from_replica(self):
+        self.assertEqual(APIClient().get('/api/events/').json()['results'], [])
+        Event.objects.using('replica').create(
+            title='С реплики', description='-', start_time=self.event.start_time, end_time=self.event.end_time,
+        )
+        titles = [event['title'] for event in APIClient().get('/api/events/').json()['results']]
+        self.assertEqual(titles, ['С реплики'])
+
+    def test_writer_reads_own_changes(self):
+        response = self.client.patch(f'/api/events/{self.event.pk}/', {'title': 'Новый концерт'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.get(f'/api/events/{self.event.pk}/').json()['title'], 'Новый концерт')
+        self.assertEqual(make_client('reader').get(f'/api/events/{self.event.pk}/').status_code, 404)
+
+
+# Метрики по маршрутам и /metrics в формате Prometheus
+class RequestMetricsTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        metrics.registry.clear()
+        self.client = make_client('reader')
+
+    def scrape(self):
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_routes_are_recorded(self):
+        self.client.get('/api/categories/')
+        self.client.get('/api/categories/')
+        self.client.get('/api/requests/999999/')
+        body = self.scrape()
+        self.assertIn('http_request_duration_seconds_count{route="category-list"} 2', body)
+        self.assertIn('http_request_db_queries_bucket{route="category-list",le="+Inf"} 2', body)
+        self.assertIn('http_responses_total{route="category-list",status="200"} 2', body)
+        self.assertIn('http_responses_total{route="request-detail",status="404"} 1', body)
+        self.assertIn('http_response_size_bytes_count{route="category-list"} 2', body)
+        self.assertIn('db_connections_opened_total{alias="default"}', body)
+        queries = metrics.registry.snapshot()['queries']['category-list']
+        self.assertGreaterEqual(queries[2], 2)
+
+    def test_repeated_sql_is_flagged(self):
+        collector = metrics.QueryCollector()
+        for _ in range(3):
+            collector.add('SELECT 1 FROM t WHERE id = %s', 0.001)
+        collector.add('SELECT 2', 0.001)
+        self.assertEqual(collector.repeated(3), {'SELECT 1 FROM t WHERE id = %s': 3})
+        with self.settings(REQUEST_METRICS={'N_PLUS_ONE_THRESHOLD': 3}), self.assertLogs('events.metrics', 'WARNING'):
+            metrics.record_request(RequestFactory().get('/'), HttpResponse(), 0.01, collector)
+        self.assertIn('http_request_n_plus_one_total{route="<unmatched>"} 1', self.scrape())
+
+    def test_metrics_restricted_by_address(self):
+        self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.1').status_code, 403)
+
+
+# Структурные логи: контекст запроса, X-Request-ID, выборка и очередь записи
+class RequestLoggingTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user(username='reader', password='pass12345')
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=self.user).key}')
+
+    def capture(self):
+        records = []
+        handler = logging.Handler()
+        handler.addFilter(logs.RequestContextFilter())
+        handler.addFilter(logs.SamplingFilter())
+        handler.emit = records.append
+        logger = logging.getLogger('events.requests')
+        logger.addHandler(handler)
+        logger.propagate = False
+        # Под manage.py test корневой уровень WARNING, строки доступа пишутся на INFO
+        self.addCleanup(logger.setLevel, logger.level)
+        logger.setLevel(logging.INFO)
+        self.addCleanup(logger.removeHandler, handler)
+        self.addCleanup(setattr, logger, 'propagate', True)
+        return records
+
+    @override_settings(REQUEST_LOGGING={'SAMPLE_RATE': 1.0})
+    def test_access_line_has_request_context(self):
+        records = self.capture()
+        response = self.client.get('/api/user-role/', HTTP_X_REQUEST_ID='abc-123')
+        self.assertEqual(response['X-Request-ID'], 'abc-123')
+        line = json.loads(logs.JsonFormatter().format(records[-1]))
+        self.assertEqual(line['request_id'], 'abc-123')
+        self.assertEqual(line['route'], 'user-role')
+        self.assertEqual(line['user_id'], self.user.pk)
+        self.assertEqual(line['status'], 200)
+        self.assertIn('duration_ms', line)
+
+        response = self.client.get('/api/user-role/', HTTP_X_REQUEST_ID='bad id\n')
+        self.assertNotEqual(response['X-Request-ID'], 'bad id\n')
+
+    def test_sampling_keeps_slow_requests(self):
+        records = self.capture()
+        with self.settings(REQUEST_LOGGING={'SAMPLE_RATE': 0.0}):
+            self.client.get('/api/user-role/')
+        self.assertEqual(records, [])
+        with self.settings(REQUEST_LOGGING={'SAMPLE_RATE': 0.0, 'SLOW_MS': 0}):
+            self.client.get('/api/user-role/')
+        self.assertEqual([record.levelno for record in records], [logging.WARNING])
+
+    def test_queued_handler_writes_json_lines(self):
+        stream = io.StringIO()
+        handler = logs.QueuedStreamHandler(stream)
+        handler.setFormatter(logs.JsonFormatter())
+        record = logging.LogRecord('events', logging.INFO, __file__, 1, 'Задача %s', ('готова',), None)
+        record.job_id = 7
+        handler.handle(record)
+        handler.flush()
+        handler.close()
+        line = json.loads(stream.getvalue())
+        self.assertEqual((line['message'], line['job_id']), ('Задача готова', 7))
+
+
+# Генератор нагрузочных данных и бенчмарк API с базовым результатом
+class LoadTestTests(TestCase):
+    def setUp(self):
+        token_cache.clear()
+        call_command(
+            'generate_fixtures', users=8, categories=3, locations=2, events=60, requests=6,
+            seed=1, batch_size=25, stdout=io.StringIO(),
+        )
+
+    def test_generated_data(self):
+        self.assertEqual(Event.objects.count(), 60)
+        self.assertEqual(Request.objects.filter(status='pending').count(), 6)
+        self.assertEqual(UserProfile.objects.get(user__username='load_user_0000000').role, 'admin')
+        self.assertEqual(sum(EventStat.objects.filter(dimension='month').values_list('count', flat=True)), 60)
+        for location in Location.objects.all():
+            events = list(location.events.order_by('start_time'))
+            for previous, current in zip(events, events[1:]):
+                self.assertLessEqual(previous.end_time, current.start_time)
+        with self.assertRaises(CommandError):
+            call_command('generate_fixtures', users=1, events=0, requests=0, stdout=io.StringIO())
+
+    def test_benchmark_baseline(self):
+        path = os.path.join(tempfile.mkdtemp(), 'baseline.json')
+        self.addCleanup(os.remove, path)
+        call_command('benchmark_api', requests=3, concurrency=1, host='testserver', save=path, stdout=io.StringIO())
+        with open(path, encoding='utf-8') as stream:
+            baseline = json.load(stream)
+        self.assertEqual(baseline['scale']['events'], 60)
+        for name in ('event-list', 'event-detail', 'request-list', 'user-list', 'public-events'):
+            self.assertEqual(baseline['endpoints'][name]['errors'], 0, name)
+            self.assertEqual(baseline['endpoints'][name]['requests'], 3)
+
+        slower = json.loads(json.dumps(baseline))
+        slower['endpoints']['event-list'].update(p95_ms=baseline['endpoints']['event-list']['p95_ms'] + 50)
+        slower['endpoints']['category-list']['queries'] += 1
+        rows = {row['endpoint']: row for row in loadtest.compare(slower, baseline)}
+        self.assertEqual(rows['event-list']['status'], 'regression')
+        self.assertEqual(rows['category-list']['status'], 'regression')
+        self.assertEqual(rows['public-events']['status'], 'ok')
+
+        baseline['endpoints']['category-list']['queries'] -= 1
+        with open(path, 'w', encoding='utf-8') as stream:
+            json.dump(baseline, stream)
+        with self.assertRaises(CommandError):
+            call_command(
+                'benchmark_api', requests=3, concurrency=1, host='testserver', baseline=path,
+                endpoint=['category-list'], stdout=io.StringIO(),
+            )
@@ -1,20 +1,76 @@
-from django.shortcuts import render
+import hashlib
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.shortcuts import render, get_object_or_404
+from django.http import Http404, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.http import condition, require_safe
 from django.contrib.auth.models import User
 from rest_framework import viewsets, status
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.decorators import api_view, permission_classes
+from rest_framework.decorators import api_view, permission_classes, action
+from rest_framework.parsers import MultiPartParser
+from rest_framework.request import Request as DRFRequest
 from rest_framework.response import Response
-from .models import Event, Category, Location, Request, UserProfile
-from .serializers import EventSerializer, CategorySerializer, LocationSerializer, RequestSerializer, RegisterSerializer, UserSerializer
+from .models import Event, Category, Location, Request, UserProfile, Job
+from .serializers import EventSerializer, CategorySerializer, LocationSerializer, RequestSerializer, RegisterSerializer, UserSerializer, JobSerializer
 from .permissions import RoleBasedPermission, IsRoleAdmin
+from .pagination import EventCursorPagination, RequestQueuePagination
+from .filters import filter_time_window, filter_search, parse_time_window
+from .roles import resolve_role, STAFF_ROLES
+from .authentication import token_cache
+from . import feed
+from .importers import EventImporter, IMPORT_FORMATS, detect_format, iter_rows
+from .exporters import ENCODERS, EXPORT_FORMATS, iter_export_rows
+from .moderation import DECISIONS, DecisionError, ModerationBatch, validate_approval
+from .counters import counter_snapshot
+from . import claims
+from . import jobs
+from . import stats
+from . import booking
+from . import dbpool
+from .fieldsets import Fieldset, SparseFieldsetMixin
+from .replicas import replica_reads
+from .sideload import sideload, sideload_requested
+from .fastpath import FastListMixin, compile_serializer, fast_path_allowed
+from .renderers import FAST_RENDERER_CLASSES
+from rest_framework.exceptions import NotFound, PermissionDenied, ValidationError
 from rest_framework.permissions import IsAdminUser
 
-class EventViewSet(viewsets.ModelViewSet):
-    queryset = Event.objects.all()
+logger = logging.getLogger(__name__)
+
+class EventViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
+    queryset = Event.objects.with_relations()
+    replica_reads = True
     serializer_class = EventSerializer
     permission_classes = [RoleBasedPermission]
+    pagination_class = EventCursorPagination
+    # Курсор пагинации строится по start_time, поэтому колонка нужна всегда
+    fieldset_required = ('start_time',)
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action == 'list':
+            queryset = filter_time_window(queryset, self.request.query_params)
+            queryset = filter_search(queryset, self.request.query_params)
+        return queryset
+
+    # ?sideload=1 - нормализованный ответ: id связей в мероприятиях и словари users/categories/locations
+    def list(self, request, *args, **kwargs):
+        if not sideload_requested(request.query_params):
+            return super().list(request, *args, **kwargs)
+        page = self.paginate_queryset(self.filter_queryset(self.get_queryset()))
+        results, included = sideload(self.get_serializer(many=True), page)
+        response = self.get_paginated_response(results)
+        response.data.update(included)
+        return response
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
@@ -24,57 +80,151 @@ class EventViewSet(viewsets.ModelViewSet):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
     def perform_create(self, serializer):
-        profile = UserProfile.objects.get(user=self.request.user)
-        if profile.role == 'user':
+        role = resolve_role(self.request.user)
+        if role == 'user':
             request_data = {
                 'request_type': 'event',
                 'data': serializer.validated_data,
                 'user': self.request.user
             }
             Request.objects.create(**request_data)
-        elif profile.role in ['moderator', 'admin']:
+        elif role in STAFF_ROLES:
             serializer.save(author=self.request.user)
 
-class CategoryViewSet(viewsets.ModelViewSet):
+    # Массовый импорт CSV/NDJSON (файл в поле file); доступен модераторам и админам
+    @action(detail=False, methods=['post'], url_path='import', parser_classes=[MultiPartParser])
+    def import_events(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'Файл не передан'}, status=status.HTTP_400_BAD_REQUEST)
+        file_format = request.data.get('type') or detect_format(upload.name)
+        if file_format not in IMPORT_FORMATS:
+            return Response({'error': f'Поддерживаются форматы: {", ".join(IMPORT_FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        importer = EventImporter(author=request.user)
+        summary = importer.run(iter_rows(upload.file, file_format))
+        return Response(summary, status=status.HTTP_200_OK)
+
+    # Потоковая выгрузка CSV/NDJSON/ICS (?type=) с фильтрами category, location, from/to, q
+    @action(detail=False, methods=['get'], url_path='export')
+    def export_events(self, request):
+        file_format = request.query_params.get('type', 'csv')
+        if file_format not in EXPORT_FORMATS:
+            return Response({'error': f'Поддерживаются форматы: {", ".join(EXPORT_FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        queryset = Event.objects.all()
+        for param in ('category', 'location'):
+            value = request.query_params.get(param)
+            if value:
+                if not value.isdigit():
+                    return Response({param: 'Ожидается числовой идентификатор'}, status=status.HTTP_400_BAD_REQUEST)
+                queryset = queryset.filter(**{f'{param}_id': value})
+        queryset = filter_time_window(queryset, request.query_params)
+        queryset = filter_search(queryset, request.query_params)
+
+        rows = iter_export_rows(queryset)
+        if file_format == 'ics':
+            content = ENCODERS['ics'](rows, host=request.get_host())
+        else:
+            content = ENCODERS[file_format](rows)
+        response = StreamingHttpResponse(content, content_type=EXPORT_FORMATS[file_format])
+        response['Content-Disposition'] = f'attachment; filename="events.{file_format}"'
+        return response
+
+class CategoryViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Category.objects.all()
+    replica_reads = True
     serializer_class = CategorySerializer
     permission_classes = [RoleBasedPermission]
 
     def perform_create(self, serializer):
-        profile = UserProfile.objects.get(user=self.request.user)
-        if profile.role == 'user':
+        role = resolve_role(self.request.user)
+        if role == 'user':
             request_data = {
                 'request_type': 'category',
                 'data': serializer.validated_data,
                 'user': self.request.user
             }
             Request.objects.create(**request_data)
-        elif profile.role in ['moderator', 'admin']:
+        elif role in STAFF_ROLES:
             serializer.save()
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(FastListMixin, SparseFieldsetMixin, viewsets.ModelViewSet):
     queryset = Location.objects.all() 
+    replica_reads = True
     serializer_class = LocationSerializer
     permission_classes = [RoleBasedPermission]
 
     def perform_create(self, serializer):
-        profile = UserProfile.objects.get(user=self.request.user)
-        if profile.role == 'user':
+        role = resolve_role(self.request.user)
+        if role == 'user':
             request_data = {
                 'request_type': 'location',
                 'data': serializer.validated_data,
                 'user': self.request.user
             }
             Request.objects.create(**request_data)
-        elif profile.role in ['moderator', 'admin']:
+        elif role in STAFF_ROLES:
             serializer.save()
 
+    # Свободные промежутки локации: ?from=&to= (обязательны), ?min_duration= в минутах
+    @action(detail=True, methods=['get'], url_path='free-slots', permission_classes=[IsAuthenticated])
+    def free_slots(self, request, pk=None):
+        location = self.get_object()
+        start, end = parse_time_window(request.query_params)
+        if start is None or end is None:
+            return Response({'error': 'Параметры from и to обязательны'}, status=status.HTTP_400_BAD_REQUEST)
+        if end - start > timedelta(days=booking.MAX_SLOTS_WINDOW_DAYS):
+            return Response({'error': f'Период не может быть длиннее {booking.MAX_SLOTS_WINDOW_DAYS} дней'}, status=status.HTTP_400_BAD_REQUEST)
+        min_duration = request.query_params.get('min_duration')
+        if min_duration:
+            if not min_duration.isdigit():
+                return Response({'min_duration': 'Ожидается число минут'}, status=status.HTTP_400_BAD_REQUEST)
+            min_duration = timedelta(minutes=int(min_duration))
+        busy, free = booking.free_slots(location.pk, start, end, min_duration)
+        return Response({
+            'location': location.pk,
+            'from': start,
+            'to': end,
+            'busy': [{'start': a, 'end': b} for a, b in busy],
+            'free': [{'start': a, 'end': b} for a, b in free],
+        })
+
 class PublicEventsView(APIView):
     permission_classes = [AllowAny]
+    replica_reads = True
+    pagination_class = EventCursorPagination
+    renderer_classes = FAST_RENDERER_CLASSES
+
     def get(self, request):
-        public_events = Event.objects.filter(is_public=True)
-        serializer = EventSerializer(public_events, many=True)
-        return Response(serializer.data)
+        # Первая страница без параметров отдаётся из готового снимка (с ETag и сжатием)
+        if not request.query_params and request.accepted_renderer.format == 'json':
+            snapshot = feed.get_snapshot(request, lambda: self.get_page_data(request))
+            return feed.snapshot_response(request, snapshot)
+        return Response(self.get_page_data(request))
+
+    def get_page_data(self, request):
+        public_events = Event.objects.with_relations().filter(is_public=True)
+        fieldset = Fieldset.from_params(request.query_params)
+        if fieldset is not None:
+            public_events = fieldset.restrict(public_events, EventSerializer(), ('start_time',))
+        public_events = filter_time_window(public_events, request.query_params)
+        public_events = filter_search(public_events, request.query_params)
+        paginator = self.pagination_class()
+        if fast_path_allowed(request):
+            serializer = EventSerializer()
+            if fieldset is not None:
+                fieldset.prune(serializer)
+            compiled = compile_serializer(serializer, Event)
+            if compiled is not None:
+                page = paginator.paginate_queryset(compiled.rows(public_events, paginator), request, view=self)
+                return paginator.get_paginated_response([compiled.build(row) for row in page]).data
+        page = paginator.paginate_queryset(public_events, request, view=self)
+        serializer = EventSerializer(page, many=True)
+        if fieldset is not None:
+            fieldset.prune(serializer)
+        if sideload_requested(request.query_params):
+            results, included = sideload(serializer, page)
+            return {**paginator.get_paginated_response(results).data, **included}
+        return paginator.get_paginated_response(serializer.data).data
     
 class RequestViewSet(viewsets.ModelViewSet):
     queryset = Request.objects.all()
@@ -82,70 +232,129 @@ class RequestViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_queryset(self):
-        profile = UserProfile.objects.get(user=self.request.user)
-        if profile.role == 'user':
-            return Request.objects.filter(user=self.request.user)
-        return Request.objects.all()
+        queryset = Request.objects.select_related('user', 'reviewed_by', 'claimed_by')
+        role = resolve_role(self.request.user)
+        if role == 'user':
+            return queryset.filter(user=self.request.user)
+        return queryset
+
+    # Очередь модерации: pending-заявки от старых к новым, keyset-пагинация, ?type= фильтр
+    @action(detail=False, methods=['get'], url_path='queue')
+    def queue(self, request):
+        if resolve_role(request.user) not in STAFF_ROLES:
+            return Response({"error": "Нет прав для просмотра очереди"}, status=status.HTTP_403_FORBIDDEN)
+        queryset = Request.objects.select_related('user', 'reviewed_by', 'claimed_by').filter(status='pending')
+        request_type = request.query_params.get('type')
+        if request_type:
+            queryset = queryset.filter(request_type=request_type)
+        paginator = RequestQueuePagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(self.get_serializer(page, many=True).data)
+
+    # Счётчики заявок по статусам и типам (из таблицы RequestCounter, без COUNT(*))
+    @action(detail=False, methods=['get'], url_path='counters')
+    def counters(self, request):
+        if resolve_role(request.user) not in STAFF_ROLES:
+            return Response({"error": "Нет прав для просмотра очереди"}, status=status.HTTP_403_FORBIDDEN)
+        return Response(counter_snapshot(), status=status.HTTP_200_OK)
 
     def perform_create(self, serializer):
         serializer.save(user=self.request.user)
 
-    def perform_update(self, serializer):
-        profile = UserProfile.objects.get(user=self.request.user)
-        if profile.role not in ['moderator', 'admin']:
+    # Пакетное одобрение/отклонение: {"decisions": [{"id": 1, "status": "approved"}, ...]}
+    @action(detail=False, methods=['post'], url_path='batch')
+    def batch(self, request):
+        if resolve_role(request.user) not in STAFF_ROLES:
             return Response({"error": "Нет прав для обработки заявки"}, status=status.HTTP_403_FORBIDDEN)
+        items = request.data.get('decisions')
+        if not isinstance(items, list) or not items:
+            return Response({'error': 'Ожидается непустой список decisions'}, status=status.HTTP_400_BAD_REQUEST)
+        decisions = {}
+        for item in items:
+            if not isinstance(item, dict) or type(item.get('id')) is not int or item.get('status') not in DECISIONS:
+                return Response({'error': f'Некорректный элемент: {item}'}, status=status.HTTP_400_BAD_REQUEST)
+            decisions[item['id']] = item['status']
+        # ?async=1 - обработать пакет фоновой задачей и вернуть её id для опроса
+        if request.query_params.get('async') in ('1', 'true'):
+            job = jobs.enqueue('moderation.batch', {
+                'reviewer_id': request.user.pk,
+                'decisions': {str(pk): decision for pk, decision in decisions.items()},
+            }, user=request.user)
+            return Response({'job': JobSerializer(job).data}, status=status.HTTP_202_ACCEPTED)
+        results = ModerationBatch(request.user).run(decisions)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+    # Взять заявку в работу (аренда на MODERATION_LEASE_SECONDS)
+    @action(detail=True, methods=['post'])
+    def claim(self, request, pk=None):
+        if resolve_role(request.user) not in STAFF_ROLES:
+            raise PermissionDenied("Нет прав для обработки заявки")
+        if not claims.claim(pk, request.user):
+            raise claims.ClaimConflict()
+        return Response(self.get_serializer(self.get_object()).data, status=status.HTTP_200_OK)
+
+    @action(detail=True, methods=['post'])
+    def release(self, request, pk=None):
+        if not claims.release(pk, request.user):
+            return Response({"error": "Заявка не арендована вами"}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
-        instance = serializer.save(reviewed_by=self.request.user)
-        if instance.status == 'approved':
-            data = instance.data
+    # Следующие N свободных заявок для текущего модератора (?limit=, ?type=)
+    @action(detail=False, methods=['post'], url_path='claim-next')
+    def claim_next(self, request):
+        if resolve_role(request.user) not in STAFF_ROLES:
+            raise PermissionDenied("Нет прав для обработки заявки")
+        try:
+            limit = int(request.query_params.get('limit', 10))
+        except ValueError:
+            return Response({'limit': 'Ожидается число'}, status=status.HTTP_400_BAD_REQUEST)
+        ids = claims.claim_next(request.user, limit, request.query_params.get('type'))
+        claimed = Request.objects.select_related('user', 'reviewed_by', 'claimed_by').filter(pk__in=ids).order_by('created_at', 'id')
+        return Response(self.get_serializer(claimed, many=True).data, status=status.HTTP_200_OK)
+
+    def perform_update(self, serializer):
+        if resolve_role(self.request.user) not in STAFF_ROLES:
+            raise PermissionDenied("Нет прав для обработки заявки")
+
+        # Решение по заявке принимается условным UPDATE: повторное одобрение
+        # той же заявки (или заявки, арендованной другим) получает 409
+        new_status = serializer.validated_data.get('status')
+        decided = new_status in ('approved', 'rejected')
+        # Принятое решение не откатывается через API: approved -> pending только у воркера
+        if serializer.instance.status in ('approved', 'rejected') and new_status not in (None, serializer.instance.status):
+            raise ValidationError({'status': 'Решение по заявке уже принято'})
+        # Заведомо неприменимая заявка не одобряется: воркер потом проверит её ещё раз
+        if new_status == 'approved' and serializer.instance.status == 'pending':
             try:
-                if instance.request_type == 'event':
-                    if instance.action == 'create':
-                        event = Event.objects.create(
-                            title=data.get('title'),
-                            description=data.get('description', ''),
-                            start_time=data.get('start_time'),
-                            end_time=data.get('end_time'),
-                            author=instance.user,
-                            is_public=data.get('is_public', True),
-                            location_id=data.get('location_id'),
-                            category_id=data.get('category_id')
-                        )
-                        return Response(EventSerializer(event).data, status=status.HTTP_201_CREATED)
-                    elif instance.action == 'update':
-                        event = instance.event
-                        if event.author != instance.user:
-                            return Response({"error": "Можно редактировать только свои мероприятия"}, status=status.HTTP_403_FORBIDDEN)
-                        event.title = data.get('title', event.title)
-                        event.description = data.get('description', event.description)
-                        event.start_time = data.get('start_time', event.start_time)
-                        event.end_time = data.get('end_time', event.end_time)
-                        event.location_id = data.get('location_id', event.location_id)
-                        event.category_id = data.get('category_id', event.category_id)
-                        event.is_public = data.get('is_public', event.is_public)
-                        event.save()
-                        return Response(EventSerializer(event).data, status=status.HTTP_200_OK)
-                    elif instance.action == 'delete':
-                        event = instance.event
-                        if event.author != instance.user:
-                            return Response({"error": "Можно удалять только свои мероприятия"}, status=status.HTTP_403_FORBIDDEN)
-                        event.delete()
-                        return Response(status=status.HTTP_204_NO_CONTENT)
-                elif instance.request_type == 'category' and instance.action == 'create':
-                    category = Category.objects.create(
-                        name=data.get('name'),
-                        slug=data.get('name', '').lower().replace(' ', '-')
-                    )
-                    return Response(CategorySerializer(category).data, status=status.HTTP_201_CREATED)
-                elif instance.request_type == 'location' and instance.action == 'create':
-                    location = Location.objects.create(
-                        name=data.get('name'),
-                        city=data.get('city', None)
-                    )
-                    return Response(LocationSerializer(location).data, status=status.HTTP_201_CREATED)
-            except Exception as e:
-                return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
-        return Response(serializer.data, status=status.HTTP_200_OK)
+                validate_approval(serializer.instance)
+            except DecisionError as e:
+                raise ValidationError({'status': str(e)})
+
+        # Статус, сохранение и задача - одна транзакция: без задачи заявка не останется approved
+        with transaction.atomic():
+            if decided:
+                if not claims.finish(serializer.instance.pk, self.request.user, new_status):
+                    raise claims.ClaimConflict()
+                instance = serializer.save(reviewed_by=self.request.user, claimed_by=None, claimed_until=None, review_error='')
+            else:
+                # Правка без решения не снимает и не перехватывает чужую аренду
+                if not claims.holds(serializer.instance.pk, self.request.user):
+                    raise claims.ClaimConflict()
+                instance = serializer.save()
+            # Создание/изменение объектов по одобренной заявке выполняет фоновый воркер
+            if decided and instance.status == 'approved':
+                jobs.enqueue('moderation.apply_approval', {'request_id': instance.pk}, user=self.request.user)
+
+# Статус фоновых задач (модераторы и админы)
+class JobViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = Job.objects.all().order_by('-id')
+    serializer_class = JobSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        if resolve_role(self.request.user) not in STAFF_ROLES:
+            raise PermissionDenied("Нет прав для просмотра задач")
+        return super().get_queryset()
 
 class RegisterView(APIView):
     permission_classes = [AllowAny]
@@ -163,9 +372,8 @@ class UserViewSet(viewsets.ReadOnlyModelViewSet):
     permission_classes = [IsRoleAdmin]
 
     def list(self, request, *args, **kwargs):
-        print("UserViewSet list method called")
         response = super().list(request, *args, **kwargs)
-        print("Response data:", response.data)
+        logger.debug('Список пользователей', extra={'count': len(response.data)})
         return response
 
 class UpdateUserRoleView(APIView):
@@ -173,39 +381,103 @@ class UpdateUserRoleView(APIView):
     def patch(self, request, user_id):
         user = User.objects.get(id=user_id)
         role = request.data.get("role")
-        print(f"Before: User {user.id}, Role: {user.userprofile.role}")
         if role in ["user", "moderator", "admin"]:
+            old_role = user.userprofile.role
             user.userprofile.role = role
             user.userprofile.save()
-            print(f"After: User {user.id}, Role: {user.userprofile.role}")
+            logger.info('Роль пользователя изменена', extra={
+                'target_user_id': user.id, 'old_role': old_role, 'new_role': role,
+            })
             return Response({"message": f"Роль изменена на {role}"})
         return Response({"error": "Недопустимая роль"}, status=status.HTTP_400_BAD_REQUEST)
 
+# HTML-страницы: keyset-пагинация как в API, карточки кэшируются фрагментами
+# ({% cache %} по id и updated_at), список отдаётся потоком по мере рендера карточек
+PAGES_SETTINGS = {
+    'MAX_AGE': 60,
+    'FRAGMENT_TIMEOUT': 60 * 60,
+    **getattr(settings, 'EVENT_PAGES', {}),
+}
+CARDS_SLOT = mark_safe('<!-- event-cards -->')
+
+def page_cache_headers(response):
+    patch_cache_control(response, public=True, max_age=PAGES_SETTINGS['MAX_AGE'])
+    return response
+
+@replica_reads
+@require_safe
 def event_list(request):
-    events = Event.objects.all()
-    return render(request, 'events/event_list.html', {'events': events})
+    paginator = EventCursorPagination()
+    events = Event.objects.only('id', 'title', 'description', 'start_time', 'end_time', 'updated_at')
+    try:
+        page = paginator.paginate_queryset(events, DRFRequest(request))
+    except NotFound:
+        raise Http404('Некорректный курсор')
+    shell = render_to_string('events/event_list.html', {
+        'has_events': bool(page),
+        'cards_slot': CARDS_SLOT,
+        'next_link': paginator.get_next_link(),
+        'previous_link': paginator.get_previous_link(),
+    }, request)
+    head, tail = shell.split(CARDS_SLOT, 1) if page else (shell, '')
+
+    def stream():
+        yield head
+        for event in page:
+            yield render_to_string('events/_event_card.html', {
+                'event': event,
+                'fragment_timeout': PAGES_SETTINGS['FRAGMENT_TIMEOUT'],
+            })
+        yield tail
+
+    return page_cache_headers(StreamingHttpResponse(stream(), content_type='text/html; charset=utf-8'))
 
+# ETag карточки: updated_at события и данные локации, которые выводятся на странице
+def event_etag(request, event_id):
+    row = Event.objects.filter(id=event_id).values_list('updated_at', 'location__name', 'location__city').first()
+    if row is None:
+        return None
+    return hashlib.md5(repr(row).encode()).hexdigest()
+
+@replica_reads
+@require_safe
+@condition(etag_func=event_etag)
 def event_detail(request, event_id):
-    event = Event.objects.get(id=event_id)
-    start_time = event.start_time.strftime('%b. %d, %Y, %I:%M %p')
-    end_time = event.end_time.strftime('%b. %d, %Y, %I:%M %p')
-    return render(request, 'events/event_detail.html', {
+    event = get_object_or_404(Event.objects.select_related('location'), id=event_id)
+    return page_cache_headers(render(request, 'events/event_detail.html', {
         'event': event,
-        'start_time': start_time,
-        'end_time': end_time
-    })
+        'fragment_timeout': PAGES_SETTINGS['FRAGMENT_TIMEOUT'],
+    }))
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def get_user_role(request):
+    return Response({
+        'role': resolve_role(request.user),
+        'username': request.user.username
+    }, status=status.HTTP_200_OK)
+
+@api_view(['GET'])
+@permission_classes([IsRoleAdmin])
+def auth_cache_stats(request):
+    return Response(token_cache.stats(), status=status.HTTP_200_OK)
+
+# Состояние пула соединений с БД по каждому алиасу (events/dbpool.py)
+@api_view(['GET'])
+@permission_classes([IsRoleAdmin])
+def db_pool_stats(request):
+    return Response(dbpool.pool_stats(), status=status.HTTP_200_OK)
+
+# Сводная статистика для панели: читается из EventStat/ReviewerStat/RequestCounter,
+# без агрегатов по таблицам мероприятий и заявок
+@api_view(['GET'])
+@permission_classes([IsAuthenticated])
+def dashboard_stats(request):
+    if resolve_role(request.user) not in STAFF_ROLES:
+        raise PermissionDenied("Нет прав для просмотра статистики")
     try:
-        profile = UserProfile.objects.get(user=request.user)
-        return Response({
-            'role': profile.role,
-            'username': request.user.username
-        }, status=status.HTTP_200_OK)
-    except UserProfile.DoesNotExist:
-        return Response({
-            'role': 'user',
-            'username': request.user.username
-        }, status=status.HTTP_200_OK)
\ No newline at end of file
+        days = int(request.query_params.get('days', 30))
+    except ValueError:
+        return Response({"error": "Параметр days должен быть числом"}, status=status.HTTP_400_BAD_REQUEST)
+    days = min(max(days, 1), 366)
+    return Response(stats.dashboard(days), status=status.HTTP_200_OK)
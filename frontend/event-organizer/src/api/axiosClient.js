@@ -20,7 +20,14 @@ axiosClient.interceptors.request.use(
   (error) => Promise.reject(error)
 );
 
-export const getEvents = () => axiosClient.get("/events/");
+export const getEvents = (params = {}) => axiosClient.get("/events/", { params });
+export const getPublicEvents = (params = {}) => axiosClient.get("/public-events/", { params });
+
+// Одна страница курсорной пагинации: url - адрес списка или ссылка next/previous из прошлого ответа
+export const fetchPage = async (url, params = {}) => {
+  const response = await axiosClient.get(url, { params });
+  return response.data;
+};
 export const getLocations = () => axiosClient.get("/locations/");
 export const getCategories = () => axiosClient.get("/categories/");
 export const getRequests = () => axiosClient.get("/requests/");
@@ -1,5 +1,5 @@
 import React, { useState, useEffect } from "react";
-import axiosClient, { getUserRole } from "../api/axiosClient";
+import axiosClient, { getUserRole, fetchPage } from "../api/axiosClient";
 import { toast } from "react-toastify";
 import CreateEventForm from "../components/CreateEventForm";
 import DeleteConfirmModal from "../components/DeleteConfirmModal";
@@ -11,6 +11,8 @@ import { useNavigate } from "react-router-dom";
 
 const EventsPage = () => {
   const [events, setEvents] = useState([]);
+  const [pageUrl, setPageUrl] = useState(null);
+  const [pageLinks, setPageLinks] = useState({ next: null, previous: null });
   const [categories, setCategories] = useState([]);
   const [locations, setLocations] = useState([]);
   const [isEventModalOpen, setIsEventModalOpen] = useState(false);
@@ -28,12 +30,18 @@ const EventsPage = () => {
   const navigate = useNavigate();
   const isAuthenticated = !!localStorage.getItem("token");
 
-  const fetchEvents = async () => {
+  const eventsUrl = isAuthenticated ? "/events/" : "/public-events/";
+
+  const showEventsPage = (url, data) => {
+    setPageUrl(url);
+    setEvents(data.results);
+    setPageLinks({ next: data.next, previous: data.previous });
+  };
+
+  // Загружает одну страницу: первую, по ссылке next/previous или текущую заново
+  const fetchEvents = async (url = pageUrl || eventsUrl) => {
     try {
-      const eventsResponse = isAuthenticated
-        ? await axiosClient.get("/events/")
-        : await axiosClient.get("/public-events/");
-      setEvents(eventsResponse.data);
+      showEventsPage(url, await fetchPage(url));
     } catch (error) {
       console.error("Ошибка загрузки событий:", error);
       toast.error("Ошибка при загрузке событий.");
@@ -50,22 +58,20 @@ const EventsPage = () => {
           setRole(userRole);
         }
 
-        let eventsResponse;
         if (isAuthenticated) {
-          const [eventsRes, categoriesRes, locationsRes] = await Promise.all([
-            axiosClient.get("/events/"),
+          const [eventsPage, categoriesRes, locationsRes] = await Promise.all([
+            fetchPage("/events/"),
             axiosClient.get("/categories/"),
             axiosClient.get("/locations/"),
           ]);
-          eventsResponse = eventsRes;
+          showEventsPage("/events/", eventsPage);
           setCategories(categoriesRes.data);
           setLocations(locationsRes.data);
         } else {
-          eventsResponse = await axiosClient.get("/public-events/");
+          showEventsPage("/public-events/", await fetchPage("/public-events/"));
           setCategories([]);
           setLocations([]);
         }
-        setEvents(eventsResponse.data);
       } catch (error) {
         console.error("Ошибка загрузки данных:", error);
         toast.error("Ошибка при загрузке данных.");
@@ -399,6 +405,24 @@ const EventsPage = () => {
                   </motion.div>
                 ))
               )}
+              {(pageLinks.previous || pageLinks.next) && (
+                <div className="flex justify-between pt-2">
+                  <button
+                    onClick={() => fetchEvents(pageLinks.previous)}
+                    disabled={!pageLinks.previous}
+                    className="py-2 px-4 rounded-md bg-gray-100 hover:bg-gray-200 disabled:opacity-50"
+                  >
+                    Назад
+                  </button>
+                  <button
+                    onClick={() => fetchEvents(pageLinks.next)}
+                    disabled={!pageLinks.next}
+                    className="py-2 px-4 rounded-md bg-gray-100 hover:bg-gray-200 disabled:opacity-50"
+                  >
+                    Вперёд
+                  </button>
+                </div>
+              )}
             </>
           )}
 